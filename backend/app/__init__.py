@@ -1,10 +1,15 @@
+import hmac
 import traceback
-from flask import Flask, g, request, jsonify
+from flask import Flask, g, request, jsonify, Response
 from flask_cors import CORS
 from datetime import datetime
 from app.utils import get_logger, generate_trace_id
 from app.config import Config
-from app.database import init_db
+from app.database import init_db, reset_engine_after_fork
+from app.services import ledger_service, file_service
+from app.utils import parse, metrics, query_stats, profiling
+from app.utils.timing import log_stage_event
+from app.utils.trace_util import set_trace_id, reset_trace_id, start_span, end_span
 
 # 导入路由
 from app.routes import (
@@ -14,21 +19,43 @@ from app.routes import (
     bill_bp,
     invitation_bp,
     account_bp,
+    admin_bp,
 )
 
 
-def create_app(config_class=Config):
-    """应用工厂函数"""
+def create_app(config_class=Config, prefork=False):
+    """
+    应用工厂函数
+
+    Args:
+        prefork: 由预加载的多进程服务器(gunicorn preload_app)创建时为 True,
+            此时 OCR 预热等进程内状态推迟到各 worker 的 init_worker 中初始化
+    """
     logger = get_logger(__name__)
 
     # 初始化数据库
     try:
-        logger.info("初始化数据库...")
+        logger.info("检查数据库结构...")
         init_db()
-        logger.info("初始化数据库成功")
+        logger.info("检查数据库结构完成")
     except Exception as e:
         logger.warning(f"数据库初始化失败: {str(e)}")
 
+    # 后台预热OCR模型(可选)
+    if config_class.OCR_WARMUP_ON_START and not prefork:
+        logger.info("后台预热OCR模型...")
+        parse.start_ocr_warm_up()
+
+    # 多 worker 汇总指标: 主进程清空上次运行遗留的快照, 各 worker 在 init_worker 中开启
+    if prefork:
+        metrics.clear_multiprocess(config_class.METRICS_MULTIPROCESS_DIR)
+
+    # 重放上次退出前未落库的用量账本(写后模式或预授权结算失败时写入)
+    try:
+        ledger_service.replay_journal()
+    except Exception as e:
+        logger.warning(f"用量账本重放失败: {str(e)}")
+
     # 创建Flask应用
     app = Flask(__name__)
     app.config.from_object(config_class)
@@ -40,7 +67,13 @@ def create_app(config_class=Config):
         app,
         origins=["*"],
         allow_headers=["Content-Type", "Authorization", "datasource", "X-Trace-Id"],
-        expose_headers=["X-Trace-Id"],
+        expose_headers=[
+            "X-Trace-Id",
+            "X-Export-Watermark",
+            "Content-Disposition",
+            "X-DB-Query-Count",
+            "X-DB-Time-Ms",
+        ],
         supports_credentials=True,
         max_age=86400,
     )
@@ -52,14 +85,74 @@ def create_app(config_class=Config):
         """请求前钩子：设置trace_id"""
         trace_id = request.headers.get("X-Trace-Id", generate_trace_id())
         g.trace_id = trace_id
+        # 同时写入 contextvars, 提交到线程池的任务可继承追踪ID与当前 span
+        g.trace_token = set_trace_id(trace_id)
+        g.request_span = start_span("request")
+        metrics.HTTP_IN_FLIGHT.inc()
+        g.in_flight = True
+        g.query_stats, g.query_stats_token = query_stats.start()
+        # 开启剖析时才创建剖析器(关闭或已有剖析进行中时为 None)
+        g.profile_session = profiling.start("request")
 
     @app.after_request
     def after_request(response):
-        """请求后钩子：返回trace_id"""
+        """请求后钩子：返回trace_id, 记录请求耗时"""
         trace_id = getattr(g, "trace_id", "NO_TRACE_ID")
         response.headers["X-Trace-Id"] = trace_id
+
+        request_span = getattr(g, "request_span", None)
+        if request_span is not None:
+            duration_ms = end_span(request_span)
+            log_stage_event(
+                "request",
+                duration_ms,
+                "ok" if response.status_code < 500 else "error",
+                span=request_span,
+                workspace_id=request.args.get("workspace_id"),
+                bytes=response.content_length,
+            )
+            # 未匹配路由统一归类, 避免按原始路径产生大量标签
+            route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            metrics.HTTP_REQUESTS.inc(request.method, route, response.status_code)
+            metrics.HTTP_LATENCY.observe(duration_ms / 1000, request.method, route)
+
+        stats = getattr(g, "query_stats", None)
+        if stats is not None:
+            _check_query_stats(stats, response)
         return response
 
+    def _check_query_stats(stats, response):
+        """请求内 SQL 统计: 疑似 N+1 时告警, 调试模式下附加到响应头"""
+        threshold = config_class.DB_N_PLUS_ONE_THRESHOLD
+        if threshold:
+            for statement, count in stats.repeated(threshold):
+                logger.warning(
+                    f"疑似 N+1 查询 - path: {request.path}, count: {count}, "
+                    f"queries: {stats.count}, statement: {statement[:200]}"
+                )
+
+        if config_class.APP_DEBUG:
+            response.headers["X-DB-Query-Count"] = str(stats.count)
+            response.headers["X-DB-Time-Ms"] = f"{stats.total_ms:.1f}"
+
+    @app.teardown_request
+    def teardown_request(exc):
+        """请求结束：恢复 contextvars 中的追踪ID(线程会被后续请求复用)"""
+        profile_session = g.pop("profile_session", None)
+        if profile_session is not None:
+            profiling.finish(profile_session, "request")
+        if g.pop("in_flight", False):
+            metrics.HTTP_IN_FLIGHT.dec()
+        query_stats_token = g.pop("query_stats_token", None)
+        if query_stats_token is not None:
+            query_stats.stop(query_stats_token)
+        request_span = g.pop("request_span", None)
+        if request_span is not None:
+            end_span(request_span)
+        trace_token = g.pop("trace_token", None)
+        if trace_token is not None:
+            reset_trace_id(trace_token)
+
     @app.errorhandler(Exception)
     def handle_exception(e):
         """全局异常处理"""
@@ -76,6 +169,7 @@ def create_app(config_class=Config):
     app.register_blueprint(bill_bp)
     app.register_blueprint(invitation_bp)
     app.register_blueprint(account_bp)
+    app.register_blueprint(admin_bp)
 
     # ================== 健康检查 ==================
 
@@ -97,4 +191,73 @@ def create_app(config_class=Config):
             200,
         )
 
+    @app.route("/api/health/ready", methods=["GET"])
+    def health_ready():
+        """
+        就绪检查(与存活检查分开)
+
+        开启 OCR 预热时, 模型预热完成前返回 503, 负载均衡据此只把图片上传路由到已预热的实例
+        """
+        parsers = parse.get_parser_status()
+        ready = (
+            not config_class.OCR_WARMUP_ON_START
+            or parsers["image"]["status"] == "ready"
+        )
+        return (
+            jsonify(
+                {
+                    "success": ready,
+                    "data": {
+                        "ready": ready,
+                        "ocr_warmup": config_class.OCR_WARMUP_ON_START,
+                        "parsers": parsers,
+                        "timestamp": datetime.now().isoformat(),
+                    },
+                }
+            ),
+            200 if ready else 503,
+        )
+
+    @app.route("/api/metrics", methods=["GET"])
+    def metrics_endpoint():
+        """Prometheus 指标(gunicorn 多 worker 时汇总所有 worker)"""
+        token = config_class.METRICS_TOKEN
+        if not config_class.METRICS_ENABLED or not token:
+            return jsonify({"success": False, "message": "指标接口未开启"}), 404
+
+        authorization = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(authorization, f"Bearer {token}"):
+            return jsonify({"success": False, "message": "无权访问指标接口"}), 401
+
+        return Response(
+            metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
     return app
+
+
+def init_worker(config_class=Config):
+    """
+    fork 后初始化 worker 进程(gunicorn post_fork 钩子调用)
+
+    数据库连接池、解析线程池、用量账本日志等不能跨进程共享, 在每个 worker 中重建;
+    OCR 模型在 worker 中各自预热
+    """
+    logger = get_logger(__name__)
+
+    reset_engine_after_fork()
+    metrics.reset_after_fork()
+    metrics.enable_multiprocess(config_class.METRICS_MULTIPROCESS_DIR)
+    file_service.reset_executor()
+    ledger_service.reset_after_fork()
+
+    if config_class.OCR_WARMUP_ON_START:
+        logger.info("后台预热OCR模型...")
+        parse.start_ocr_warm_up()
+
+
+def shutdown_worker():
+    """worker 退出前等待解析任务完成并落库剩余用量事件, 指标计数并入归档"""
+    file_service.shutdown_executor()
+    ledger_service.shutdown()
+    metrics.shutdown_multiprocess()
@@ -27,8 +27,20 @@ class Config:
     APP_HOST = os.environ.get("APP_HOST", "0.0.0.0")
     # 服务器监听的端口号
     APP_PORT = os.environ.get("APP_PORT", 7788)
-    # 是否启动调用模式
-    APP_DEBUG = os.environ.get("APP_DEBUG", "true").lower() == "true"
+    # 是否启动调用模式(仅本地开发使用, 生产环境通过 gunicorn 启动)
+    APP_DEBUG = os.environ.get("APP_DEBUG", "false").lower() == "true"
+
+    # 生产服务器配置(gunicorn.conf.py)
+    # worker 进程数, 默认 CPU 核数 * 2 + 1
+    WEB_WORKERS = int(os.environ.get("WEB_WORKERS", (os.cpu_count() or 1) * 2 + 1))
+    # 每个 worker 的线程数
+    WEB_THREADS = int(os.environ.get("WEB_THREADS", 4))
+    # worker 处理该数量请求后自动回收(0 为不回收), 附加随机抖动避免同时重启
+    WEB_MAX_REQUESTS = int(os.environ.get("WEB_MAX_REQUESTS", 2000))
+    WEB_MAX_REQUESTS_JITTER = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", 200))
+    # 请求超时/优雅退出等待时间(秒), 优雅退出期间等待已提交的解析任务完成
+    WEB_TIMEOUT = int(os.environ.get("WEB_TIMEOUT", 120))
+    WEB_GRACEFUL_TIMEOUT = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 120))
 
     # 日志配置
     # 日志存放目录
@@ -41,24 +53,112 @@ class Config:
     LOG_ENABLE_FILE = os.environ.get("LOG_ENABLE_FILE", "true").lower() == "true"
     # 是否启用控制台
     LOG_ENABLE_CONSOLE = os.environ.get("LOG_ENABLE_CONSOLE", "true").lower() == "true"
+    # 日志格式: text(文本) / json(每行一个 JSON 对象, 含 trace_id/route/stage/duration_ms 等固定字段)
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+    # 是否异步写日志(业务线程只写入内存队列, 由后台线程统一输出)
+    LOG_ASYNC = os.environ.get("LOG_ASYNC", "true").lower() == "true"
+    # 单条日志消息最大长度(超出部分截断, 0 为不截断)
+    LOG_MAX_MESSAGE_LENGTH = int(os.environ.get("LOG_MAX_MESSAGE_LENGTH", 4000))
+    # DEBUG 日志采样比例(0~1)
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", 1))
 
     DB_DIR = BASE_DIR / "database"
     DB_PATH = os.environ.get("DB_PATH", "bills.db")
+    # 启动时数据库结构版本戳与模型不一致时是否自动迁移(默认仅告警, 由 manage_db.py migrate 执行)
+    DB_AUTO_MIGRATE = os.environ.get("DB_AUTO_MIGRATE", "false").lower() == "true"
+    # 单个请求内同一条语句执行次数达到该值时告警(疑似 N+1 查询, 0 为不检查)
+    DB_N_PLUS_ONE_THRESHOLD = int(os.environ.get("DB_N_PLUS_ONE_THRESHOLD", 10))
 
     # 本地文件的存储目录
     STORAGE_DIR = BASE_DIR / "storages"
     # 允许的文件扩展名
     ALLOWED_EXTENSIONS = {"pdf", "png", "jpg", "jpeg", "xlsx", "xls"}
+    # 启动时是否在后台线程预热 PaddleOCR 模型(默认在首次解析图片时加载)
+    # 开启后 /api/health/ready 在预热完成前返回 503
+    OCR_WARMUP_ON_START = (
+        os.environ.get("OCR_WARMUP_ON_START", "false").lower() == "true"
+    )
 
     DEEPSEEK_CHAT_MODEL = os.environ.get("DEEPSEEK_CHAT_MODEL", "deepseek-chat")
     DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY", "")
     DEEPSEEK_BASE_URL = os.environ.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+    # 是否以流式方式调用 DeepSeek(边生成边解析, 进度接口可提前返回部分账单)
+    DEEPSEEK_STREAM_ENABLED = (
+        os.environ.get("DEEPSEEK_STREAM_ENABLED", "false").lower() == "true"
+    )
+    # 账单提取模式: two_step(提纯 + 转换两次调用) / single(单次调用直接输出 JSON)
+    DEEPSEEK_EXTRACT_MODE = os.environ.get("DEEPSEEK_EXTRACT_MODE", "two_step")
+
+    # ==================== Prompt压缩配置 ====================
+    # 调用前是否压缩账单内容(去除页眉页脚、法律声明、支付宝/微信交易行)
+    # 默认关闭, 需先在目标银行的 OCR/PDF 版式上验证不会误删明细
+    PROMPT_COMPACT_ENABLED = (
+        os.environ.get("PROMPT_COMPACT_ENABLED", "false").lower() == "true"
+    )
+    # 单次调用的账单内容Token预算, 超出后按行切分为多次调用
+    PROMPT_CHUNK_TOKENS = int(os.environ.get("PROMPT_CHUNK_TOKENS", 12000))
+    # 单个文件的账单内容Token上限, 超出直接拒绝(不产生扣费)
+    PROMPT_MAX_TOKENS = int(os.environ.get("PROMPT_MAX_TOKENS", 60000))
 
     # ==================== Token计费配置 ====================
     # 2元/百万token = 0.002元/千token
     _default_pricing = os.environ.get("DEEPSEEK_TOKEN_PRICING", 0.002)
     TOKEN_PRICING = {"deepseek-chat": _default_pricing, "default": _default_pricing}
 
+    # ==================== 用量账本配置 ====================
+    # 是否启用写后批量落库(Token记录与扣费先写本地日志, 由后台线程批量落库)
+    LEDGER_WRITE_BEHIND = (
+        os.environ.get("LEDGER_WRITE_BEHIND", "false").lower() == "true"
+    )
+    # 账本日志目录
+    LEDGER_JOURNAL_DIR = BASE_DIR / "ledger"
+    # 定时落库间隔(秒)
+    LEDGER_FLUSH_INTERVAL = float(os.environ.get("LEDGER_FLUSH_INTERVAL", 2))
+    # 缓冲事件数达到该值时立即落库
+    LEDGER_FLUSH_SIZE = int(os.environ.get("LEDGER_FLUSH_SIZE", 200))
+    # 每条日志写入后是否 fsync(更安全, 但每次写入多一次磁盘同步)
+    LEDGER_FSYNC = os.environ.get("LEDGER_FSYNC", "false").lower() == "true"
+    # 预授权冻结有效期(秒): 超过该时间没有新的冻结时, 剩余冻结金额视为崩溃遗留并释放
+    BALANCE_HOLD_TTL = int(os.environ.get("BALANCE_HOLD_TTL", 3600))
+
+    # ==================== 解析任务配置 ====================
+    # 解析执行方式: inline(API 进程内线程池, 本地开发) / queue(写入任务队列, 由 python -m app.worker 执行)
+    INGEST_MODE = os.environ.get("INGEST_MODE", "inline")
+    # 每个 worker 进程并发执行的任务数
+    INGEST_WORKER_THREADS = int(os.environ.get("INGEST_WORKER_THREADS", 2))
+    # 队列为空时的轮询间隔(秒)
+    INGEST_POLL_INTERVAL = float(os.environ.get("INGEST_POLL_INTERVAL", 1))
+    # 执行中任务的心跳间隔(秒)
+    INGEST_HEARTBEAT_INTERVAL = float(os.environ.get("INGEST_HEARTBEAT_INTERVAL", 30))
+    # 心跳超时(秒), 超过该时间没有心跳视为 worker 已退出, 重新入队(需大于心跳间隔数倍)
+    INGEST_JOB_TIMEOUT = int(os.environ.get("INGEST_JOB_TIMEOUT", 300))
+    # 任务最大执行次数
+    INGEST_MAX_ATTEMPTS = int(os.environ.get("INGEST_MAX_ATTEMPTS", 3))
+
+    # ==================== 监控配置 ====================
+    # 是否开启 /api/metrics(Prometheus 文本格式)
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "false").lower() == "true"
+    # 抓取令牌(必填), 抓取时需携带 Authorization: Bearer <token>; 为空时指标接口不可用
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+    # gunicorn 多 worker 汇总指标时各 worker 写入快照的目录
+    METRICS_MULTIPROCESS_DIR = LOG_DIR / "metrics"
+    # 管理接口令牌(/api/admin/*), 为空时管理接口不可用
+    ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+    # 是否开启性能剖析(可通过 /api/admin/profiling 在运行时修改)
+    PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED", "false").lower() == "true"
+    # 耗时超过该值(毫秒)的请求/解析任务保存剖析结果
+    PROFILE_SLOW_MS = int(os.environ.get("PROFILE_SLOW_MS", 2000))
+    # 不论耗时, 按该比例(0~1)抽样保存剖析结果
+    PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+    # 最多保留的剖析文件数(LOG_DIR/profiles)
+    PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 200))
+
+    # ==================== 汇率配置 ====================
+    # 汇率表文件(CSV: currency,effective_date,rate, rate 为 1 单位外币折合人民币; 相对路径基于 BASE_DIR)
+    FX_RATES_FILE = os.environ.get(
+        "FX_RATES_FILE", str(BASE_DIR / "data" / "fx_rates.csv")
+    )
+
     # ==================== 支付宝配置 ====================
     ALIPAY_APP_ID = os.environ.get("ALIPAY_APP_ID", "")
     ALIPAY_PRIVATE_KEY = os.environ.get("ALIPAY_PRIVATE_KEY", "")
@@ -1,12 +1,20 @@
+import hashlib
 import os
+import time
+from datetime import datetime
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from contextlib import contextmanager
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
 from app.models import Base
 from app.config import Config
-from app.utils import get_logger
+from app.utils import get_logger, metrics, query_stats
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 logger = get_logger(__name__)
 
@@ -25,6 +33,50 @@ engine = create_engine(
 # 会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 计入语句耗时指标的操作类型(其余归为 OTHER, 控制标签数量)
+METRIC_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE"})
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    operation = statement.lstrip()[:6].upper()
+    if operation not in METRIC_OPERATIONS:
+        operation = "OTHER"
+    metrics.DB_STATEMENTS.inc(operation)
+    metrics.DB_LATENCY.observe(elapsed, operation)
+    query_stats.record(statement, elapsed * 1000)
+
+
+def _collect_pool_metrics():
+    """抓取时读取连接池状态"""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return []
+    return [
+        ("db_pool_size", "gauge", "连接池容量", [({}, pool.size())]),
+        ("db_pool_checked_out", "gauge", "已借出的连接数", [({}, pool.checkedout())]),
+        ("db_pool_checked_in", "gauge", "池中空闲连接数", [({}, pool.checkedin())]),
+        ("db_pool_overflow", "gauge", "超出容量的连接数", [({}, pool.overflow())]),
+    ]
+
+
+metrics.register_collector(_collect_pool_metrics)
+
+
+def reset_engine_after_fork():
+    """
+    fork 后在子进程中重建连接池
+
+    close=False: 不关闭从父进程继承的连接(仍由父进程使用), 子进程按需建立新连接
+    """
+    engine.dispose(close=False)
+
 
 @contextmanager
 def db_session():
@@ -58,18 +110,224 @@ def db_transaction():
         session.close()
 
 
+# 数据库结构版本戳(单行表, 记录最近一次建表/迁移时的模型指纹)
+SCHEMA_VERSION_TABLE = "schema_version"
+
+
+def schema_fingerprint() -> str:
+    """
+    根据模型定义(表/列/索引)计算结构指纹
+
+    模型变更后指纹随之变化, 与版本戳不一致即表示需要迁移
+    """
+    parts = []
+    for table in Base.metadata.sorted_tables:
+        parts.append(f"table:{table.name}")
+        for column in table.columns:
+            column_type = column.type.compile(dialect=engine.dialect)
+            parts.append(f"column:{column.name}:{column_type}:{column.nullable}")
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            columns = ",".join(column.name for column in index.columns)
+            parts.append(f"index:{index.name}:{columns}:{index.unique}")
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def get_schema_stamp():
+    """
+    读取数据库结构版本戳
+
+    Returns:
+        版本戳; 版本戳表不存在(新库或旧版本库)时返回 None
+    """
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                text(f"SELECT version FROM {SCHEMA_VERSION_TABLE} WHERE id = 1")
+            ).scalar()
+    except OperationalError:
+        return None
+
+
+def write_schema_stamp(version: str = None) -> str:
+    """写入数据库结构版本戳(默认为当前模型指纹)"""
+    version = version or schema_fingerprint()
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} ("
+                "id INTEGER PRIMARY KEY, version VARCHAR(32) NOT NULL, "
+                "applied_at DATETIME NOT NULL)"
+            )
+        )
+        # 删除后插入(同一事务), 不依赖 SQLite 的 INSERT OR REPLACE
+        conn.execute(text(f"DELETE FROM {SCHEMA_VERSION_TABLE} WHERE id = 1"))
+        conn.execute(
+            text(
+                f"INSERT INTO {SCHEMA_VERSION_TABLE} "
+                "(id, version, applied_at) VALUES (1, :version, :applied_at)"
+            ),
+            {"version": version, "applied_at": datetime.now()},
+        )
+    return version
+
+
+@contextmanager
+def _migration_lock():
+    """迁移文件锁, 避免多个 worker 同时建表"""
+    if fcntl is None:
+        yield
+        return
+
+    with open(f"{db_path}.migrate.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 def init_db():
+    """
+    启动时检查数据库结构版本戳(单行查询)
+
+    - 版本戳与模型指纹一致: 直接跳过
+    - 版本戳缺失(新库或旧版本库): 建表/迁移并写入版本戳
+    - 版本戳不一致: 仅告警, 需执行 python manage_db.py migrate(DB_AUTO_MIGRATE=true 时自动迁移)
+    """
+    expected = schema_fingerprint()
+    stamp = get_schema_stamp()
+
+    if stamp == expected:
+        logger.info(f"数据库结构已是最新 - version: {stamp}")
+        return
+
+    if stamp is not None and not Config.DB_AUTO_MIGRATE:
+        logger.warning(
+            f"数据库结构版本与模型不一致, 请执行 python manage_db.py migrate - "
+            f"version: {stamp}, expected: {expected}"
+        )
+        return
+
+    migrate_db()
+
+
+def migrate_db(force: bool = False) -> bool:
+    """
+    建表并同步新增列/索引, 完成后写入版本戳
+
+    有无法自动补齐的列(非空列)时不写入版本戳, 每次启动都会告警, 直到手动迁移完成
+
+    Args:
+        force: 版本戳已是最新时仍执行完整同步
+
+    Returns:
+        是否执行了迁移
+    """
     try:
-        """初始化数据库表"""
-        print("=" * 60)
-        print("开始初始化数据库...")
-        print("=" * 60)
+        with _migration_lock():
+            # 拿到锁后再检查一次, 其他进程可能已完成迁移
+            if not force and get_schema_stamp() == schema_fingerprint():
+                return False
 
-        Base.metadata.create_all(bind=engine)
+            print("=" * 60)
+            print("开始初始化数据库...")
+            print("=" * 60)
 
-        print("\n✅ 数据库初始化完成!")
-        print(f"📂 数据库文件位置: {engine.url.database}")
+            Base.metadata.create_all(bind=engine)
+            skipped_columns = _add_missing_columns()
+            _add_missing_indexes()
+            if skipped_columns:
+                logger.warning(
+                    f"存在无法自动新增的非空列, 未写入结构版本戳, 请手动迁移 - "
+                    f"columns: {skipped_columns}"
+                )
+                print(f"\n⚠️ 以下非空列需手动迁移: {', '.join(skipped_columns)}")
+                return True
+            version = write_schema_stamp()
+
+            print("\n✅ 数据库初始化完成!")
+            print(f"📂 数据库文件位置: {engine.url.database}")
+            print(f"🔖 结构版本: {version}")
+            return True
 
     except Exception as e:
         logger.error(f"初始化数据库失败:{e}")
         raise
+
+
+def _add_missing_columns() -> list:
+    """
+    为已存在的表补齐新增的可空列
+
+    create_all 不会修改已存在的表, 新增的可空字段通过 ALTER TABLE ADD COLUMN 补齐;
+    非空列(已有数据无法取值)不自动新增
+
+    Returns:
+        未能新增的列 ["表名.列名"]
+    """
+    skipped = []
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if not column.nullable:
+                    skipped.append(f"{table.name}.{column.name}")
+                    continue
+
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(
+                    text(
+                        f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                    )
+                )
+                print(f"  + 新增列: {table.name}.{column.name}")
+
+    return skipped
+
+
+# 已改名/移除的旧索引 (表名, 索引名): SQLite 索引名全库唯一, 需先删除旧索引
+# 只删除这里列出的索引, 运维手动添加的其他索引不受影响
+RETIRED_INDEXES = [
+    ("billing_records", "idx_user_created"),
+    ("recharge_records", "idx_user_status"),
+]
+
+
+def _add_missing_indexes():
+    """
+    同步已存在表的索引
+
+    create_all 不会为已存在的表创建索引; 先删除 RETIRED_INDEXES 中的旧索引, 再按名称补齐新增索引
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as conn:
+        for table_name, index_name in RETIRED_INDEXES:
+            if table_name not in existing_tables:
+                continue
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table_name)}
+            if index_name in existing_indexes:
+                conn.execute(text(f'DROP INDEX "{index_name}"'))
+                print(f"  - 删除旧索引: {table_name}.{index_name}")
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+
+            index.create(bind=engine)
+            print(f"  + 新增索引: {table.name}.{index.name}")
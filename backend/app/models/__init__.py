@@ -14,6 +14,8 @@ from .user_account import UserAccount
 from .recharge_record import RechargeRecord
 from .token_usage_record import TokenUsageRecord
 from .billing_record import BillingRecord
+from .ledger_batch import LedgerBatch
+from .ingest_job import IngestJob
 
 __all__ = [
     "BaseModel",
@@ -34,4 +36,6 @@ __all__ = [
     "RechargeRecord",
     "TokenUsageRecord",
     "BillingRecord",
+    "LedgerBatch",
+    "IngestJob",
 ]
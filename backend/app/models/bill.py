@@ -25,6 +25,9 @@ class Bill(BaseModel):
     
     __table_args__ = (
         Index('idx_workspace_trade_date', 'workspace_id', 'trade_date', 'is_deleted'),
+        # 支出时间序列覆盖索引(分桶/币种/卡号/金额均可从索引读取)
+        Index('idx_bill_timeseries', 'workspace_id', 'is_deleted', 'trade_date', 'status',
+              'currency', 'card_last4', 'amount_cny', 'amount_foreign'),
     )
     
     __repr_fields__ = ['id', 'bank', 'amount_foreign']
\ No newline at end of file
@@ -30,7 +30,10 @@ class BillingRecord(BaseModel):
 
     __table_args__ = (
         Index("idx_user_type", "user_openid", "billing_type", "is_deleted"),
-        Index("idx_user_created", "user_openid", "created_at", "is_deleted"),
+        # 扣费记录按 (created_at, id) 游标分页
+        Index(
+            "idx_billing_user_created", "user_openid", "is_deleted", "created_at", "id"
+        ),
     )
 
     __repr_fields__ = ["id", "user_openid", "amount"]
@@ -0,0 +1,42 @@
+from nanoid import generate
+from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, Index
+from .base import BaseModel
+
+
+class IngestJob(BaseModel):
+    """文件解析任务队列表(API 进程入队, python -m app.worker 消费)"""
+
+    __tablename__ = "ingest_jobs"
+
+    id = Column(
+        String(21), primary_key=True, default=lambda: generate(), comment="任务ID"
+    )
+    file_upload_id = Column(
+        String(21),
+        ForeignKey("file_uploads.id"),
+        nullable=False,
+        index=True,
+        comment="文件ID",
+    )
+    workspace_id = Column(String(21), nullable=False, comment="所属空间ID")
+    user_openid = Column(String(64), nullable=False, comment="上传者openid")
+
+    status = Column(
+        String(20),
+        nullable=False,
+        default="queued",
+        comment="任务状态: queued/running/done/failed",
+    )
+    attempts = Column(Integer, default=0, nullable=False, comment="已执行次数")
+    worker_id = Column(String(64), nullable=True, comment="领取任务的 worker")
+    started_at = Column(DateTime, nullable=True, comment="最近一次领取时间")
+    finished_at = Column(DateTime, nullable=True, comment="完成时间")
+    error = Column(Text, nullable=True, comment="失败原因")
+    trace_id = Column(String(64), nullable=True, comment="上传请求的追踪ID")
+
+    __table_args__ = (
+        # 按状态 + 入队时间领取任务
+        Index("idx_ingest_job_status", "status", "created_at"),
+    )
+
+    __repr_fields__ = ["id", "file_upload_id", "status"]
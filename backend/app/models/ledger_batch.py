@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, Integer
+from .base import BaseModel
+
+
+class LedgerBatch(BaseModel):
+    """用量账本批次表(写后批量落库的幂等标记, 用于崩溃后重放去重)"""
+
+    __tablename__ = "ledger_batches"
+
+    id = Column(String(21), primary_key=True, comment="批次ID(与日志文件名一致)")
+    events_count = Column(Integer, default=0, nullable=False, comment="批次事件数")
+
+    __repr_fields__ = ["id", "events_count"]
@@ -34,7 +34,7 @@ class RechargeRecord(BaseModel):
     remark = Column(Text, comment="备注")
 
     __table_args__ = (
-        Index("idx_user_status", "user_openid", "status", "is_deleted"),
+        Index("idx_recharge_user_status", "user_openid", "status", "is_deleted"),
         Index("idx_out_trade_no", "out_trade_no"),
     )
 
@@ -30,12 +30,20 @@ class TokenUsageRecord(BaseModel):
     )
 
     # Token消耗明细
-    api_type = Column(String(20), nullable=False, comment="API类型: refine/convert")
+    api_type = Column(String(20), nullable=False, comment="API类型: refine/convert/extract")
     model = Column(String(50), comment="模型名称")
     prompt_tokens = Column(Integer, default=0, comment="输入token数")
     completion_tokens = Column(Integer, default=0, comment="输出token数")
     total_tokens = Column(Integer, default=0, comment="总token数")
 
+    # Prompt压缩(本地预估, 每个文件记录在首次调用上)
+    raw_prompt_tokens_est = Column(
+        Integer, nullable=True, comment="压缩前账单内容token预估"
+    )
+    compacted_prompt_tokens_est = Column(
+        Integer, nullable=True, comment="压缩后账单内容token预估"
+    )
+
     # 计费信息
     unit_price = Column(DECIMAL(10, 2), comment="单价(元/千token)")
     cost = Column(DECIMAL(10, 2), comment="本次费用(元)")
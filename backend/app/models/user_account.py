@@ -1,5 +1,5 @@
 from nanoid import generate
-from sqlalchemy import Column, String, DECIMAL, ForeignKey, Index
+from sqlalchemy import Column, String, DECIMAL, DateTime, ForeignKey, Index
 from .base import BaseModel
 
 
@@ -30,6 +30,15 @@ class UserAccount(BaseModel):
     total_consumed = Column(
         DECIMAL(10, 2), default=0.00, nullable=False, comment="累计消费(元)"
     )
+    frozen_amount = Column(
+        DECIMAL(10, 2),
+        default=0.00,
+        nullable=True,
+        comment="冻结金额(处理中任务的预授权)",
+    )
+    frozen_at = Column(
+        DateTime, nullable=True, comment="最近一次冻结时间(超过有效期的冻结金额视为遗留)"
+    )
 
     # 状态
     status = Column(
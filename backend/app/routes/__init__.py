@@ -4,6 +4,7 @@ from .file import file_bp
 from .bill import bill_bp
 from .invitation import invitation_bp
 from .account import account_bp
+from .admin import admin_bp
 
 __all__ = [
     "auth_bp",
@@ -12,4 +13,5 @@ __all__ = [
     "bill_bp",
     "invitation_bp",
     "account_bp",
+    "admin_bp",
 ]
@@ -1,8 +1,8 @@
 """账户管理路由"""
 
-from io import BytesIO
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify
 from app.utils import jwt_required, get_logger
+from app.utils.export_stream import export_response
 from app.services import account_service, billing_service
 
 logger = get_logger(__name__)
@@ -64,11 +64,12 @@ def get_monthly_usage():
 @jwt_required
 def export_monthly_usage():
     """
-    导出月度用量Excel
-    GET /api/accounts/usage/export?month=2025-01
+    导出月度用量报表(CSV 流式输出, XLSX 先缓冲到磁盘临时文件)
+    GET /api/accounts/usage/export?month=2025-01&format=xlsx
     """
     try:
         month = request.args.get("month")
+        file_format = request.args.get("format", "xlsx")
 
         if not month:
             return jsonify({"success": False, "message": "月份参数不能为空"}), 400
@@ -84,19 +85,15 @@ def export_monthly_usage():
                 400,
             )
 
-        excel_bytes = account_service.export_monthly_usage(
-            openid=request.openid, month=month
-        )
-
-        filename = f"用量报表_{month}.xlsx"
+        if file_format not in ("xlsx", "csv"):
+            return jsonify({"success": False, "message": "导出格式仅支持xlsx/csv"}), 400
 
-        return send_file(
-            BytesIO(excel_bytes),
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            as_attachment=True,
-            download_name=filename,
+        chunks = account_service.export_monthly_usage(
+            openid=request.openid, month=month, file_format=file_format
         )
 
+        return export_response(chunks, f"用量报表_{month}.{file_format}", file_format)
+
     except ValueError as e:
         return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
@@ -110,11 +107,14 @@ def get_billing_records():
     """
     获取扣费记录(含文件信息)
     GET /api/accounts/billing/records?month=2025-01&page=1&page_size=20
+    游标分页: GET /api/accounts/billing/records?cursor=<next_cursor>&page_size=20&with_total=false
     """
     try:
         month = request.args.get("month")
         page = int(request.args.get("page", 1))
         page_size = int(request.args.get("page_size", 20))
+        cursor = request.args.get("cursor")
+        with_total = request.args.get("with_total", "true").lower() != "false"
 
         if page < 1:
             page = 1
@@ -122,7 +122,12 @@ def get_billing_records():
             page_size = 20
 
         result = billing_service.get_billing_records_with_file(
-            openid=request.openid, month=month, page=page, page_size=page_size
+            openid=request.openid,
+            month=month,
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            with_total=with_total,
         )
 
         return jsonify({"success": True, "data": result}), 200
@@ -133,3 +138,25 @@ def get_billing_records():
         logger.error(f"获取扣费记录异常 - error: {str(e)}")
         return jsonify({"success": False, "message": "查询失败"}), 500
 
+
+@account_bp.route("/usage/extract-modes", methods=["GET"])
+@jwt_required
+def get_extract_mode_stats():
+    """
+    对比单次提取与两步提取的每文件Token与耗时
+    GET /api/accounts/usage/extract-modes?month=2025-01
+    """
+    try:
+        month = request.args.get("month")
+
+        result = billing_service.get_extract_mode_stats(
+            openid=request.openid, month=month
+        )
+
+        return jsonify({"success": True, "data": result}), 200
+
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"查询提取模式对比异常 - error: {str(e)}")
+        return jsonify({"success": False, "message": "查询失败"}), 500
@@ -0,0 +1,52 @@
+"""管理接口路由"""
+
+from flask import Blueprint, request, jsonify
+from app.utils import get_logger
+from app.utils import profiling
+from app.utils.decorators import admin_required
+
+logger = get_logger(__name__)
+admin_bp = Blueprint("admin", __name__, url_prefix="/api/admin")
+
+
+@admin_bp.route("/profiling", methods=["GET"])
+@admin_required
+def get_profiling():
+    """
+    查询性能剖析设置
+    GET /api/admin/profiling
+    Headers: Authorization: Bearer <ADMIN_TOKEN>
+    """
+    return jsonify({"success": True, "data": profiling.get_settings()}), 200
+
+
+@admin_bp.route("/profiling", methods=["PUT"])
+@admin_required
+def update_profiling():
+    """
+    修改性能剖析设置(所有进程在数秒内生效)
+    PUT /api/admin/profiling
+    Headers: Authorization: Bearer <ADMIN_TOKEN>
+    Body: { enabled?: bool, slow_ms?: int, sample_rate?: float }
+    """
+    try:
+        data = request.get_json() or {}
+
+        enabled = data.get("enabled")
+        if enabled is not None and not isinstance(enabled, bool):
+            return jsonify({"success": False, "message": "enabled必须是布尔值"}), 400
+
+        slow_ms = data.get("slow_ms")
+        sample_rate = data.get("sample_rate")
+        settings = profiling.update_settings(
+            enabled=enabled,
+            slow_ms=int(slow_ms) if slow_ms is not None else None,
+            sample_rate=float(sample_rate) if sample_rate is not None else None,
+        )
+        return jsonify({"success": True, "data": settings}), 200
+
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"修改剖析设置异常 - error: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 500
@@ -1,7 +1,14 @@
 """账单管理路由"""
 
+from datetime import datetime
 from flask import Blueprint, request, jsonify
 from app.utils import get_logger, jwt_required
+from app.utils.export_stream import EXPORT_FORMATS, export_response
+from app.utils.arrow_export import (
+    COLUMNAR_FORMATS,
+    COLUMNAR_EXTENSIONS,
+    COLUMNAR_MIMETYPES,
+)
 from app.services import bill_service
 
 logger = get_logger(__name__)
@@ -13,18 +20,22 @@ bill_bp = Blueprint("bill", __name__, url_prefix="/api/bills")
 def get_settlement_summary():
     """
     获取结算汇总统计
-    GET /api/bills/settlement/summary?workspace_ids=id1,id2
+    GET /api/bills/settlement/summary?workspace_ids=id1,id2&group_by=workspace
     """
     try:
         workspace_ids_str = request.args.get("workspace_ids")
         workspace_ids = workspace_ids_str.split(",") if workspace_ids_str else None
 
         summary = bill_service.get_settlement_summary(
-            openid=request.openid, workspace_ids=workspace_ids
+            openid=request.openid,
+            workspace_ids=workspace_ids,
+            group_by=request.args.get("group_by"),
         )
 
         return jsonify({"success": True, "data": summary}), 200
 
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         logger.error(f"获取结算汇总异常 - error: {str(e)}")
         return jsonify({"success": False, "message": str(e)}), 500
@@ -75,6 +86,21 @@ def batch_confirm_bills():
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+def _get_bill_filters() -> dict:
+    """解析账单筛选参数(列表与导出共用)"""
+    workspace_ids_str = request.args.get("workspace_ids")
+    card_last4_str = request.args.get("card_last4_list")
+    status_str = request.args.get("status_list")
+
+    return {
+        "workspace_ids": workspace_ids_str.split(",") if workspace_ids_str else None,
+        "card_last4_list": card_last4_str.split(",") if card_last4_str else None,
+        "status_list": status_str.split(",") if status_str else None,
+        "start_date": request.args.get("start_date"),
+        "end_date": request.args.get("end_date"),
+    }
+
+
 @bill_bp.route("", methods=["GET"])
 @jwt_required
 def get_bills():
@@ -83,31 +109,14 @@ def get_bills():
     GET /api/bills?workspace_ids=id1,id2&card_last4_list=1234,5678&start_date=2025-01-01&end_date=2025-12-31&page=1&page_size=20&status=active
     """
     try:
-        # 获取查询参数
-        workspace_ids_str = request.args.get("workspace_ids")
-        workspace_ids = workspace_ids_str.split(",") if workspace_ids_str else None
-
-        card_last4_str = request.args.get("card_last4_list")
-        card_last4_list = card_last4_str.split(",") if card_last4_str else None
-
-        status_str = request.args.get("status_list")
-        status_list = status_str.split(",") if status_str else None
-
-        start_date = request.args.get("start_date")
-        end_date = request.args.get("end_date")
-
         page = int(request.args.get("page", 1))
         page_size = int(request.args.get("page_size", 20))
 
         result = bill_service.get_bills(
             openid=request.openid,
-            workspace_ids=workspace_ids,
-            card_last4_list=card_last4_list,
-            status_list=status_list,
-            start_date=start_date,
-            end_date=end_date,
             page=page,
             page_size=page_size,
+            **_get_bill_filters(),
         )
 
         return jsonify({"success": True, "data": result}), 200
@@ -119,6 +128,109 @@ def get_bills():
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+@bill_bp.route("/timeseries", methods=["GET"])
+@jwt_required
+def get_spending_timeseries():
+    """
+    按交易日分桶的支出时间序列
+    GET /api/bills/timeseries?interval=day|week|month&split_by=card_last4|workspace&workspace_ids=id1,id2&card_last4_list=1234&status_list=active&start_date=2025-01-01&end_date=2025-12-31
+    """
+    try:
+        result = bill_service.get_spending_timeseries(
+            openid=request.openid,
+            interval=request.args.get("interval", "day"),
+            split_by=request.args.get("split_by"),
+            **_get_bill_filters(),
+        )
+
+        return jsonify({"success": True, "data": result}), 200
+
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"获取支出时间序列异常 - error: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@bill_bp.route("/export", methods=["GET"])
+@jwt_required
+def export_bills():
+    """
+    按筛选条件导出账单(服务端游标读取; CSV/NDJSON 流式输出, XLSX 生成完成后才开始下载)
+    GET /api/bills/export?format=xlsx|csv|ndjson&workspace_ids=id1,id2&card_last4_list=1234&status_list=active&start_date=2025-01-01&end_date=2025-12-31
+    """
+    try:
+        file_format = request.args.get("format", "xlsx")
+        if file_format not in EXPORT_FORMATS:
+            return (
+                jsonify({"success": False, "message": "导出格式仅支持xlsx/csv/ndjson"}),
+                400,
+            )
+
+        chunks = bill_service.export_bills(
+            openid=request.openid, file_format=file_format, **_get_bill_filters()
+        )
+
+        filename = f"账单明细_{datetime.now().strftime('%Y%m%d%H%M%S')}.{file_format}"
+        return export_response(chunks, filename, file_format)
+
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"导出账单异常 - error: {str(e)}")
+        return jsonify({"success": False, "message": "导出失败"}), 500
+
+
+@bill_bp.route("/export/columnar", methods=["GET"])
+@jwt_required
+def export_bills_columnar():
+    """
+    导出空间账单为 Parquet / Arrow IPC(支持按 updated_at 水位线增量导出)
+    GET /api/bills/export/columnar?workspace_id=xxx&format=parquet|arrow&updated_since=2025-01-01T00:00:00&card_last4_list=1234&status_list=active&start_date=2025-01-01&end_date=2025-12-31
+    Response Headers: X-Export-Watermark 下次增量导出使用的 updated_since
+    """
+    try:
+        workspace_id = request.args.get("workspace_id")
+        file_format = request.args.get("format", "parquet")
+
+        if not workspace_id:
+            return jsonify({"success": False, "message": "workspace_id参数不能为空"}), 400
+
+        if file_format not in COLUMNAR_FORMATS:
+            return (
+                jsonify({"success": False, "message": "导出格式仅支持parquet/arrow"}),
+                400,
+            )
+
+        filters = _get_bill_filters()
+        filters.pop("workspace_ids")
+
+        chunks, watermark = bill_service.export_bills_columnar(
+            openid=request.openid,
+            workspace_id=workspace_id,
+            file_format=file_format,
+            updated_since=request.args.get("updated_since"),
+            **filters,
+        )
+
+        filename = (
+            f"账单明细_{workspace_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            f".{COLUMNAR_EXTENSIONS[file_format]}"
+        )
+        response = export_response(
+            chunks, filename, file_format, mimetype=COLUMNAR_MIMETYPES[file_format]
+        )
+        if watermark:
+            response.headers["X-Export-Watermark"] = watermark
+        return response
+
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"列式导出账单异常 - error: {str(e)}")
+        return jsonify({"success": False, "message": "导出失败"}), 500
+
+
 @bill_bp.route("/cards", methods=["GET"])
 @jwt_required
 def get_card_list():
@@ -5,6 +5,8 @@ from . import bill_service
 from . import invitation_service
 from . import account_service
 from . import billing_service
+from . import ledger_service
+from . import ingest_queue
 
 __all__ = [
     "auth_service",
@@ -14,4 +16,6 @@ __all__ = [
     "invitation_service",
     "account_service",
     "billing_service",
+    "ledger_service",
+    "ingest_queue",
 ]
@@ -3,13 +3,13 @@
 from datetime import datetime
 from nanoid import generate
 from decimal import Decimal
-from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
+from sqlalchemy import func
 from app.models import UserAccount, RechargeRecord, TokenUsageRecord
 from app.database import db_session, db_transaction
 from app.utils import get_logger
 from app.config import Config
+from app.utils.export_stream import iter_export
+from app.utils.timing import timed
 
 logger = get_logger(__name__)
 
@@ -51,6 +51,7 @@ def get_balance(openid: str) -> dict:
         return account.to_dict()
 
 
+@timed()
 def get_monthly_usage(openid: str, month: str) -> dict:
     """
     获取月度用量统计
@@ -87,50 +88,48 @@ def get_monthly_usage(openid: str, month: str) -> dict:
             end_date = start_date.replace(month=start_date.month + 1, day=1)
 
         with db_session() as db:
-            # 查询月度数据
-            records = (
-                db.query(TokenUsageRecord)
+            # 按日聚合(走 idx_user_created 索引)
+            day = func.date(TokenUsageRecord.created_at).label("date")
+            rows = (
+                db.query(
+                    day,
+                    func.coalesce(func.sum(TokenUsageRecord.cost), 0).label("amount"),
+                    func.count(TokenUsageRecord.id).label("api_calls"),
+                    func.coalesce(func.sum(TokenUsageRecord.total_tokens), 0).label(
+                        "tokens"
+                    ),
+                )
                 .filter(
                     TokenUsageRecord.user_openid == openid,
-                    TokenUsageRecord.is_deleted == False,
-                    TokenUsageRecord.status == "success",
                     TokenUsageRecord.created_at >= start_date,
                     TokenUsageRecord.created_at < end_date,
+                    TokenUsageRecord.is_deleted == False,
+                    TokenUsageRecord.status == "success",
                 )
+                .group_by(day)
+                .order_by(day)
                 .all()
             )
 
-            # 按日期分组统计
-            daily_map = {}
+            daily_stats = []
             total_amount = Decimal("0")
             total_calls = 0
             total_tokens = 0
 
-            for record in records:
-                date_key = record.created_at.strftime("%Y-%m-%d")
-
-                if date_key not in daily_map:
-                    daily_map[date_key] = {
-                        "date": date_key,
-                        "amount": Decimal("0"),
-                        "api_calls": 0,
-                        "tokens": 0,
+            for row in rows:
+                amount = Decimal(str(row.amount)).quantize(Decimal("0.01"))
+                daily_stats.append(
+                    {
+                        "date": str(row.date),
+                        "amount": float(amount),
+                        "api_calls": row.api_calls,
+                        "tokens": int(row.tokens),
                     }
+                )
 
-                daily_map[date_key]["amount"] += record.cost or Decimal("0")
-                daily_map[date_key]["api_calls"] += 1
-                daily_map[date_key]["tokens"] += record.total_tokens or 0
-
-                total_amount += record.cost or Decimal("0")
-                total_calls += 1
-                total_tokens += record.total_tokens or 0
-
-            # 转换为列表并排序
-            daily_stats = sorted(daily_map.values(), key=lambda x: x["date"])
-
-            # Decimal转float
-            for stat in daily_stats:
-                stat["amount"] = float(stat["amount"])
+                total_amount += amount
+                total_calls += row.api_calls
+                total_tokens += int(row.tokens)
 
             logger.info(
                 f"查询月度用量成功 - user: {openid}, month: {month}, calls: {total_calls}"
@@ -154,80 +153,42 @@ def get_monthly_usage(openid: str, month: str) -> dict:
         raise
 
 
-def export_monthly_usage(openid: str, month: str) -> bytes:
+def export_monthly_usage(openid: str, month: str, file_format: str = "xlsx"):
     """
-    导出月度用量Excel
+    导出月度用量报表(CSV 流式输出, XLSX 先缓冲到磁盘临时文件)
 
     Args:
         openid: 用户openid
         month: 月份 "YYYY-MM"
+        file_format: xlsx/csv
 
     Returns:
-        Excel文件字节流
+        文件字节块生成器
     """
 
-    # 获取用量数据
+    # 先查询用量数据, 参数错误在开始输出前抛出
     usage_data = get_monthly_usage(openid, month)
+    summary = usage_data["summary"]
 
-    # 创建工作簿
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "用量报表"
-
-    # 设置表头
-    headers = ["日期", "扣费金额(元)", "API调用次数", "Token消耗量"]
-    ws.append(headers)
-
-    # 表头样式
-    header_fill = PatternFill(
-        start_color="4472C4", end_color="4472C4", fill_type="solid"
+    rows = (
+        [stat["date"], stat["amount"], stat["api_calls"], stat["tokens"]]
+        for stat in usage_data["daily_stats"]
     )
-    header_font = Font(bold=True, color="FFFFFF")
-
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
 
-    # 填充数据
-    for stat in usage_data["daily_stats"]:
-        ws.append([stat["date"], stat["amount"], stat["api_calls"], stat["tokens"]])
+    logger.info(
+        f"导出月度用量 - user: {openid}, month: {month}, format: {file_format}"
+    )
 
-    # 添加汇总行
-    summary = usage_data["summary"]
-    ws.append(
-        [
+    return iter_export(
+        file_format,
+        ["日期", "扣费金额(元)", "API调用次数", "Token消耗量"],
+        rows,
+        sheet_title="用量报表",
+        column_widths=[15, 18, 18, 18],
+        summary_row=[
             "合计",
             summary["total_amount"],
             summary["total_api_calls"],
             summary["total_tokens"],
-        ]
-    )
-
-    # 汇总行样式
-    summary_row = ws.max_row
-    summary_fill = PatternFill(
-        start_color="FFC000", end_color="FFC000", fill_type="solid"
+        ],
     )
-    summary_font = Font(bold=True)
-
-    for cell in ws[summary_row]:
-        cell.fill = summary_fill
-        cell.font = summary_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-
-    # 调整列宽
-    ws.column_dimensions["A"].width = 15
-    ws.column_dimensions["B"].width = 18
-    ws.column_dimensions["C"].width = 18
-    ws.column_dimensions["D"].width = 18
-
-    # 保存到字节流
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    logger.info(f"导出月度用量成功 - user: {openid}, month: {month}")
-
-    return output.getvalue()
-
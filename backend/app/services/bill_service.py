@@ -1,13 +1,21 @@
 """账单管理服务"""
 
-from datetime import datetime
-from sqlalchemy import func, or_
-from app.models import Bill, FileUpload, WorkspaceMember, User
+import time
+from datetime import date, datetime
+from sqlalchemy import func, or_, and_, case
+from app.models import Bill, FileUpload, Workspace, WorkspaceMember, User
 from app.database import db_session, db_transaction
 from app.utils import get_logger, require_workspace_permission
+from app.utils.export_stream import iter_export
+from app.utils.arrow_export import build_schema, iter_columnar
+from app.utils import fx_rates
+from app.utils.timing import timed
 
 logger = get_logger(__name__)
 
+# 计入支出统计的账单状态(结算汇总、时间序列)
+SPEND_STATUSES = ["active", "modified", "payed"]
+
 
 def _apply_bill_updates(bill: Bill, data: dict, update_time: datetime = None) -> None:
     """
@@ -57,18 +65,120 @@ def _apply_bill_updates(bill: Bill, data: dict, update_time: datetime = None) ->
     bill.updated_at = update_time or datetime.now()
 
 
-def get_settlement_summary(openid: str, workspace_ids: list = None) -> dict:
+def _spend_expressions():
     """
-    获取结算汇总统计
+    支出统计的币种/金额表达式
+
+    有人民币金额计入 CNY, 否则按记账币种计入交易地金额
+
+    Returns:
+        (currency, amount, has_amount, rate_date)
+        has_amount 为可计入统计的过滤条件; rate_date 为折算汇率日期(人民币为 NULL, 分组时可合并)
+    """
+    has_cny = func.coalesce(Bill.amount_cny, 0) != 0
+    currency = case((has_cny, "CNY"), else_=Bill.currency)
+    amount = case((has_cny, Bill.amount_cny), else_=Bill.amount_foreign)
+    rate_date = case((has_cny, None), else_=Bill.trade_date)
+    has_amount = or_(
+        has_cny,
+        and_(
+            func.coalesce(Bill.amount_foreign, 0) != 0,
+            Bill.currency.isnot(None),
+            Bill.currency != "",
+        ),
+    )
+    return currency, amount, has_amount, rate_date
+
+
+def _to_date(value):
+    """CASE 表达式返回的日期为字符串, 转换为 date"""
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def _build_settlement(rows, cny_amounts: list) -> dict:
+    """
+    由 (currency, is_payed, amount) 聚合行组装结算汇总
+
+    Args:
+        rows: 聚合行
+        cny_amounts: 与 rows 对应的人民币折算金额(无汇率为 None)
+    """
+    total = {}
+    settled = {}
+    unsettled = {}
+    cny = {"total": 0.0, "settled": 0.0, "unsettled": 0.0}
+    unconverted = {}
+    for row, cny_amount in zip(rows, cny_amounts):
+        amount = float(row.amount or 0)
+        total[row.currency] = total.get(row.currency, 0) + amount
+        target = settled if row.is_payed else unsettled
+        target[row.currency] = target.get(row.currency, 0) + amount
+
+        if cny_amount is None:
+            unconverted[row.currency] = unconverted.get(row.currency, 0) + amount
+            continue
+        cny["total"] += cny_amount
+        cny["settled" if row.is_payed else "unsettled"] += cny_amount
+
+    if not total:
+        return {
+            "total": None,
+            "settled": None,
+            "unsettled": None,
+            "settled_percentage": None,
+            "total_cny": None,
+            "settled_cny": None,
+            "unsettled_cny": None,
+            "unconverted": None,
+        }
+
+    # 计算结算比例(按交易日汇率折算为人民币后计算)
+    settled_percentage = 0
+    if cny["total"] > 0:
+        settled_percentage = (cny["settled"] / cny["total"]) * 100
+
+    return {
+        "total": total,
+        "settled": settled,
+        "unsettled": unsettled,
+        "settled_percentage": round(settled_percentage, 2),
+        "total_cny": round(cny["total"], 2),
+        "settled_cny": round(cny["settled"], 2),
+        "unsettled_cny": round(cny["unsettled"], 2),
+        "unconverted": unconverted,
+    }
+
+
+@timed()
+def get_settlement_summary(
+    openid: str, workspace_ids: list = None, group_by: str = None
+) -> dict:
+    """
+    获取结算汇总统计(单次分组聚合查询)
+
+    Args:
+        openid: 用户openid
+        workspace_ids: 空间ID列表(可选)
+        group_by: "workspace" 时额外返回每个空间的汇总
 
     Returns:
         {
             'total': {...},  # 总金额
             'settled': {...},  # 已结算金额(payed)
             'unsettled': {...},  # 未结算金额(active/modified)
-            'settled_percentage': float  # 结算比例
+            'settled_percentage': float,  # 结算比例(人民币折算口径)
+            'total_cny' / 'settled_cny' / 'unsettled_cny': float,  # 按交易日汇率折算的人民币金额
+            'unconverted': {...},  # 缺少汇率未计入折算的金额
+            'workspaces': [  # 仅 group_by=workspace
+                {'workspace_id', 'workspace_name', 'total', 'settled', 'unsettled', 'settled_percentage'}
+            ]
         }
     """
+    if group_by and group_by != "workspace":
+        raise ValueError("group_by参数仅支持workspace")
+
     with db_session() as db:
         # 获取用户有权限的所有空间
         members = (
@@ -88,64 +198,133 @@ def get_settlement_summary(openid: str, workspace_ids: list = None) -> dict:
                 wid for wid in workspace_ids if wid in accessible_workspace_ids
             ]
 
-        # 查询所有已确认/已修改的账单
-        bills = (
-            db.query(Bill)
+        # 按 空间/币种/是否已结算/汇率日期 分组聚合已确认/已修改/已结算的账单
+        currency, amount, has_amount, rate_date = _spend_expressions()
+        is_payed = (Bill.status == "payed").label("is_payed")
+        group_columns = [
+            Bill.workspace_id,
+            currency.label("currency"),
+            is_payed,
+            rate_date.label("rate_date"),
+        ]
+
+        rows = (
+            db.query(*group_columns, func.sum(amount).label("amount"))
             .filter(
                 Bill.workspace_id.in_(accessible_workspace_ids),
                 Bill.is_deleted == False,
-                or_(
-                    Bill.status == "active",
-                    Bill.status == "modified",
-                    Bill.status == "payed",
-                ),
+                Bill.status.in_(SPEND_STATUSES),
+                has_amount,
             )
+            .group_by(*group_columns)
             .all()
         )
 
-        total = {}
-        settled = {}
-        unsettled = {}
-        if bills:
-            for bill in bills:
-                if bill.amount_cny:
-                    currency = "CNY"
-                    amount = float(bill.amount_cny)
-                elif bill.amount_foreign and bill.currency:
-                    currency = bill.currency
-                    amount = float(bill.amount_foreign)
-                else:
-                    continue
+        cny_amounts = fx_rates.to_cny(
+            [row.currency for row in rows],
+            [_to_date(row.rate_date) for row in rows],
+            [row.amount for row in rows],
+        )
+        summary = _build_settlement(rows, cny_amounts)
 
-                # 总计
-                total[currency] = total.get(currency, 0) + amount
+        if group_by == "workspace":
+            workspace_names = dict(
+                db.query(Workspace.id, Workspace.name)
+                .filter(Workspace.id.in_(accessible_workspace_ids))
+                .all()
+            )
+            rows_by_workspace = {}
+            for row, cny_amount in zip(rows, cny_amounts):
+                grouped = rows_by_workspace.setdefault(row.workspace_id, ([], []))
+                grouped[0].append(row)
+                grouped[1].append(cny_amount)
+
+            summary["workspaces"] = [
+                {
+                    "workspace_id": workspace_id,
+                    "workspace_name": workspace_names.get(workspace_id),
+                    **_build_settlement(*rows_by_workspace.get(workspace_id, ([], []))),
+                }
+                for workspace_id in accessible_workspace_ids
+            ]
+
+        return summary
 
-                # 分类统计
-                if bill.status == "payed":
-                    settled[currency] = settled.get(currency, 0) + amount
-                else:
-                    unsettled[currency] = unsettled.get(currency, 0) + amount
 
-            # 计算结算比例(以CNY为基准)
-            settled_percentage = 0
-            if total.get("CNY", 0) > 0:
-                settled_percentage = (settled.get("CNY", 0) / total.get("CNY", 0)) * 100
+def _build_bill_query(
+    db,
+    openid: str,
+    workspace_ids: list = None,
+    card_last4_list: list = None,
+    status_list: list = None,
+    start_date: str = None,
+    end_date: str = None,
+    query=None,
+    include_deleted: bool = False,
+):
+    """
+    构建账单筛选查询(列表、导出共用)
 
-            return {
-                "total": total,
-                "settled": settled,
-                "unsettled": unsettled,
-                "settled_percentage": round(settled_percentage, 2),
-            }
+    Args:
+        db: 数据库会话
+        query: 基础查询(默认 db.query(Bill))
+        include_deleted: 是否包含已删除账单(增量同步需要下发删除)
 
-        return {
-            "total": None,
-            "settled": None,
-            "unsettled": None,
-            "settled_percentage": None,
-        }
+    Returns:
+        筛选后的查询; 指定空间均无权限时返回 None
+    """
+    # 获取用户有权限的所有空间
+    members = (
+        db.query(WorkspaceMember)
+        .filter(
+            WorkspaceMember.member_openid == openid,
+            WorkspaceMember.is_deleted == False,
+        )
+        .all()
+    )
+
+    accessible_workspace_ids = [m.workspace_id for m in members]
+
+    # 构建基础查询
+    query = query if query is not None else db.query(Bill)
+    query = query.filter(Bill.workspace_id.in_(accessible_workspace_ids))
+    if not include_deleted:
+        query = query.filter(Bill.is_deleted == False)
+
+    # 筛选:指定空间
+    if workspace_ids:
+        filtered_ids = [wid for wid in workspace_ids if wid in accessible_workspace_ids]
+        if not filtered_ids:
+            return None
+        query = query.filter(Bill.workspace_id.in_(filtered_ids))
+
+    # 筛选:卡号
+    if card_last4_list:
+        query = query.filter(Bill.card_last4.in_(card_last4_list))
+
+    # 筛选:状态
+    if status_list:
+        query = query.filter(Bill.status.in_(status_list))
 
+    # 筛选:日期范围
+    if start_date:
+        try:
+            start_dt = datetime.strptime(start_date, "%Y-%m-%d").date()
+            query = query.filter(Bill.trade_date >= start_dt)
+        except ValueError:
+            pass
+
+    if end_date:
+        try:
+            end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
+            query = query.filter(Bill.trade_date <= end_dt)
+        except ValueError:
+            pass
 
+    return query
+
+
+@timed()
 def get_bills(
     openid: str,
     workspace_ids: list = None,
@@ -174,54 +353,11 @@ def get_bills(
     """
     with db_session() as db:
 
-        # 获取用户有权限的所有空间
-        members = (
-            db.query(WorkspaceMember)
-            .filter(
-                WorkspaceMember.member_openid == openid,
-                WorkspaceMember.is_deleted == False,
-            )
-            .all()
-        )
-
-        accessible_workspace_ids = [m.workspace_id for m in members]
-
-        # 构建基础查询
-        query = db.query(Bill).filter(
-            Bill.workspace_id.in_(accessible_workspace_ids), Bill.is_deleted == False
+        query = _build_bill_query(
+            db, openid, workspace_ids, card_last4_list, status_list, start_date, end_date
         )
-
-        # 筛选:指定空间
-        if workspace_ids:
-            filtered_ids = [
-                wid for wid in workspace_ids if wid in accessible_workspace_ids
-            ]
-            if not filtered_ids:
-                return {"total": 0, "page": page, "page_size": page_size, "items": []}
-            query = query.filter(Bill.workspace_id.in_(filtered_ids))
-
-        # 筛选:卡号
-        if card_last4_list:
-            query = query.filter(Bill.card_last4.in_(card_last4_list))
-
-        # 筛选:状态
-        if status_list:
-            query = query.filter(Bill.status.in_(status_list))
-
-        # 筛选:日期范围
-        if start_date:
-            try:
-                start_dt = datetime.strptime(start_date, "%Y-%m-%d").date()
-                query = query.filter(Bill.trade_date >= start_dt)
-            except ValueError:
-                pass
-
-        if end_date:
-            try:
-                end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
-                query = query.filter(Bill.trade_date <= end_dt)
-            except ValueError:
-                pass
+        if query is None:
+            return {"total": 0, "page": page, "page_size": page_size, "items": []}
 
         # 统计总数
         total = query.count()
@@ -243,6 +379,441 @@ def get_bills(
         }
 
 
+EXPORT_HEADERS = [
+    "空间",
+    "发卡行",
+    "交易日",
+    "记账日",
+    "交易摘要",
+    "人民币金额",
+    "卡号末四位",
+    "交易地金额",
+    "记账币种",
+    "状态",
+    "结算备注",
+    "折合人民币(元)",
+]
+
+# NDJSON 导出字段名(与 EXPORT_HEADERS 一一对应)
+EXPORT_FIELDS = [
+    "workspace",
+    "bank",
+    "trade_date",
+    "record_date",
+    "description",
+    "amount_cny",
+    "card_last4",
+    "amount_foreign",
+    "currency",
+    "status",
+    "remark",
+    "amount_cny_equivalent",
+]
+
+EXPORT_COLUMNS = [
+    Bill.workspace_id,
+    Bill.bank,
+    Bill.trade_date,
+    Bill.record_date,
+    Bill.description,
+    Bill.amount_cny,
+    Bill.card_last4,
+    Bill.amount_foreign,
+    Bill.currency,
+    Bill.status,
+    Bill.remark,
+]
+
+EXPORT_COLUMN_WIDTHS = [18, 14, 12, 12, 40, 14, 12, 14, 10, 10, 24, 16]
+
+# 服务端游标每次读取的行数
+EXPORT_BATCH_SIZE = 1000
+
+
+def _iter_export_rows(
+    openid: str,
+    workspace_ids: list = None,
+    card_last4_list: list = None,
+    status_list: list = None,
+    start_date: str = None,
+    end_date: str = None,
+):
+    """
+    通过服务端游标逐批读取账单并生成导出行
+
+    只查询导出列(不构造 ORM 对象), 会话随生成器结束关闭
+    """
+    with db_session() as db:
+        query = _build_bill_query(
+            db,
+            openid,
+            workspace_ids,
+            card_last4_list,
+            status_list,
+            start_date,
+            end_date,
+            query=db.query(*EXPORT_COLUMNS),
+        )
+        if query is None:
+            return
+
+        # 只查询导出范围内的空间名称(用户所在空间, 指定空间时再取交集)
+        name_query = db.query(Workspace.id, Workspace.name).filter(
+            Workspace.id.in_(
+                db.query(WorkspaceMember.workspace_id).filter(
+                    WorkspaceMember.member_openid == openid,
+                    WorkspaceMember.is_deleted == False,
+                )
+            )
+        )
+        if workspace_ids:
+            name_query = name_query.filter(Workspace.id.in_(workspace_ids))
+        workspace_names = dict(name_query.all())
+
+        rows = (
+            query.order_by(Bill.trade_date.desc(), Bill.created_at.desc())
+            .execution_options(stream_results=True)
+            .yield_per(EXPORT_BATCH_SIZE)
+        )
+
+        rows = (
+            [workspace_names.get(row[0], row[0]), *row[1:]] for row in rows
+        )
+        # 追加按交易日汇率折算的人民币金额
+        yield from fx_rates.append_cny(
+            rows,
+            lambda row: _spend_key(row[5], row[8], row[7], row[2]),
+            EXPORT_BATCH_SIZE,
+        )
+
+
+def _spend_key(amount_cny, currency, amount_foreign, trade_date) -> tuple:
+    """单张账单的计费口径 (currency, trade_date, amount), 与 _spend_expressions 一致"""
+    if amount_cny:
+        return "CNY", trade_date, amount_cny
+    return currency, trade_date, amount_foreign
+
+
+def _log_throughput(rows, openid: str, file_format: str):
+    """透传导出行, 结束(含客户端中断)时记录导出行数与吞吐"""
+    count = 0
+    start_time = time.perf_counter()
+
+    try:
+        for row in rows:
+            count += 1
+            yield row
+    finally:
+        rows.close()
+        elapsed = time.perf_counter() - start_time
+        rows_per_sec = int(count / elapsed) if elapsed else 0
+        logger.info(
+            f"账单导出完成 - user: {openid}, format: {file_format}, rows: {count}, "
+            f"elapsed_ms: {int(elapsed * 1000)}, rows_per_sec: {rows_per_sec}"
+        )
+
+
+def export_bills(
+    openid: str,
+    file_format: str = "xlsx",
+    workspace_ids: list = None,
+    card_last4_list: list = None,
+    status_list: list = None,
+    start_date: str = None,
+    end_date: str = None,
+):
+    """
+    按筛选条件导出账单(内存占用与账单数量无关; CSV/NDJSON 流式输出, XLSX 先缓冲到磁盘临时文件)
+
+    Args:
+        openid: 用户openid
+        file_format: xlsx/csv/ndjson
+        其余参数同 get_bills
+
+    Returns:
+        文件字节块生成器
+    """
+    logger.info(
+        f"导出账单 - user: {openid}, format: {file_format}, "
+        f"workspace_ids: {workspace_ids}, start_date: {start_date}, end_date: {end_date}"
+    )
+
+    rows = _iter_export_rows(
+        openid, workspace_ids, card_last4_list, status_list, start_date, end_date
+    )
+    rows = _log_throughput(rows, openid, file_format)
+    return iter_export(
+        file_format,
+        EXPORT_HEADERS,
+        rows,
+        fields=EXPORT_FIELDS,
+        sheet_title="账单明细",
+        column_widths=EXPORT_COLUMN_WIDTHS,
+    )
+
+
+# 列式导出字段(字段名, Arrow 类型); bank/currency/card_last4/status 为低基数列, 字典编码
+COLUMNAR_FIELDS = [
+    ("id", "string"),
+    ("workspace_id", "dictionary"),
+    ("file_upload_id", "string"),
+    ("bank", "dictionary"),
+    ("trade_date", "date"),
+    ("record_date", "date"),
+    ("description", "string"),
+    ("amount_cny", "decimal"),
+    ("card_last4", "dictionary"),
+    ("amount_foreign", "decimal"),
+    ("currency", "dictionary"),
+    ("status", "dictionary"),
+    ("remark", "string"),
+    ("created_at", "timestamp"),
+    ("updated_at", "timestamp"),
+    ("is_deleted", "bool"),
+]
+
+
+def _iter_columnar_rows(
+    openid: str,
+    workspace_id: str,
+    updated_since: datetime = None,
+    watermark: datetime = None,
+    **filters,
+):
+    """按 (updated_at, id) 顺序通过服务端游标读取列式导出行"""
+    columns = [getattr(Bill, name) for name, _ in COLUMNAR_FIELDS]
+
+    with db_session() as db:
+        query = _build_bill_query(
+            db,
+            openid,
+            [workspace_id],
+            query=db.query(*columns),
+            include_deleted=updated_since is not None,
+            **filters,
+        )
+        if query is None:
+            return
+
+        if updated_since:
+            query = query.filter(Bill.updated_at > updated_since)
+        if watermark:
+            query = query.filter(Bill.updated_at <= watermark)
+
+        rows = (
+            query.order_by(Bill.updated_at, Bill.id)
+            .execution_options(stream_results=True)
+            .yield_per(EXPORT_BATCH_SIZE)
+        )
+        yield from fx_rates.append_cny(
+            rows,
+            lambda row: _spend_key(row[7], row[10], row[9], row[4]),
+            EXPORT_BATCH_SIZE,
+        )
+
+
+def export_bills_columnar(
+    openid: str,
+    workspace_id: str,
+    file_format: str = "parquet",
+    updated_since: str = None,
+    card_last4_list: list = None,
+    status_list: list = None,
+    start_date: str = None,
+    end_date: str = None,
+) -> tuple:
+    """
+    导出空间账单为 Parquet / Arrow IPC(供数据分析使用)
+
+    指定 updated_since 时为增量导出: 只包含 updated_at 晚于水位线的账单(含已删除, 通过 is_deleted 下发),
+    下次同步使用本次返回的 watermark
+
+    Args:
+        openid: 用户openid
+        workspace_id: 空间ID
+        file_format: parquet/arrow
+        updated_since: 上次同步的水位线(ISO 格式时间)
+        其余参数同 get_bills
+
+    Returns:
+        (文件字节块生成器, watermark) watermark 为本次导出的 updated_at 上限(ISO 格式), 无数据时原样返回 updated_since
+
+    Raises:
+        ValueError: 无权限/水位线格式错误/未安装 pyarrow
+    """
+    require_workspace_permission(workspace_id, openid)
+
+    since = None
+    if updated_since:
+        try:
+            since = datetime.fromisoformat(updated_since)
+        except ValueError:
+            raise ValueError("updated_since格式错误，请使用 ISO 格式时间")
+
+    filters = {
+        "card_last4_list": card_last4_list,
+        "status_list": status_list,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+
+    # 先确定本次导出的上限, 导出期间新修改的账单留给下次同步
+    with db_session() as db:
+        query = _build_bill_query(
+            db,
+            openid,
+            [workspace_id],
+            query=db.query(func.max(Bill.updated_at)),
+            include_deleted=since is not None,
+            **filters,
+        )
+        if since:
+            query = query.filter(Bill.updated_at > since)
+        watermark = query.scalar()
+
+    logger.info(
+        f"列式导出账单 - user: {openid}, workspace: {workspace_id}, format: {file_format}, "
+        f"updated_since: {updated_since}, watermark: {watermark}"
+    )
+
+    schema = build_schema([*COLUMNAR_FIELDS, ("amount_cny_equivalent", "float")])
+    rows = _iter_columnar_rows(
+        openid, workspace_id, updated_since=since, watermark=watermark, **filters
+    )
+    rows = _log_throughput(rows, openid, file_format)
+    chunks = iter_columnar(file_format, schema, rows)
+
+    return chunks, watermark.isoformat() if watermark else updated_since
+
+
+# 时间序列分桶表达式(SQLite), 周以周一为起点
+TIMESERIES_BUCKETS = {
+    "day": lambda column: func.date(column),
+    "week": lambda column: func.date(column, "-6 days", "weekday 1"),
+    "month": lambda column: func.strftime("%Y-%m", column),
+}
+
+TIMESERIES_SPLITS = {"card_last4": Bill.card_last4, "workspace": Bill.workspace_id}
+
+
+@timed()
+def get_spending_timeseries(
+    openid: str,
+    interval: str = "day",
+    split_by: str = None,
+    workspace_ids: list = None,
+    card_last4_list: list = None,
+    status_list: list = None,
+    start_date: str = None,
+    end_date: str = None,
+) -> dict:
+    """
+    按交易日分桶统计支出(SQL 聚合)
+
+    币种口径与结算汇总一致(见 _spend_expressions)
+
+    Args:
+        openid: 用户openid
+        interval: 分桶粒度 day/week/month
+        split_by: 额外拆分维度 card_last4/workspace(可选)
+        status_list: 账单状态(默认 active/modified/payed)
+        其余参数同 get_bills
+
+    Returns:
+        {
+            "interval": "day",
+            "split_by": None,
+            "items": [
+                {
+                    "bucket": "2025-01-01",
+                    "currency": "USD",
+                    "amount": 100.0,
+                    "amount_cny": 730.0,  # 按交易日汇率折算, 缺少汇率时为 None
+                    "count": 3
+                }
+            ]
+        }
+    """
+    if interval not in TIMESERIES_BUCKETS:
+        raise ValueError("interval参数仅支持day/week/month")
+    if split_by and split_by not in TIMESERIES_SPLITS:
+        raise ValueError("split_by参数仅支持card_last4/workspace")
+
+    currency, amount, has_amount, rate_date = _spend_expressions()
+    currency = currency.label("currency")
+    bucket = TIMESERIES_BUCKETS[interval](Bill.trade_date).label("bucket")
+
+    columns = [bucket, currency]
+    if split_by:
+        columns.append(TIMESERIES_SPLITS[split_by].label("split"))
+    # 外币额外按交易日分组, 按交易日汇率折算后再合并到分桶
+    group_columns = [*columns, rate_date.label("rate_date")]
+
+    with db_session() as db:
+        query = _build_bill_query(
+            db,
+            openid,
+            workspace_ids,
+            card_last4_list,
+            status_list or SPEND_STATUSES,
+            start_date,
+            end_date,
+            query=db.query(
+                *group_columns,
+                func.sum(amount).label("amount"),
+                func.count().label("count"),
+            ),
+        )
+
+        items = {}
+        if query is not None:
+            rows = (
+                query.filter(Bill.trade_date.isnot(None), has_amount)
+                .group_by(*group_columns)
+                .order_by(*columns)
+                .all()
+            )
+
+            cny_amounts = fx_rates.to_cny(
+                [row.currency for row in rows],
+                [_to_date(row.rate_date) for row in rows],
+                [row.amount for row in rows],
+            )
+
+            for row, cny_amount in zip(rows, cny_amounts):
+                key = (row.bucket, row.currency, row.split if split_by else None)
+                item = items.get(key)
+                if item is None:
+                    item = items[key] = {
+                        "bucket": row.bucket,
+                        "currency": row.currency,
+                        "amount": 0.0,
+                        "amount_cny": 0.0,
+                        "count": 0,
+                    }
+                    if split_by:
+                        item[split_by] = row.split
+
+                item["amount"] += float(row.amount or 0)
+                item["count"] += row.count
+                if cny_amount is None or item["amount_cny"] is None:
+                    item["amount_cny"] = None
+                else:
+                    item["amount_cny"] += cny_amount
+
+            for item in items.values():
+                item["amount"] = round(item["amount"], 2)
+                if item["amount_cny"] is not None:
+                    item["amount_cny"] = round(item["amount_cny"], 2)
+
+        return {
+            "interval": interval,
+            "split_by": split_by,
+            "items": list(items.values()),
+        }
+
+
+@timed()
 def get_card_list(openid: str, workspace_ids: list = None) -> list:
     """
     获取卡号列表(用于筛选下拉)
@@ -289,6 +860,7 @@ def get_card_list(openid: str, workspace_ids: list = None) -> list:
         return [{"card_last4": card, "count": count} for card, count in results]
 
 
+@timed()
 def batch_confirm_bills(
     workspace_id: str, file_id: str, bill_ids: list, openid: str
 ) -> dict:
@@ -404,6 +976,7 @@ def update_bill(openid: str, workspace_id: str, bill_id: str, update_data: dict)
         return bill.to_dict()
 
 
+@timed()
 def batch_update_bills(workspace_id: str, updates: list, openid: str) -> dict:
     """
     批量更新账单
@@ -477,6 +1050,7 @@ def batch_update_bills(workspace_id: str, updates: list, openid: str) -> dict:
     }
 
 
+@timed()
 def batch_create_bills(workspace_id: str, bills_data: list, openid: str) -> dict:
     """
     批量创建账单
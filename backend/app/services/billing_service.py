@@ -1,7 +1,15 @@
 """计费服务"""
 
+import base64
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from decimal import Decimal, ROUND_HALF_UP
 from datetime import datetime
+from threading import Lock
+from sqlalchemy import func, case, or_
+from sqlalchemy.exc import OperationalError
 from app.models import (
     UserAccount,
     BillingRecord,
@@ -13,6 +21,10 @@ from app.database import db_transaction
 from app.utils import get_logger
 from app.config import Config
 from app.database import db_session
+from app.services import ledger_service
+from app.utils.timing import timed
+from app.utils import metrics
+from app.utils.billing_checker import get_active_frozen
 
 logger = get_logger(__name__)
 
@@ -23,6 +35,66 @@ def get_token_unit_price(model_name: str) -> float:
     return Decimal(str(price))
 
 
+def _build_token_record(
+    openid: str,
+    workspace_id: str,
+    file_upload_id: str,
+    api_type: str,
+    response,
+    response_time: int = None,
+    compaction: dict = None,
+) -> TokenUsageRecord:
+    """根据API响应构建Token使用记录(含费用计算, 不落库)"""
+    # 提取Token数据
+    usage = response.usage
+    total_tokens = usage.total_tokens
+
+    # 计算费用
+    unit_price = get_token_unit_price(response.model)
+    cost = ((Decimal(str(total_tokens)) / Decimal("1000")) * unit_price).quantize(
+        Decimal("0.01"), rounding=ROUND_HALF_UP
+    )
+    logger.info(f"计算费用 cost: {cost}")
+
+    return TokenUsageRecord(
+        user_openid=openid,
+        workspace_id=workspace_id,
+        file_upload_id=file_upload_id,
+        api_type=api_type,
+        model=response.model,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+        total_tokens=total_tokens,
+        raw_prompt_tokens_est=(compaction or {}).get("tokens_before"),
+        compacted_prompt_tokens_est=(compaction or {}).get("tokens_after"),
+        unit_price=unit_price,
+        cost=cost,
+        request_id=response.id,
+        response_time=response_time,
+        status="success",
+    )
+
+
+def _build_failed_token_record(
+    openid: str, workspace_id: str, file_upload_id: str, api_type: str, response, error
+) -> TokenUsageRecord:
+    """构建失败的Token使用记录"""
+    return TokenUsageRecord(
+        user_openid=openid,
+        workspace_id=workspace_id,
+        file_upload_id=file_upload_id,
+        api_type=api_type,
+        model=getattr(response, "model", None),
+        prompt_tokens=0,
+        completion_tokens=0,
+        total_tokens=0,
+        unit_price=None,
+        cost=0,
+        status="failed",
+        error_message=str(error),
+    )
+
+
 def record_token_usage(
     openid: str,
     workspace_id: str,
@@ -30,6 +102,7 @@ def record_token_usage(
     api_type: str,
     response,
     request_start_time: datetime = None,
+    compaction: dict = None,
 ) -> dict:
     """
     记录Token使用 + 自动扣费
@@ -38,26 +111,15 @@ def record_token_usage(
         openid: 用户openid
         workspace_id: 工作空间ID
         file_upload_id: 文件ID
-        api_type: 'refine' | 'convert'
+        api_type: 'refine' | 'convert' | 'extract'
         response: OpenAI API响应对象
         request_start_time: 请求开始时间(用于计算响应时间)
+        compaction: Prompt压缩统计 {'tokens_before', 'tokens_after'} (可选)
 
     Returns:
         {'token_record_id', 'cost', 'balance_after'}
     """
     try:
-        # 提取Token数据
-        usage = response.usage
-        prompt_tokens = usage.prompt_tokens
-        completion_tokens = usage.completion_tokens
-        total_tokens = usage.total_tokens
-
-        # 计算费用
-        unit_price = get_token_unit_price(response.model)
-        cost = ((Decimal(str(total_tokens)) / Decimal("1000")) * unit_price).quantize(
-            Decimal("0.01"), rounding=ROUND_HALF_UP
-        )
-        logger.info("计算费用 cost: ", cost)
         # 计算响应时间
         response_time = None
         if request_start_time:
@@ -65,32 +127,44 @@ def record_token_usage(
                 (datetime.now() - request_start_time).total_seconds() * 1000
             )
 
+        # 写后模式: 仅写入本地账本, 由后台线程批量落库
+        if Config.LEDGER_WRITE_BEHIND:
+            token_record = _build_token_record(
+                openid,
+                workspace_id,
+                file_upload_id,
+                api_type,
+                response,
+                response_time=response_time,
+                compaction=compaction,
+            )
+            return {
+                "token_record_id": ledger_service.enqueue_usage(token_record),
+                "cost": float(token_record.cost),
+                "balance_after": None,
+            }
+
         with db_transaction() as db:
             # 记录Token使用
-            token_record = TokenUsageRecord(
-                user_openid=openid,
-                workspace_id=workspace_id,
-                file_upload_id=file_upload_id,
-                api_type=api_type,
-                model=response.model,
-                prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens,
-                total_tokens=total_tokens,
-                unit_price=unit_price,
-                cost=cost,
-                request_id=response.id,
+            token_record = _build_token_record(
+                openid,
+                workspace_id,
+                file_upload_id,
+                api_type,
+                response,
                 response_time=response_time,
-                status="success",
+                compaction=compaction,
             )
             db.add(token_record)
             db.flush()
 
             # 自动扣费
+            cost = token_record.cost
             balance_after = _deduct_balance(db, openid, cost, token_record.id)
 
             logger.info(
                 f"Token使用记录成功 - user: {openid}, api_type: {api_type}, "
-                f"tokens: {total_tokens}, cost: {cost:.4f}, balance: {balance_after}"
+                f"tokens: {token_record.total_tokens}, cost: {cost:.4f}, balance: {balance_after}"
             )
 
             return {
@@ -103,24 +177,31 @@ def record_token_usage(
         logger.error(f"记录Token使用失败 - error: {str(e)}")
         # 记录失败的Token使用
         with db_transaction() as db:
-            token_record = TokenUsageRecord(
-                user_openid=openid,
-                workspace_id=workspace_id,
-                file_upload_id=file_upload_id,
-                api_type=api_type,
-                model=response.model,
-                prompt_tokens=0,
-                completion_tokens=0,
-                total_tokens=0,
-                unit_price=None,
-                cost=0,
-                status="failed",
-                error_message=str(e),
+            db.add(
+                _build_failed_token_record(
+                    openid, workspace_id, file_upload_id, api_type, response, e
+                )
             )
-            db.add(token_record)
         raise
 
 
+def _lock_account(db, openid: str) -> UserAccount:
+    """获取账户(行级锁), 首次使用自动创建"""
+    account = (
+        db.query(UserAccount)
+        .filter(UserAccount.user_openid == openid, UserAccount.is_deleted == False)
+        .with_for_update()
+        .first()
+    )
+
+    if not account:
+        account = UserAccount(user_openid=openid, balance=0.00, frozen_amount=0.00)
+        db.add(account)
+        db.flush()
+
+    return account
+
+
 def _deduct_balance(db, openid: str, amount: float, token_usage_id: str) -> float:
     """
     从用户账户扣除费用
@@ -131,19 +212,13 @@ def _deduct_balance(db, openid: str, amount: float, token_usage_id: str) -> floa
     Raises:
         ValueError: 余额不足
     """
-    # 获取账户(行级锁)
-    account = (
-        db.query(UserAccount)
-        .filter(UserAccount.user_openid == openid, UserAccount.is_deleted == False)
-        .with_for_update()
-        .first()
-    )
+    account = _lock_account(db, openid)
+    return _charge_account(db, account, amount, token_usage_id)
 
-    if not account:
-        # 首次使用自动创建账户
-        account = UserAccount(user_openid=openid, balance=0.00)
-        db.add(account)
-        db.flush()
+
+def _charge_account(db, account: UserAccount, amount, token_usage_id: str):
+    """对已加锁的账户扣费并写入扣费记录, 返回扣费后余额"""
+    openid = account.user_openid
 
     # 余额检查
     if account.balance < amount:
@@ -174,23 +249,424 @@ def _deduct_balance(db, openid: str, amount: float, token_usage_id: str) -> floa
     return balance_after
 
 
+# ==================== 任务余额预授权 ====================
+
+# 可用余额低于该值时拒绝调用(与 check_balance_sufficient 保持一致)
+MIN_AVAILABLE_BALANCE = Decimal("0.2")
+# 每次调用预留的Token(Prompt模板 + 最大输出), 用于预估任务费用
+RESERVE_TOKENS_PER_CALL = 4000
+# 结算遇到数据库锁等临时错误时的重试次数与间隔(秒, 按次数递增)
+SETTLE_RETRIES = 3
+SETTLE_RETRY_DELAY = 0.5
+
+# 当前线程正在执行的任务预授权(由 balance_reservation 设置, DeepSeek 装饰器读取)
+_active_reservation = ContextVar("active_reservation", default=None)
+
+
+class BalanceReservation:
+    """单个处理任务的余额预授权, 任务内的Token消耗先记在内存, 结束时一次结算"""
+
+    def __init__(self, openid: str, hold_amount: Decimal):
+        self.openid = openid
+        self.hold_amount = hold_amount
+        self.usages = []
+
+    def add_usage(
+        self,
+        workspace_id: str,
+        file_upload_id: str,
+        api_type: str,
+        response,
+        response_time: int = None,
+        compaction: dict = None,
+    ) -> None:
+        self.usages.append(
+            {
+                "workspace_id": workspace_id,
+                "file_upload_id": file_upload_id,
+                "api_type": api_type,
+                "response": response,
+                "response_time": response_time,
+                "compaction": compaction,
+            }
+        )
+
+    def token_summary(self) -> dict:
+        """
+        任务内成功调用的次数与Token消耗(按内存中的记录统计, 写后模式下无需等待落库)
+
+        Returns:
+            {'api_calls', 'total_tokens'}
+        """
+        usages = [getattr(item["response"], "usage", None) for item in self.usages]
+        usages = [usage for usage in usages if usage is not None]
+        return {
+            "api_calls": len(usages),
+            "total_tokens": sum(usage.total_tokens or 0 for usage in usages),
+        }
+
+
+def get_active_reservation():
+    """获取当前线程的任务预授权, 不在任务内时返回 None"""
+    return _active_reservation.get()
+
+
+def estimate_job_cost(content_tokens: int, api_calls: int) -> Decimal:
+    """预估任务费用: 账单内容Token + 每次调用的预留Token"""
+    tokens = content_tokens + api_calls * RESERVE_TOKENS_PER_CALL
+    unit_price = get_token_unit_price(Config.DEEPSEEK_CHAT_MODEL)
+    return ((Decimal(tokens) / Decimal("1000")) * unit_price).quantize(
+        Decimal("0.01"), rounding=ROUND_HALF_UP
+    )
+
+
+def reserve_balance(openid: str, amount: Decimal) -> BalanceReservation:
+    """
+    冻结任务预估费用(单个事务)
+
+    Raises:
+        ValueError: 可用余额(余额 - 冻结金额)不足
+    """
+    with db_transaction() as db:
+        account = _lock_account(db, openid)
+        frozen = get_active_frozen(account)
+        if frozen != (account.frozen_amount or Decimal("0")):
+            logger.warning(
+                f"释放过期冻结金额 - user: {openid}, frozen: {account.frozen_amount}, "
+                f"frozen_at: {account.frozen_at}"
+            )
+        # 首次使用时新建的账户余额为 float, 统一按 Decimal 计算
+        available = Decimal(account.balance or 0) - frozen
+
+        if available <= MIN_AVAILABLE_BALANCE or available < amount:
+            logger.warning(
+                f"余额不足阻止任务 - user: {openid}, available: {available}, need: {amount}"
+            )
+            raise ValueError(
+                f"[DEEPSEEK]账户余额不足，当前可用余额: {float(available):.2f}元，"
+                f"请在【个人中心】充值后继续使用，或自行手动添加账单"
+            )
+
+        account.frozen_amount = frozen + amount
+        account.frozen_at = datetime.now()
+        account.updated_at = account.frozen_at
+
+    logger.info(f"余额预授权成功 - user: {openid}, hold: {amount}")
+    return BalanceReservation(openid, amount)
+
+
+def settle_reservation(reservation: BalanceReservation) -> dict:
+    """
+    结算任务预授权(单个事务): 写入全部Token记录与扣费记录, 按实际费用扣款并释放冻结金额
+
+    Returns:
+        {'cost', 'balance_after', 'api_calls'}
+    """
+    openid = reservation.openid
+
+    if Config.LEDGER_WRITE_BEHIND:
+        return _settle_reservation_write_behind(reservation)
+
+    for attempt in range(1, SETTLE_RETRIES + 1):
+        try:
+            return _settle_reservation_once(reservation)
+        except OperationalError as e:
+            if attempt == SETTLE_RETRIES:
+                raise
+            logger.warning(
+                f"余额预授权结算重试 - user: {openid}, attempt: {attempt}, error: {str(e)}"
+            )
+            time.sleep(SETTLE_RETRY_DELAY * attempt)
+
+
+def _settle_reservation_once(reservation: BalanceReservation) -> dict:
+    openid = reservation.openid
+
+    with db_transaction() as db:
+        account = _lock_account(db, openid)
+        total_cost = Decimal("0")
+
+        for usage in reservation.usages:
+            try:
+                token_record = _build_token_record(openid, **usage)
+            except Exception as e:
+                logger.error(f"记录Token使用失败 - error: {str(e)}")
+                db.add(
+                    _build_failed_token_record(
+                        openid,
+                        usage["workspace_id"],
+                        usage["file_upload_id"],
+                        usage["api_type"],
+                        usage["response"],
+                        e,
+                    )
+                )
+                continue
+
+            db.add(token_record)
+            db.flush()
+            _charge_account(db, account, token_record.cost, token_record.id)
+            total_cost += token_record.cost
+
+        frozen = account.frozen_amount or Decimal("0")
+        account.frozen_amount = max(frozen - reservation.hold_amount, Decimal("0"))
+        account.updated_at = datetime.now()
+        balance_after = account.balance
+
+    logger.info(
+        f"余额预授权结算 - user: {openid}, hold: {reservation.hold_amount}, "
+        f"cost: {total_cost}, api_calls: {len(reservation.usages)}, balance: {balance_after}"
+    )
+
+    return {
+        "cost": float(total_cost),
+        "balance_after": float(balance_after),
+        "api_calls": len(reservation.usages),
+    }
+
+
+def _settle_reservation_write_behind(reservation: BalanceReservation) -> dict:
+    """
+    写后模式下的结算: 扣费与释放冻结金额写入同一账本, 由同一批次落库
+
+    直接结算多次失败时也走该路径: 账本日志先落盘, 由后台线程重试落库, 进程崩溃后启动时重放
+    """
+    total_cost = Decimal("0")
+    for usage in reservation.usages:
+        try:
+            token_record = _build_token_record(reservation.openid, **usage)
+        except Exception as e:
+            logger.error(f"记录Token使用失败 - error: {str(e)}")
+            continue
+        ledger_service.enqueue_usage(token_record)
+        total_cost += token_record.cost
+
+    ledger_service.enqueue_release(reservation.openid, reservation.hold_amount)
+
+    return {
+        "cost": float(total_cost),
+        "balance_after": None,
+        "api_calls": len(reservation.usages),
+    }
+
+
+@contextmanager
+def balance_reservation(openid: str, amount: Decimal):
+    """
+    任务级余额预授权上下文
+
+    进入时冻结预估费用, 任务内的 DeepSeek 调用不再单独查询余额和扣费,
+    退出时(无论成功失败)按实际Token一次结算并释放剩余冻结金额;
+    结算失败时把Token消耗与释放写入用量账本(不会因回滚丢失), 账本也写入失败才仅释放冻结金额
+    """
+    reservation = reserve_balance(openid, amount)
+    token = _active_reservation.set(reservation)
+    try:
+        yield reservation
+    finally:
+        _active_reservation.reset(token)
+        try:
+            settle_reservation(reservation)
+        except Exception as e:
+            logger.error(
+                f"余额预授权结算失败, 转入用量账本 - user: {openid}, error: {str(e)}"
+            )
+            try:
+                _settle_reservation_write_behind(reservation)
+            except Exception as journal_error:
+                logger.error(
+                    f"用量写入账本失败, 仅释放冻结金额 - user: {openid}, "
+                    f"usages: {len(reservation.usages)}, error: {str(journal_error)}"
+                )
+                _release_hold(reservation)
+
+
+def _release_hold(reservation: BalanceReservation) -> None:
+    """结算失败时仅释放冻结金额, 避免账户长期被冻结"""
+    try:
+        with db_transaction() as db:
+            account = _lock_account(db, reservation.openid)
+            frozen = account.frozen_amount or Decimal("0")
+            account.frozen_amount = max(frozen - reservation.hold_amount, Decimal("0"))
+    except Exception as e:
+        logger.error(
+            f"释放冻结金额失败 - user: {reservation.openid}, error: {str(e)}"
+        )
+
+
+@timed()
+def get_extract_mode_stats(openid: str, month: str = None) -> dict:
+    """
+    对比单次提取(single)与两步提取(two_step)的每文件Token与耗时
+
+    按文件聚合 TokenUsageRecord: 含 extract 调用的文件计为 single, 其余计为 two_step
+
+    Returns:
+        {
+            "two_step": {"files": 10, "avg_tokens": 3000, "avg_response_time": 8000},
+            "single": {"files": 5, "avg_tokens": 1800, "avg_response_time": 4200},
+            "savings": {"tokens_percentage": 40.0, "latency_percentage": 47.5}
+        }
+    """
+    with db_session() as db:
+        query = db.query(
+            TokenUsageRecord.file_upload_id,
+            func.max(case((TokenUsageRecord.api_type == "extract", 1), else_=0)).label(
+                "is_single"
+            ),
+            func.sum(TokenUsageRecord.total_tokens).label("tokens"),
+            func.sum(TokenUsageRecord.response_time).label("response_time"),
+        ).filter(
+            TokenUsageRecord.user_openid == openid,
+            TokenUsageRecord.is_deleted == False,
+            TokenUsageRecord.status == "success",
+            TokenUsageRecord.file_upload_id.isnot(None),
+        )
+
+        if month:
+            try:
+                start_date = datetime.strptime(f"{month}-01", "%Y-%m-%d")
+            except ValueError:
+                raise ValueError("月份格式错误，请使用 YYYY-MM 格式")
+            end_date = (
+                start_date.replace(year=start_date.year + 1, month=1, day=1)
+                if start_date.month == 12
+                else start_date.replace(month=start_date.month + 1, day=1)
+            )
+            query = query.filter(
+                TokenUsageRecord.created_at >= start_date,
+                TokenUsageRecord.created_at < end_date,
+            )
+
+        per_file = query.group_by(TokenUsageRecord.file_upload_id).all()
+
+    buckets = {"two_step": [], "single": []}
+    for row in per_file:
+        mode = "single" if row.is_single else "two_step"
+        buckets[mode].append((row.tokens or 0, row.response_time or 0))
+
+    stats = {}
+    for mode, values in buckets.items():
+        count = len(values)
+        stats[mode] = {
+            "files": count,
+            "avg_tokens": round(sum(v[0] for v in values) / count, 2) if count else 0,
+            "avg_response_time": (
+                round(sum(v[1] for v in values) / count, 2) if count else 0
+            ),
+        }
+
+    def _saving(key):
+        legacy = stats["two_step"][key]
+        if not legacy or not stats["single"]["files"]:
+            return None
+        return round((legacy - stats["single"][key]) / legacy * 100, 2)
+
+    stats["savings"] = {
+        "tokens_percentage": _saving("avg_tokens"),
+        "latency_percentage": _saving("avg_response_time"),
+    }
+
+    return stats
+
+
+# 扣费记录总数缓存(LRU): (openid, month) -> (total, expires_at)
+# 当月数据仍在增长, 短时缓存; 历史月份基本不变(账本重放、删除仍可能修改), 缓存较长时间
+BILLING_COUNT_CACHE_TTL = 60
+BILLING_COUNT_CLOSED_MONTH_TTL = 3600
+BILLING_COUNT_CACHE_SIZE = 10000
+_billing_count_cache = OrderedDict()
+_billing_count_lock = Lock()
+
+
+def _encode_cursor(created_at: datetime, record_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{record_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, record_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), record_id
+    except (ValueError, UnicodeError):
+        raise ValueError("cursor参数无效")
+
+
+def _count_billing_records(db, openid: str, month: str, start_date, end_date) -> int:
+    """
+    统计扣费记录总数(按用户+月份缓存, 最多 BILLING_COUNT_CACHE_SIZE 项, 超出时淘汰最久未用的)
+
+    连表均为多对一, 总数只需统计 BillingRecord, 可直接走 idx_billing_user_created
+    """
+    now = time.monotonic()
+    key = (openid, month)
+
+    with _billing_count_lock:
+        cached = _billing_count_cache.get(key)
+        if cached and cached[1] > now:
+            _billing_count_cache.move_to_end(key)
+        else:
+            cached = None
+    if cached:
+        metrics.CACHE_REQUESTS.inc("billing_count", "hit")
+        return cached[0]
+    metrics.CACHE_REQUESTS.inc("billing_count", "miss")
+
+    query = db.query(func.count(BillingRecord.id)).filter(
+        BillingRecord.user_openid == openid, BillingRecord.is_deleted == False
+    )
+    if start_date:
+        query = query.filter(
+            BillingRecord.created_at >= start_date, BillingRecord.created_at < end_date
+        )
+    total = query.scalar()
+
+    current_month = datetime.now().replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    is_closed_month = end_date is not None and end_date <= current_month
+    ttl = BILLING_COUNT_CLOSED_MONTH_TTL if is_closed_month else BILLING_COUNT_CACHE_TTL
+
+    with _billing_count_lock:
+        _billing_count_cache[key] = (total, now + ttl)
+        _billing_count_cache.move_to_end(key)
+        while len(_billing_count_cache) > BILLING_COUNT_CACHE_SIZE:
+            _billing_count_cache.popitem(last=False)
+
+    return total
+
+
+@timed()
 def get_billing_records_with_file(
-    openid: str, month: str = None, page: int = 1, page_size: int = 20
+    openid: str,
+    month: str = None,
+    page: int = 1,
+    page_size: int = 20,
+    cursor: str = None,
+    with_total: bool = True,
 ) -> dict:
     """
     获取扣费记录(含文件信息) - JOIN连表查询
 
+    支持两种分页:
+    - 游标分页: 传入 cursor(上一页返回的 next_cursor), 按 (created_at, id) 定位, 耗时与页数无关
+    - 页码分页: 未传 cursor 时按 page 偏移(兼容旧接口)
+
     Args:
         openid: 用户openid
         month: 月份筛选 "YYYY-MM" (可选)
         page: 页码
         page_size: 每页数量
+        cursor: 游标(可选)
+        with_total: 是否返回总数(按用户+月份缓存), False 时 total 为 None
 
     Returns:
         {
             "total": 100,
             "page": 1,
             "page_size": 20,
+            "next_cursor": "xxx",  # 没有下一页时为 None
             "items": [
                 {
                     "id": "xxx",
@@ -229,6 +705,7 @@ def get_billing_records_with_file(
         )
 
         # 月份筛选
+        start_date = end_date = None
         if month:
             try:
                 start_date = datetime.strptime(f"{month}-01", "%Y-%m-%d")
@@ -245,15 +722,36 @@ def get_billing_records_with_file(
                 raise ValueError("月份格式错误，请使用 YYYY-MM 格式")
 
         # 总数
-        total = query.count()
-
-        # 分页查询
-        offset = (page - 1) * page_size
-        results = (
-            query.order_by(BillingRecord.created_at.desc())
-            .limit(page_size)
-            .offset(offset)
-            .all()
+        total = (
+            _count_billing_records(db, openid, month, start_date, end_date)
+            if with_total
+            else None
+        )
+
+        query = query.order_by(
+            BillingRecord.created_at.desc(), BillingRecord.id.desc()
+        )
+
+        if cursor:
+            cursor_created_at, cursor_id = _decode_cursor(cursor)
+            # created_at <= 游标 作为索引范围条件, 同一时间的记录再按 id 排除
+            query = query.filter(
+                BillingRecord.created_at <= cursor_created_at,
+                or_(
+                    BillingRecord.created_at < cursor_created_at,
+                    BillingRecord.id < cursor_id,
+                ),
+            )
+        else:
+            query = query.offset((page - 1) * page_size)
+
+        # 多取一条判断是否有下一页
+        results = query.limit(page_size + 1).all()
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        next_cursor = (
+            _encode_cursor(results[-1].created_at, results[-1].id) if has_more else None
         )
 
         # 组装返回数据
@@ -272,7 +770,14 @@ def get_billing_records_with_file(
         ]
 
         logger.info(
-            f"查询扣费记录成功 - user: {openid}, month: {month}, total: {total}"
+            f"查询扣费记录成功 - user: {openid}, month: {month}, total: {total}, "
+            f"cursor: {bool(cursor)}, items: {len(items)}"
         )
 
-        return {"total": total, "page": page, "page_size": page_size, "items": items}
+        return {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "next_cursor": next_cursor,
+            "items": items,
+        }
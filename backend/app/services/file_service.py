@@ -1,7 +1,7 @@
 """文件上传服务"""
 
 import os
-from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from datetime import datetime
 from app.models import FileUpload, Bill, User, Workspace, WorkspaceMember
 from app.database import SessionLocal, db_session, db_transaction
@@ -14,9 +14,93 @@ from app.utils import (
     calculate_file_hash,
     parse_file,
 )
-from app.utils.deepseek_util import refine_bill_content, convert_bills_to_json
+from app.utils.bill_row_parser import parse_refined_content
+from app.utils.prompt_compactor import prepare_prompt_content
+from app.utils.timing import log_stage_event, stage_timer, timed
+from app.utils.trace_util import ContextThreadPoolExecutor, start_span, end_span
+from app.utils import metrics, profiling
+from app.config import Config
+from app.services import billing_service, ingest_queue
+from app.utils.deepseek_util import (
+    refine_bill_content,
+    convert_bills_to_json,
+    extract_bills_to_json,
+)
+
 logger = get_logger(__name__)
-executor = ThreadPoolExecutor(max_workers=6)
+# 提交任务时复制 contextvars 上下文, 后台线程的日志沿用上传请求的追踪ID
+executor = ContextThreadPoolExecutor(max_workers=6)
+
+
+def reset_executor() -> None:
+    """fork 后在子进程中重建解析线程池(线程不会随 fork 复制)"""
+    global executor
+    executor = ContextThreadPoolExecutor(max_workers=6)
+
+
+def shutdown_executor() -> None:
+    """等待已提交的解析任务完成后关闭线程池(worker 回收/退出时调用)"""
+    executor.shutdown(wait=True)
+
+
+def _collect_ingest_metrics():
+    """抓取时读取解析线程池排队数; queue 模式下读取持久化队列各状态任务数"""
+    collected = [
+        (
+            "ingest_executor_queued",
+            "gauge",
+            "解析线程池中排队的任务数",
+            [({}, executor._work_queue.qsize())],
+        )
+    ]
+    if Config.INGEST_MODE == "queue":
+        stats = ingest_queue.get_queue_stats()
+        collected.append(
+            (
+                "ingest_jobs",
+                "gauge",
+                "持久化解析队列各状态任务数",
+                [({"status": status}, count) for status, count in stats.items()],
+            )
+        )
+    return collected
+
+
+metrics.register_collector(_collect_ingest_metrics)
+
+# 处理中文件的增量结果(流式模式下由 DeepSeek 回调写入, 供进度查询提前返回)
+# 仅保存在执行解析的进程内存中: INGEST_MODE=queue 时解析在 worker 进程执行,
+# API 进程的进度查询拿不到增量结果, 只返回文件状态(完成后返回全部账单)
+_partial_progress = {}
+_partial_lock = Lock()
+
+
+def _push_partial(file_id: str, stage: str, key: str, item) -> None:
+    """追加一条增量结果"""
+    with _partial_lock:
+        progress = _partial_progress.setdefault(
+            file_id, {"stage": stage, "partial_rows": [], "partial_bills": []}
+        )
+        progress["stage"] = stage
+        progress[key].append(item)
+
+
+def _get_partial(file_id: str) -> dict:
+    """读取增量结果快照"""
+    with _partial_lock:
+        progress = _partial_progress.get(file_id)
+        if not progress:
+            return {}
+        return {
+            "stage": progress["stage"],
+            "partial_rows": list(progress["partial_rows"]),
+            "partial_bills": list(progress["partial_bills"]),
+        }
+
+
+def _clear_partial(file_id: str) -> None:
+    with _partial_lock:
+        _partial_progress.pop(file_id, None)
 
 
 def clean_bill_data(bill: dict) -> dict:
@@ -86,88 +170,199 @@ def check_file_duplicate(workspace_id: str, file_hash: str) -> tuple:
         return True, file_record, bills_list
 
 
-def process_file_async(
+def _extract_two_step(
     file_id: str,
     workspace_id: str,
-    raw_content: str,
+    chunks: list,
+    compaction: dict,
     original_filename: str,
     user_openid: str,
-):
-    """异步处理文件精炼"""
-    logger.info(f"开始精炼 - file_id: {file_id}")
-
-    try:
-        refined_content = refine_bill_content(
-            content=raw_content,
+) -> tuple[str, list]:
+    """提纯 + 转换, 返回 (refined_content, 账单JSON列表)"""
+    refined_parts = []
+    for index, chunk in enumerate(chunks):
+        refined_chunk = refine_bill_content(
+            content=chunk,
             original_filename=original_filename,
             user_openid=user_openid,
             workspace_id=workspace_id,
             file_upload_id=file_id,
+            on_row=lambda row: _push_partial(file_id, "refine", "partial_rows", row),
+            compaction=compaction if index == 0 else None,
         )
+        # 检查精炼结果是否为错误信息（成功时以 "-" 开头，失败时以 "[" 开头）
+        if refined_chunk.startswith("["):
+            raise ValueError(refined_chunk)
+        if refined_chunk and refined_chunk != "-None":
+            refined_parts.append(refined_chunk[1:])
+
+    refined_content = "-" + "\n".join(refined_parts) if refined_parts else "-None"
+    logger.info(
+        f"初步提取refined_content完成 - file_id: {file_id}, chunks: {len(chunks)}, refined_content: {refined_content}"
+    )
+
+    if refined_content == "-None":
+        return refined_content, []
+
+    # 优先本地解析, 仅解析失败的行交给 DeepSeek 转换
+    bills_data_json_list, failed_lines = parse_refined_content(refined_content)
+    for bill in bills_data_json_list:
+        _push_partial(file_id, "convert", "partial_bills", bill)
+
+    if failed_lines:
         logger.info(
-            f"初步提取refined_content完成 - file_id: {file_id}, refined_content: {refined_content}"
+            f"本地解析失败行交由 DeepSeek 转换 - file_id: {file_id}, lines: {len(failed_lines)}"
         )
-        # 检查精炼结果是否为错误信息（成功时以 "-" 开头，失败时以 "[" 开头）
-        if refined_content.startswith("["):
-            raise ValueError(refined_content)
+        bills_data_json_list += convert_bills_to_json(
+            refined_content="\n".join(failed_lines),
+            user_openid=user_openid,
+            workspace_id=workspace_id,
+            file_upload_id=file_id,
+            on_bill=lambda bill: _push_partial(
+                file_id, "convert", "partial_bills", bill
+            ),
+        )
+    return refined_content, bills_data_json_list
 
-        if not refined_content or refined_content == "-None":
-            with db_transaction() as db:
-                file_record = (
-                    db.query(FileUpload).filter(FileUpload.id == file_id).first()
-                )
-                if not file_record:
-                    raise ValueError(f"文件记录不存在 - file_id: {file_id}")
 
-                file_record.refined_content = refined_content
-                file_record.bills_count = 0
-                file_record.status = "completed"
-                file_record.updated_at = datetime.now()
+def _extract_single_step(
+    file_id: str,
+    workspace_id: str,
+    chunks: list,
+    compaction: dict,
+    original_filename: str,
+    user_openid: str,
+) -> tuple[str, list]:
+    """单次调用直接输出 JSON, refined_content 由各账单 raw_line 拼接而成"""
+    bills_data_json_list = []
+    for index, chunk in enumerate(chunks):
+        bills_data_json_list += extract_bills_to_json(
+            content=chunk,
+            original_filename=original_filename,
+            user_openid=user_openid,
+            workspace_id=workspace_id,
+            file_upload_id=file_id,
+            on_bill=lambda bill: _push_partial(
+                file_id, "extract", "partial_bills", bill
+            ),
+            compaction=compaction if index == 0 else None,
+        )
+    if not bills_data_json_list:
+        return "-None", []
 
-            logger.info(f"异步处理完成 - file_id: {file_id}, 精炼结果为空")
-        else:
-            bills_data_json_list = convert_bills_to_json(
-                refined_content=refined_content,
-                user_openid=user_openid,
-                workspace_id=workspace_id,
-                file_upload_id=file_id,
-            )
-            bills_data = [clean_bill_data(bill) for bill in bills_data_json_list]
+    refined_content = "-" + "\n".join(
+        bill.get("raw_line", "") for bill in bills_data_json_list
+    )
+    return refined_content, bills_data_json_list
 
-            logger.info(f"精炼完成 - file_id: {file_id}, bills: {len(bills_data)}")
 
-            with db_transaction() as db:
-                file_record = (
-                    db.query(FileUpload).filter(FileUpload.id == file_id).first()
-                )
-                if not file_record:
-                    raise ValueError(f"文件记录不存在 - file_id: {file_id}")
-
-                now = datetime.now()
-
-                for bill_item in bills_data:
-                    bill = Bill(
-                        file_upload_id=file_record.id,
-                        workspace_id=workspace_id,
-                        bank=bill_item.get("bank"),
-                        trade_date=bill_item.get("trade_date"),
-                        record_date=bill_item.get("record_date"),
-                        description=bill_item.get("description"),
-                        amount_cny=bill_item.get("amount_cny"),
-                        card_last4=bill_item.get("card_last4"),
-                        amount_foreign=bill_item.get("amount_foreign"),
-                        currency=bill_item.get("currency"),
-                        raw_line=bill_item.get("raw_line", ""),
-                        status="pending",
-                    )
-                    db.add(bill)
+@profiling.profiled("ingest")
+def process_file_async(
+    file_id: str,
+    workspace_id: str,
+    raw_content: str,
+    original_filename: str,
+    user_openid: str,
+    claim: dict = None,
+):
+    """
+    异步处理文件精炼
+
+    Args:
+        claim: 队列任务的领取凭证(worker 执行时传入); 落库时确认任务仍被当前 worker 持有,
+            任务已被回收(其他 worker 重新领取)时放弃落库, 避免重复写入账单
+    """
+    extract_mode = Config.DEEPSEEK_EXTRACT_MODE
+    logger.info(f"开始精炼 - file_id: {file_id}, mode: {extract_mode}")
+    # 精炼/入库作为一个 span, 父 span 为提交任务时的请求(或 worker 任务)
+    ingest_span = start_span("ingest")
+    metrics.INGEST_RUNNING.inc()
+
+    try:
+        # 调用前压缩内容并按Token预算切分, 超出上限直接拒绝
+        chunks, compaction = prepare_prompt_content(
+            raw_content,
+            enable_compact=Config.PROMPT_COMPACT_ENABLED,
+            chunk_tokens=Config.PROMPT_CHUNK_TOKENS,
+            max_tokens=Config.PROMPT_MAX_TOKENS,
+        )
+
+        if extract_mode == "single":
+            extract, api_calls = _extract_single_step, len(chunks)
+        else:
+            extract, api_calls = _extract_two_step, len(chunks) * 2
 
-                file_record.refined_content = refined_content
-                file_record.bills_count = len(bills_data)
-                file_record.status = "completed"
-                file_record.updated_at = now
+        # 按预估费用一次性冻结余额, 任务内的 DeepSeek 调用结束后统一结算
+        estimated_cost = billing_service.estimate_job_cost(
+            compaction["tokens_after"], api_calls
+        )
+        with billing_service.balance_reservation(
+            user_openid, estimated_cost
+        ) as reservation:
+            refined_content, bills_data_json_list = extract(
+                file_id,
+                workspace_id,
+                chunks,
+                compaction,
+                original_filename,
+                user_openid,
+            )
+        bills_data = [clean_bill_data(bill) for bill in bills_data_json_list]
+
+        logger.info(f"精炼完成 - file_id: {file_id}, bills: {len(bills_data)}")
+
+        with stage_timer(
+            "persist", workspace_id=workspace_id, file_id=file_id
+        ), db_transaction() as db:
+            if claim:
+                ingest_queue.renew_claim(db, claim)
+            file_record = db.query(FileUpload).filter(FileUpload.id == file_id).first()
+            if not file_record:
+                raise ValueError(f"文件记录不存在 - file_id: {file_id}")
+
+            now = datetime.now()
+
+            for bill_item in bills_data:
+                bill = Bill(
+                    file_upload_id=file_record.id,
+                    workspace_id=workspace_id,
+                    bank=bill_item.get("bank"),
+                    trade_date=bill_item.get("trade_date"),
+                    record_date=bill_item.get("record_date"),
+                    description=bill_item.get("description"),
+                    amount_cny=bill_item.get("amount_cny"),
+                    card_last4=bill_item.get("card_last4"),
+                    amount_foreign=bill_item.get("amount_foreign"),
+                    currency=bill_item.get("currency"),
+                    raw_line=bill_item.get("raw_line", ""),
+                    status="pending",
+                )
+                db.add(bill)
+
+            file_record.refined_content = refined_content
+            file_record.bills_count = len(bills_data)
+            file_record.status = "completed"
+            file_record.updated_at = now
+
+        elapsed_ms = int(end_span(ingest_span))
+        usage = reservation.token_summary()
+        log_stage_event(
+            "ingest",
+            elapsed_ms,
+            span=ingest_span,
+            workspace_id=workspace_id,
+            file_id=file_id,
+            tokens=usage["total_tokens"],
+        )
+        logger.info(
+            f"异步处理完成 - file_id: {file_id}, mode: {extract_mode}, "
+            f"bills: {len(bills_data)}, tokens: {usage['total_tokens']}, "
+            f"api_calls: {usage['api_calls']}, elapsed_ms: {elapsed_ms}"
+        )
 
-            logger.info(f"异步处理完成 - file_id: {file_id}, bills: {len(bills_data)}")
+    except ingest_queue.ClaimLostError as e:
+        # 文件状态由重新领取任务的 worker 更新
+        logger.warning(f"任务已被回收, 放弃落库 - file_id: {file_id}, error: {str(e)}")
 
     except Exception as e:
         msg = str(e)
@@ -202,6 +397,86 @@ def process_file_async(
                 f"更新失败状态异常 - file_id: {file_id}, error: {str(update_error)}"
             )
 
+    finally:
+        end_span(ingest_span)
+        metrics.INGEST_RUNNING.dec()
+        _clear_partial(file_id)
+
+
+def _parse_raw_content(absolute_path: str, file_ext: str) -> str:
+    """解析文件原始内容, 失败时删除已保存的文件"""
+    try:
+        raw_content = parse_file(absolute_path, file_ext)
+        if not raw_content or raw_content.startswith("["):
+            # 删除无效文件
+            os.remove(absolute_path)
+            raise ValueError("文件解析失败或内容为空")
+    except Exception as e:
+        # 清理无效文件
+        if os.path.exists(absolute_path):
+            os.remove(absolute_path)
+        raise ValueError(f"文件解析失败: {str(e)}")
+
+    return raw_content
+
+
+def ingest_file(file_id: str, claim: dict = None) -> None:
+    """
+    执行队列中的解析任务(worker 进程调用): 解析文件内容后进入精炼/落库流程
+
+    文件解析失败时将文件记录置为失败(与上传时同步解析失败一样删除已保存的文件)
+
+    Args:
+        claim: 领取凭证(ingest_queue.claim_next 返回), 每次写入文件记录前确认仍持有任务
+
+    Raises:
+        ingest_queue.ClaimLostError: 解析完成前任务已被回收
+    """
+    with db_session() as db:
+        file_record = db.query(FileUpload).filter(FileUpload.id == file_id).first()
+        if not file_record or file_record.status != "processing":
+            logger.warning(f"文件不在处理中, 跳过解析任务 - file_id: {file_id}")
+            return
+
+        workspace_id = file_record.workspace_id
+        openid = file_record.uploaded_by_openid
+        original_filename = file_record.original_filename
+        absolute_path = get_absolute_path(file_record.saved_path)
+
+    try:
+        with stage_timer("parse", workspace_id=workspace_id, file_id=file_id) as event:
+            raw_content = _parse_raw_content(
+                absolute_path, get_file_extension(original_filename)
+            )
+            event["bytes"] = len(raw_content)
+    except ValueError as e:
+        logger.error(f"文件解析失败 - file_id: {file_id}, error: {str(e)}")
+        with db_transaction() as db:
+            if claim:
+                ingest_queue.renew_claim(db, claim)
+            db.query(FileUpload).filter(FileUpload.id == file_id).update(
+                {
+                    "status": "failed",
+                    "refined_content": str(e),
+                    "remark": str(e),
+                    "updated_at": datetime.now(),
+                },
+                synchronize_session=False,
+            )
+        return
+
+    with db_transaction() as db:
+        if claim:
+            ingest_queue.renew_claim(db, claim)
+        db.query(FileUpload).filter(FileUpload.id == file_id).update(
+            {"raw_content": raw_content, "updated_at": datetime.now()},
+            synchronize_session=False,
+        )
+
+    process_file_async(
+        file_id, workspace_id, raw_content, original_filename, openid, claim=claim
+    )
+
 
 def upload_and_parse_file(workspace_id: str, openid: str, file) -> dict:
     """上传文件并解析"""
@@ -211,7 +486,8 @@ def upload_and_parse_file(workspace_id: str, openid: str, file) -> dict:
     file_ext = get_file_extension(original_filename)
 
     # 1. 计算文件hash
-    file_hash = calculate_file_hash(file)
+    with stage_timer("hash", workspace_id=workspace_id):
+        file_hash = calculate_file_hash(file)
 
     # 2. 检查重复
     is_duplicate, file_record, bills = check_file_duplicate(workspace_id, file_hash)
@@ -234,24 +510,21 @@ def upload_and_parse_file(workspace_id: str, openid: str, file) -> dict:
 
     # 3. 解析文件内容(图片使用DeepSeek,其他使用LangChain)
     raw_content = None
+    queued = Config.INGEST_MODE == "queue"
 
     # 先保存文件用于解析
-    saved_path, _, file_size = save_uploaded_file(
-        file, workspace_id, original_filename, file_hash
-    )
+    with stage_timer("save", workspace_id=workspace_id) as event:
+        saved_path, _, file_size = save_uploaded_file(
+            file, workspace_id, original_filename, file_hash
+        )
+        event["bytes"] = file_size
     absolute_path = get_absolute_path(saved_path)
 
-    try:
-        raw_content = parse_file(absolute_path, file_ext)
-        if not raw_content or raw_content.startswith("["):
-            # 删除无效文件
-            os.remove(absolute_path)
-            raise ValueError("文件解析失败或内容为空")
-    except Exception as e:
-        # 清理无效文件
-        if os.path.exists(absolute_path):
-            os.remove(absolute_path)
-        raise ValueError(f"文件解析失败: {str(e)}")
+    # 队列模式下解析由 worker 进程执行
+    if not queued:
+        with stage_timer("parse", workspace_id=workspace_id) as event:
+            raw_content = _parse_raw_content(absolute_path, file_ext)
+            event["bytes"] = len(raw_content)
 
     # 4. 创建文件记录(status='processing')
     with db_transaction() as db:
@@ -274,19 +547,24 @@ def upload_and_parse_file(workspace_id: str, openid: str, file) -> dict:
         db.flush()
         db.refresh(file_record)
 
-        logger.info(f"文件上传成功 - file_id: {file_record.id}, 开始异步精炼")
-
         file_id = file_record.id
 
-    # 5. 启动后台线程
-    executor.submit(
-        process_file_async,
-        file_id,
-        workspace_id,
-        raw_content,
-        original_filename,
-        openid,
-    )
+        if queued:
+            ingest_queue.enqueue(db, file_id, workspace_id, openid)
+            logger.info(f"文件上传成功 - file_id: {file_id}, 已加入解析队列")
+        else:
+            logger.info(f"文件上传成功 - file_id: {file_id}, 开始异步精炼")
+
+    # 5. 启动后台线程(队列模式由 worker 领取)
+    if not queued:
+        executor.submit(
+            process_file_async,
+            file_id,
+            workspace_id,
+            raw_content,
+            original_filename,
+            openid,
+        )
 
     return {
         "status": "success",
@@ -301,6 +579,7 @@ def upload_and_parse_file(workspace_id: str, openid: str, file) -> dict:
     }
 
 
+@timed()
 def get_file_progress(workspace_id: str, file_id: str, openid: str) -> dict:
     """获取文件处理进度"""
     require_workspace_permission(workspace_id, openid)
@@ -327,6 +606,10 @@ def get_file_progress(workspace_id: str, file_id: str, openid: str) -> dict:
             "remark": file_record.remark,
         }
 
+        # 流式模式下返回已解析出的部分账单(仅 INGEST_MODE=inline, 见 _partial_progress)
+        if file_record.status == "processing":
+            result.update(_get_partial(file_id))
+
         try:
             if file_record.status == "completed":
                 bills = (
@@ -373,6 +656,7 @@ def get_file_for_view(workspace_id: str, file_id: str, openid: str) -> tuple:
         return absolute_path, file_record.original_filename, mime_type
 
 
+@timed()
 def get_file_records(openid: str, workspace_ids=None, page=1, page_size=10) -> list:
     """获取文件上传记录"""
 
@@ -0,0 +1,245 @@
+"""文件解析任务队列(SQLite 持久化)
+
+INGEST_MODE=queue 时, API 进程只在上传事务内写入 IngestJob, 由独立的 worker 进程
+(python -m app.worker)领取并执行解析/精炼/落库; API 与 worker 可分别扩容。
+
+领取任务使用条件更新(status='queued' 才能改为 running), 多个 worker 并发领取时只有一个成功;
+执行期间 worker 定时刷新 updated_at(心跳), 超过 INGEST_JOB_TIMEOUT 没有心跳的任务视为 worker
+已退出, 重新入队, 超过最大次数后置为失败。
+
+任务被回收后原 worker 可能仍在执行(如长时间卡住后恢复): 领取凭证(任务ID + worker_id + 执行次数)
+在落库事务内做条件更新(renew_claim), 凭证失效时整个事务回滚, 同一文件不会被两个 worker 重复落库;
+complete/fail 同样只对仍持有凭证的任务生效。
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app.models import IngestJob, FileUpload
+from app.database import db_session, db_transaction
+from app.utils import get_logger
+from app.utils.trace_util import get_trace_id
+from app.config import Config
+
+logger = get_logger(__name__)
+
+# 并发领取失败(被其他 worker 抢先)时的重试次数
+CLAIM_RETRIES = 3
+
+
+class ClaimLostError(Exception):
+    """任务已超时回收(可能已被其他 worker 重新领取), 当前 worker 不能再写入结果"""
+
+
+def enqueue(db, file_upload_id: str, workspace_id: str, openid: str) -> IngestJob:
+    """在调用方事务内写入解析任务(与文件记录一起提交), 记录上传请求的追踪ID供 worker 沿用"""
+    job = IngestJob(
+        file_upload_id=file_upload_id,
+        workspace_id=workspace_id,
+        user_openid=openid,
+        status="queued",
+        trace_id=get_trace_id(),
+    )
+    db.add(job)
+    return job
+
+
+def claim_next(worker_id: str):
+    """
+    按入队顺序领取一个任务
+
+    Returns:
+        {"id", "file_upload_id", "workspace_id", "user_openid", "worker_id", "attempts",
+        "trace_id"}, 队列为空时返回 None; 其中 id + worker_id + attempts 为领取凭证
+    """
+    for _ in range(CLAIM_RETRIES):
+        with db_transaction() as db:
+            job = (
+                db.query(IngestJob)
+                .filter(IngestJob.status == "queued", IngestJob.is_deleted == False)
+                .order_by(IngestJob.created_at, IngestJob.id)
+                .first()
+            )
+            if not job:
+                return None
+
+            now = datetime.now()
+            claimed = (
+                db.query(IngestJob)
+                .filter(IngestJob.id == job.id, IngestJob.status == "queued")
+                .update(
+                    {
+                        "status": "running",
+                        "worker_id": worker_id,
+                        "attempts": IngestJob.attempts + 1,
+                        "started_at": now,
+                        "updated_at": now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if claimed:
+                return {
+                    "id": job.id,
+                    "file_upload_id": job.file_upload_id,
+                    "workspace_id": job.workspace_id,
+                    "user_openid": job.user_openid,
+                    "worker_id": worker_id,
+                    "attempts": job.attempts + 1,
+                    "trace_id": job.trace_id,
+                }
+
+    return None
+
+
+def _claimed(db, claim: dict):
+    """仍由领取凭证持有的任务查询(status=running 且 worker_id、执行次数一致)"""
+    return db.query(IngestJob).filter(
+        IngestJob.id == claim["id"],
+        IngestJob.status == "running",
+        IngestJob.worker_id == claim["worker_id"],
+        IngestJob.attempts == claim["attempts"],
+    )
+
+
+def renew_claim(db, claim: dict) -> None:
+    """
+    在调用方事务内确认任务仍被当前 worker 持有并刷新心跳(条件更新)
+
+    Raises:
+        ClaimLostError: 任务已被回收, 调用方事务应回滚
+    """
+    renewed = _claimed(db, claim).update(
+        {"updated_at": datetime.now()}, synchronize_session=False
+    )
+    if not renewed:
+        raise ClaimLostError(
+            f"解析任务已被回收 - job_id: {claim['id']}, attempts: {claim['attempts']}"
+        )
+
+
+def heartbeat(claim: dict) -> bool:
+    """
+    刷新任务心跳(worker 执行期间定时调用)
+
+    Returns:
+        任务仍被持有时返回 True, 已被回收时返回 False
+    """
+    with db_transaction() as db:
+        renewed = _claimed(db, claim).update(
+            {"updated_at": datetime.now()}, synchronize_session=False
+        )
+    return bool(renewed)
+
+
+def complete(claim: dict) -> None:
+    """标记任务完成(文件处理成功或失败都已记录在文件记录上); 凭证失效时忽略"""
+    now = datetime.now()
+    with db_transaction() as db:
+        _claimed(db, claim).update(
+            {"status": "done", "finished_at": now, "updated_at": now},
+            synchronize_session=False,
+        )
+
+
+def _retry_or_fail(db, jobs, error: str) -> bool:
+    """
+    条件查询命中的任务: 未达最大次数时重新入队, 否则置为失败并同步文件状态
+
+    使用条件更新, 查询后任务状态已变化(新的心跳、已完成、已被回收)时不做处理
+
+    Args:
+        jobs: 限定任务及其当前状态的查询
+
+    Returns:
+        是否已处理
+    """
+    job = jobs.first()
+    if not job:
+        return False
+
+    now = datetime.now()
+    retry = job.attempts < Config.INGEST_MAX_ATTEMPTS
+    values = {"status": "queued", "error": error, "updated_at": now}
+    if not retry:
+        values.update({"status": "failed", "finished_at": now})
+    updated = jobs.filter(IngestJob.attempts == job.attempts).update(
+        values, synchronize_session=False
+    )
+    if not updated:
+        return False
+
+    if retry:
+        logger.warning(
+            f"解析任务重新入队 - job_id: {job.id}, attempts: {job.attempts}, error: {error}"
+        )
+        return True
+
+    _fail_file(db, job.file_upload_id, error)
+    logger.error(
+        f"解析任务失败 - job_id: {job.id}, attempts: {job.attempts}, error: {error}"
+    )
+    return True
+
+
+def fail(claim: dict, error: str) -> None:
+    """
+    任务执行异常: 未达最大次数时重新入队, 否则置为失败并同步文件状态
+
+    任务已被回收(凭证失效)时不做处理, 由当前持有者决定任务状态
+    """
+    with db_transaction() as db:
+        _retry_or_fail(db, _claimed(db, claim), error)
+
+
+def _fail_file(db, file_upload_id: str, error: str) -> None:
+    db.query(FileUpload).filter(
+        FileUpload.id == file_upload_id, FileUpload.status == "processing"
+    ).update(
+        {"status": "failed", "refined_content": error, "updated_at": datetime.now()},
+        synchronize_session=False,
+    )
+
+
+def requeue_stale() -> int:
+    """
+    回收超过 INGEST_JOB_TIMEOUT 没有心跳的任务(worker 异常退出或卡住)
+
+    Returns:
+        处理的任务数
+    """
+    deadline = datetime.now() - timedelta(seconds=Config.INGEST_JOB_TIMEOUT)
+    with db_session() as db:
+        stale_ids = [
+            job_id
+            for (job_id,) in db.query(IngestJob.id).filter(
+                IngestJob.status == "running", IngestJob.updated_at < deadline
+            )
+        ]
+
+    requeued = 0
+    for job_id in stale_ids:
+        with db_transaction() as db:
+            # 查询后又有心跳或已完成的任务不回收
+            jobs = db.query(IngestJob).filter(
+                IngestJob.id == job_id,
+                IngestJob.status == "running",
+                IngestJob.updated_at < deadline,
+            )
+            if _retry_or_fail(db, jobs, "任务执行超时(worker 可能已退出)"):
+                requeued += 1
+
+    return requeued
+
+
+def get_queue_stats() -> dict:
+    """各状态任务数"""
+    with db_session() as db:
+        rows = (
+            db.query(IngestJob.status, func.count(IngestJob.id))
+            .filter(IngestJob.is_deleted == False)
+            .group_by(IngestJob.status)
+            .all()
+        )
+    stats = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+    stats.update({status: count for status, count in rows})
+    return stats
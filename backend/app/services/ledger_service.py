@@ -0,0 +1,402 @@
+"""Token用量账本服务(写后批量落库)
+
+用量事件先追加写入本地日志(append-only)并缓存在内存, 由后台线程定期批量落库:
+每批一次多行插入 TokenUsageRecord / BillingRecord, 每个用户一次余额更新。
+
+崩溃安全: 每个进程独占(flock)一个日志文件(进程号 + 随机后缀命名); 落库前将日志文件重命名为
+<batch_id>.flushing, 落库期间保持文件锁, 落库事务内写入 LedgerBatch; 启动时重放已退出进程遗留的
+日志, 已存在 LedgerBatch 的批次直接跳过。只有拿到文件锁的进程才会处理日志或批次文件。
+没有 fcntl 的平台(Windows, 仅用于单进程本地开发)不加锁, 所有残留文件都视为可处理。
+"""
+
+import atexit
+import json
+import os
+import threading
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from nanoid import generate
+from sqlalchemy import insert
+from sqlalchemy.inspection import inspect
+from app.models import UserAccount, BillingRecord, TokenUsageRecord, LedgerBatch
+from app.database import db_transaction
+from app.utils import get_logger
+from app.config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = get_logger(__name__)
+
+JOURNAL_PREFIX = "usage_ledger"
+BATCH_SUFFIX = ".flushing"
+
+_buffer = []
+_buffer_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wake_event = threading.Event()
+_stop_event = threading.Event()
+_journal_file = None
+_journal_nonce = None
+_flusher = None
+
+
+def _journal_dir() -> Path:
+    return Path(Config.LEDGER_JOURNAL_DIR)
+
+
+def _journal_path() -> Path:
+    """
+    当前进程的日志文件
+
+    容器重启后进程号经常重复(如都是 1), 文件名带随机后缀, 避免续写上次进程遗留的日志
+    """
+    global _journal_nonce
+
+    if _journal_nonce is None:
+        _journal_nonce = generate(size=8)
+    return _journal_dir() / f"{JOURNAL_PREFIX}.{os.getpid()}.{_journal_nonce}.jsonl"
+
+
+def _flock(file) -> None:
+    """
+    非阻塞独占文件锁(无 fcntl 时不加锁)
+
+    Raises:
+        BlockingIOError: 已被其他进程持有
+    """
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def _open_journal():
+    """打开并独占当前进程的日志文件(进程退出时锁自动释放)"""
+    journal_file = open(_journal_path(), "a", encoding="utf-8")
+    _flock(journal_file)
+    return journal_file
+
+
+def _try_lock(path: Path):
+    """
+    尝试独占已有的日志/批次文件
+
+    Returns:
+        持有锁的文件对象(关闭即释放); 文件已不存在或被其他进程持有时返回 None
+    """
+    try:
+        locked_file = open(path, encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    try:
+        _flock(locked_file)
+    except BlockingIOError:
+        locked_file.close()
+        return None
+    return locked_file
+
+
+def _to_json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _append(event: dict) -> None:
+    """追加事件到日志与内存缓冲"""
+    global _journal_file
+
+    _ensure_started()
+    line = json.dumps(event, ensure_ascii=False)
+
+    with _buffer_lock:
+        if _journal_file is None:
+            _journal_file = _open_journal()
+        _journal_file.write(line + "\n")
+        _journal_file.flush()
+        if Config.LEDGER_FSYNC:
+            os.fsync(_journal_file.fileno())
+
+        _buffer.append(event)
+        size = len(_buffer)
+
+    if size >= Config.LEDGER_FLUSH_SIZE:
+        _wake_event.set()
+
+
+def enqueue_usage(token_record: TokenUsageRecord) -> str:
+    """
+    记录一次Token消耗(不落库)
+
+    Args:
+        token_record: 已计算费用的 TokenUsageRecord(未加入会话)
+
+    Returns:
+        token_record_id
+    """
+    token_record.id = token_record.id or generate()
+    token_record.created_at = token_record.created_at or datetime.now()
+    token_record.updated_at = token_record.created_at
+    token_record.is_deleted = False
+
+    record = {
+        column.key: _to_json_value(getattr(token_record, column.key))
+        for column in inspect(TokenUsageRecord).columns
+        if getattr(token_record, column.key) is not None
+    }
+    _append({"type": "usage", "openid": token_record.user_openid, "record": record})
+    return token_record.id
+
+
+def enqueue_release(openid: str, amount: Decimal) -> None:
+    """释放任务预授权冻结金额(与同批扣费一起落库)"""
+    _append({"type": "release", "openid": openid, "amount": str(amount)})
+
+
+def _apply_batch(batch_id: str, events: list) -> int:
+    """
+    单个事务内落库一批事件
+
+    Returns:
+        落库的事件数, 批次已落库时返回 0
+    """
+    with db_transaction() as db:
+        if db.query(LedgerBatch.id).filter(LedgerBatch.id == batch_id).first():
+            logger.info(f"账本批次已落库, 跳过 - batch_id: {batch_id}")
+            return 0
+
+        openids = {event["openid"] for event in events}
+        accounts = {
+            account.user_openid: account
+            for account in db.query(UserAccount)
+            .filter(
+                UserAccount.user_openid.in_(openids), UserAccount.is_deleted == False
+            )
+            .with_for_update()
+            .all()
+        }
+        for openid in openids - accounts.keys():
+            account = UserAccount(user_openid=openid, balance=0.00, frozen_amount=0.00)
+            db.add(account)
+            accounts[openid] = account
+        db.flush()
+
+        token_rows = []
+        billing_rows = []
+        for event in events:
+            account = accounts[event["openid"]]
+
+            if event["type"] == "release":
+                frozen = account.frozen_amount or Decimal("0")
+                account.frozen_amount = max(
+                    frozen - Decimal(event["amount"]), Decimal("0")
+                )
+                continue
+
+            row = dict(event["record"])
+            for key in ("created_at", "updated_at"):
+                row[key] = datetime.fromisoformat(row[key])
+            for key in ("unit_price", "cost"):
+                if row.get(key) is not None:
+                    row[key] = Decimal(row[key])
+            token_rows.append(row)
+
+            cost = row.get("cost") or Decimal("0")
+            balance_before = account.balance
+            account.balance -= cost
+            account.total_consumed += cost
+            billing_rows.append(
+                {
+                    "id": generate(),
+                    "user_openid": event["openid"],
+                    "amount": cost,
+                    "balance_before": balance_before,
+                    "balance_after": account.balance,
+                    "token_usage_id": row["id"],
+                    "billing_type": "token_usage",
+                    "description": "AI Token消耗扣费",
+                    "created_at": row["created_at"],
+                }
+            )
+
+        now = datetime.now()
+        for account in accounts.values():
+            account.updated_at = now
+
+        if token_rows:
+            db.execute(insert(TokenUsageRecord), token_rows)
+        if billing_rows:
+            db.execute(insert(BillingRecord), billing_rows)
+        db.add(LedgerBatch(id=batch_id, events_count=len(events)))
+
+    logger.info(
+        f"账本批次落库成功 - batch_id: {batch_id}, events: {len(events)}, "
+        f"usages: {len(token_rows)}, users: {len(accounts)}"
+    )
+    return len(events)
+
+
+def _read_journal(path: Path) -> list:
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                # 崩溃时最后一行可能写入不完整
+                logger.warning(f"跳过不完整的账本日志行 - path: {path}")
+    return events
+
+
+def _apply_batch_file(path: Path) -> int:
+    """重试批次文件; 其他进程正在落库(持有文件锁)的批次跳过"""
+    batch_file = _try_lock(path)
+    if batch_file is None:
+        return 0
+
+    with batch_file:
+        batch_id = path.name[: -len(BATCH_SUFFIX)]
+        applied = _apply_batch(batch_id, _read_journal(path))
+        path.unlink(missing_ok=True)
+    return applied
+
+
+def flush() -> int:
+    """
+    将缓冲区事件批量落库
+
+    Returns:
+        本次落库的事件数
+    """
+    global _journal_file
+
+    with _flush_lock:
+        applied = 0
+
+        # 先重试此前落库失败的批次(含其他已退出进程遗留的批次)
+        for path in sorted(_journal_dir().glob(f"*{BATCH_SUFFIX}")):
+            try:
+                applied += _apply_batch_file(path)
+            except Exception as e:
+                logger.error(f"账本批次重试失败 - path: {path}, error: {str(e)}")
+
+        with _buffer_lock:
+            if not _buffer:
+                return applied
+
+            events = list(_buffer)
+            _buffer.clear()
+
+            # 轮换日志: 持锁重命名为本批次文件, 新事件写入新日志;
+            # 落库完成前保持原文件的锁, 其他进程的重试不会同时处理本批次
+            batch_id = generate()
+            batch_path = _journal_dir() / f"{batch_id}{BATCH_SUFFIX}"
+            os.replace(_journal_path(), batch_path)
+            batch_file = _journal_file
+            _journal_file = None
+
+        with batch_file:
+            try:
+                applied += _apply_batch(batch_id, events)
+                batch_path.unlink(missing_ok=True)
+            except Exception as e:
+                # 批次文件保留, 下次 flush 或启动时重放
+                logger.error(
+                    f"账本批次落库失败 - batch_id: {batch_id}, error: {str(e)}"
+                )
+
+        return applied
+
+
+def replay_journal() -> int:
+    """
+    启动时重放残留日志(上次进程崩溃前未落库的事件)
+
+    Returns:
+        重放落库的事件数
+    """
+    journal_dir = _journal_dir()
+    journal_dir.mkdir(parents=True, exist_ok=True)
+
+    for path in journal_dir.glob(f"{JOURNAL_PREFIX}.*.jsonl"):
+        if path == _journal_path():
+            continue
+
+        # 能拿到锁说明写入该日志的进程已退出(进程号与当前进程相同时也一样处理)
+        orphan = _try_lock(path)
+        if orphan is None:
+            continue
+        with orphan:
+            os.replace(path, journal_dir / f"{generate()}{BATCH_SUFFIX}")
+
+    replayed = flush()
+    if replayed:
+        logger.info(f"账本日志重放完成 - events: {replayed}")
+    return replayed
+
+
+def _flush_loop() -> None:
+    while not _stop_event.is_set():
+        _wake_event.wait(Config.LEDGER_FLUSH_INTERVAL)
+        _wake_event.clear()
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"账本定时落库异常 - error: {str(e)}")
+
+
+def _ensure_started() -> None:
+    """首次写入时启动后台落库线程"""
+    global _flusher
+
+    if _flusher is not None:
+        return
+
+    with _flush_lock:
+        if _flusher is not None:
+            return
+        _journal_dir().mkdir(parents=True, exist_ok=True)
+        _flusher = threading.Thread(
+            target=_flush_loop, name="usage-ledger-flusher", daemon=True
+        )
+        _flusher.start()
+        atexit.register(shutdown)
+
+
+def reset_after_fork() -> None:
+    """
+    fork 后在子进程中重置账本状态
+
+    子进程关闭继承的句柄后写入自己的日志(新的进程号与随机后缀);
+    flock 锁属于父进程的打开文件, 关闭子进程中的副本不会释放父进程的锁
+    """
+    global _journal_file, _journal_nonce, _flusher
+    global _buffer_lock, _flush_lock, _wake_event, _stop_event
+
+    if _journal_file is not None:
+        _journal_file.close()
+    _journal_file = None
+    _journal_nonce = None
+    _flusher = None
+    _buffer.clear()
+    _buffer_lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _wake_event = threading.Event()
+    _stop_event = threading.Event()
+
+
+def shutdown() -> None:
+    """停止后台线程并落库剩余事件"""
+    _stop_event.set()
+    _wake_event.set()
+    try:
+        flush()
+    except Exception as e:
+        logger.error(f"账本退出落库失败 - error: {str(e)}")
@@ -4,6 +4,7 @@ from datetime import datetime
 from app.models import Workspace, WorkspaceMember, User, FileUpload, Bill
 from app.database import db_session, db_transaction
 from app.utils import get_logger
+from app.utils.timing import timed
 
 logger = get_logger(__name__)
 
@@ -78,6 +79,7 @@ def create_workspace(openid: str, name: str, description: str = None) -> dict:
         return workspace.to_dict()
 
 
+@timed()
 def get_user_workspaces(openid: str, status: str = None, role: str = None) -> list:
     """
     获取用户有权限的所有空间(优化版 - 批量查询)
@@ -186,6 +188,7 @@ def get_user_workspaces(openid: str, status: str = None, role: str = None) -> li
         return result
 
 
+@timed()
 def get_workspace_detail(workspace_id: str, openid: str) -> dict:
     """获取空间详情(需验证权限)"""
     with db_session() as db:
@@ -0,0 +1,173 @@
+"""提纯结果行解析器
+
+按 ROW_FORMAT 在本地解析 [发卡行,交易日,记账日,交易摘要,人民币金额,卡号末四位,交易地金额,记账币种],
+只有解析失败的行才需要交给 DeepSeek 转换
+"""
+
+import re
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+ROW_FIELD_COUNT = 8
+PLACEHOLDERS = {"", "-", "—", "--", "None", "null", "NULL"}
+
+_DATE_PATTERN = re.compile(r"^(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*日?$")
+_COMPACT_DATE_PATTERN = re.compile(r"^(\d{4})(\d{2})(\d{2})$")
+_CARD_PATTERN = re.compile(r"^\d{4}$")
+_CURRENCY_PATTERN = re.compile(r"^[A-Z]{3}$")
+_CURRENCY_CODE_IN_AMOUNT = re.compile(r"\b([A-Z]{3})\b")
+# 带千分位的金额(如 1,234.56 / -12,345), 拆分字段前需保护其中的逗号
+_GROUPED_AMOUNT = re.compile(
+    r"(?<![\w.])-?\d{1,3}(?:,\d{3}(?!\d))+(?:\.\d+)?(?![\d.])"
+)
+# 拆分字段时临时替代千分位逗号
+_GROUP_SEPARATOR = "\x00"
+# 金额中可能出现的币种符号/前缀
+_AMOUNT_NOISE = re.compile(r"(US\$|HK\$|NT\$|[A-Z]{3}|[$¥￥€£₩₹฿元\s,])")
+
+
+def normalize_date(value: str):
+    """
+    日期归一化为 YYYY-MM-DD
+
+    Returns:
+        归一化后的日期字符串; 占位符返回 ""; 无法识别返回 None
+    """
+    value = value.strip()
+    if value in PLACEHOLDERS:
+        return ""
+
+    match = _DATE_PATTERN.match(value) or _COMPACT_DATE_PATTERN.match(value)
+    if not match:
+        return None
+
+    try:
+        return date(*(int(part) for part in match.groups())).isoformat()
+    except ValueError:
+        return None
+
+
+def normalize_amount(value: str):
+    """
+    金额归一化(去除币种符号与千分位)
+
+    Returns:
+        金额字符串; 占位符返回 ""; 无法识别返回 None
+    """
+    value = value.strip()
+    if value in PLACEHOLDERS:
+        return ""
+
+    negative = value.startswith("(") and value.endswith(")")
+    cleaned = _AMOUNT_NOISE.sub("", value.strip("()")).replace("−", "-")
+
+    try:
+        amount = Decimal(cleaned)
+    except InvalidOperation:
+        return None
+    if not amount.is_finite():
+        return None
+
+    if negative:
+        amount = -amount
+    return str(amount)
+
+
+def parse_bill_row(line: str):
+    """
+    解析单行提纯结果
+
+    交易摘要可能含逗号, 因此固定取前 3 个与后 4 个字段, 中间部分拼回交易摘要;
+    金额中的千分位逗号在拆分前保护, 含千分位金额时字段数必须正好为 8(否则无法确定
+    逗号归属, 交给 DeepSeek 转换); 金额、卡号、币种任一字段不合法则视为解析失败
+
+    Returns:
+        账单字典(与 convert_bills_to_json 输出字段一致); 解析失败返回 None
+    """
+    raw_line = line.strip()
+    body = raw_line
+    if body.startswith("[") and body.endswith("]"):
+        body = body[1:-1]
+
+    body, grouped = _GROUPED_AMOUNT.subn(
+        lambda match: match.group(0).replace(",", _GROUP_SEPARATOR), body
+    )
+    parts = [part.strip().replace(_GROUP_SEPARATOR, ",") for part in body.split(",")]
+    if len(parts) < ROW_FIELD_COUNT:
+        return None
+    if grouped and len(parts) != ROW_FIELD_COUNT:
+        return None
+
+    bank, trade_date, record_date = parts[:3]
+    amount_cny, card_last4, amount_foreign, currency = parts[-4:]
+    description = ",".join(parts[3:-4])
+
+    trade_date = normalize_date(trade_date)
+    record_date = normalize_date(record_date)
+    if trade_date is None or record_date is None:
+        return None
+
+    normalized_cny = normalize_amount(amount_cny)
+    normalized_foreign = normalize_amount(amount_foreign)
+    if normalized_cny is None or normalized_foreign is None:
+        return None
+
+    card_last4 = "" if card_last4 in PLACEHOLDERS else card_last4
+    if card_last4 and not _CARD_PATTERN.match(card_last4):
+        return None
+
+    currency = "" if currency in PLACEHOLDERS else currency.upper()
+    if not currency:
+        # 记账币种缺失时, 尝试从交易地金额中的币种代码推断
+        code = _CURRENCY_CODE_IN_AMOUNT.search(amount_foreign)
+        currency = code.group(1) if code else ""
+    if currency and not _CURRENCY_PATTERN.match(currency):
+        return None
+
+    return {
+        "bank": "" if bank in PLACEHOLDERS else bank,
+        "trade_date": trade_date,
+        "record_date": record_date,
+        "description": "" if description in PLACEHOLDERS else description,
+        "amount_cny": normalized_cny,
+        "card_last4": card_last4,
+        "amount_foreign": normalized_foreign,
+        "currency": currency,
+        "raw_line": raw_line,
+    }
+
+
+def parse_refined_content(refined_content: str) -> tuple[list, list]:
+    """
+    解析完整提纯结果
+
+    非数据行(标题、说明文字、"None" 等)直接跳过;
+    形似数据行但无法解析的行返回给调用方交由 DeepSeek 转换
+
+    Returns:
+        (bills, failed_lines)
+    """
+    # 提纯成功时会在结果前追加 "-" 标记
+    text = refined_content[1:] if refined_content.startswith("-") else refined_content
+
+    bills = []
+    failed_lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        is_row = line.startswith("[") or line.count(",") >= ROW_FIELD_COUNT - 1
+        if not line or not is_row:
+            continue
+
+        bill = parse_bill_row(line)
+        if bill:
+            bills.append(bill)
+        else:
+            failed_lines.append(line)
+
+    logger.info(
+        f"本地解析提纯结果 - parsed: {len(bills)}, failed: {len(failed_lines)}"
+    )
+    return bills, failed_lines
@@ -0,0 +1,120 @@
+"""DeepSeek 账单 JSON 校验与修复"""
+
+import json
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 与 ROW_FORMAT 顺序一致的账单字段
+BILL_FIELDS = [
+    "bank",
+    "trade_date",
+    "record_date",
+    "description",
+    "amount_cny",
+    "card_last4",
+    "amount_foreign",
+    "currency",
+]
+
+
+def strip_markdown_fence(text: str) -> str:
+    """清理可能的 markdown 标记"""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+def load_bills_json(text: str) -> list:
+    """
+    解析 {"bills": [...]} 格式的 JSON, 解析失败时尝试本地修复
+
+    修复策略:
+    1. 顶层直接返回数组时包装为 {"bills": [...]}
+    2. 输出被截断(如触达 max_tokens)时, 截取到最后一个完整账单对象并补齐括号
+
+    Raises:
+        ValueError: 无法修复
+    """
+    text = strip_markdown_fence(text)
+
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        data = _repair_truncated(text)
+        if data is None:
+            raise ValueError(f"JSON 解析失败且无法修复: {str(e)}")
+        logger.warning(f"JSON 已本地修复 - 保留账单数: {len(data.get('bills', []))}")
+
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        bills = data.get("bills", [])
+        return bills if isinstance(bills, list) else []
+    return []
+
+
+def _repair_truncated(text: str):
+    """从后向前寻找可闭合的账单对象边界"""
+    end = text.rfind("}")
+    while end > 0:
+        candidate = text[: end + 1]
+        for suffix in ("]}", "]", ""):
+            try:
+                return _wrap(json.loads(candidate + suffix))
+            except json.JSONDecodeError:
+                continue
+        end = text.rfind("}", 0, end)
+    return None
+
+
+def _wrap(data):
+    return {"bills": data} if isinstance(data, list) else data
+
+
+def build_raw_line(bill: dict) -> str:
+    """按 ROW_FORMAT 顺序拼接原始精炼行, 空值使用 "-" 占位"""
+    values = []
+    for field in BILL_FIELDS:
+        value = bill.get(field)
+        values.append("-" if value in (None, "") else str(value))
+    return f"[{','.join(values)}]"
+
+
+def validate_bills(bills: list) -> list:
+    """
+    校验并补全账单字段
+
+    - 丢弃非对象项以及金额与摘要均为空的项
+    - 缺失字段补空字符串, 缺失 raw_line 时按 ROW_FORMAT 拼接
+    """
+    valid = []
+    for bill in bills:
+        if not isinstance(bill, dict):
+            continue
+
+        normalized = {field: bill.get(field, "") for field in BILL_FIELDS}
+        for field in BILL_FIELDS:
+            if normalized[field] is None or normalized[field] == "-":
+                normalized[field] = ""
+
+        if not (
+            normalized["amount_cny"] != ""
+            or normalized["amount_foreign"] != ""
+            or normalized["description"]
+        ):
+            continue
+
+        normalized["raw_line"] = bill.get("raw_line") or build_raw_line(normalized)
+        valid.append(normalized)
+
+    dropped = len(bills) - len(valid)
+    if dropped:
+        logger.warning(f"账单校验丢弃无效项 - dropped: {dropped}")
+
+    return valid
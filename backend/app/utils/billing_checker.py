@@ -1,5 +1,8 @@
 """余额检查工具 - 独立模块，无循环依赖"""
 
+from datetime import datetime, timedelta
+from decimal import Decimal
+from app.config import Config
 from app.models import UserAccount
 from app.database import db_session
 from app.utils.logger import get_logger
@@ -7,6 +10,22 @@ from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
 
+def get_active_frozen(account: UserAccount) -> Decimal:
+    """
+    有效的冻结金额
+
+    进程在预授权与结算之间崩溃时冻结金额不会释放; 最近一次冻结已超过 BALANCE_HOLD_TTL
+    (或无冻结时间的旧数据)时视为遗留, 按 0 计算
+    """
+    frozen = Decimal(account.frozen_amount or 0)
+    if frozen <= 0:
+        return Decimal("0")
+    deadline = datetime.now() - timedelta(seconds=Config.BALANCE_HOLD_TTL)
+    if account.frozen_at is None or account.frozen_at < deadline:
+        return Decimal("0")
+    return frozen
+
+
 def check_balance_sufficient(user_openid: str) -> tuple[bool, float]:
     """
     检查用户余额是否充足
@@ -32,8 +51,9 @@ def check_balance_sufficient(user_openid: str) -> tuple[bool, float]:
                 # 新用户，余额为0
                 return False, 0.0
 
-            balance = float(account.balance)
-            logger.info(f"当前余额 - user: {user_openid}, balance: {balance}")
+            # 扣除处理中任务的冻结金额
+            balance = float(account.balance - get_active_frozen(account))
+            logger.info(f"当前可用余额 - user: {user_openid}, balance: {balance}")
             return balance > 0.2, balance
 
     except Exception as e:
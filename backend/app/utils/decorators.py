@@ -1,7 +1,9 @@
 """装饰器"""
 
+import hmac
 from functools import wraps
 from flask import request, jsonify
+from app.config import Config
 from app.utils import verify_token
 
 
@@ -51,3 +53,24 @@ def jwt_required(f):
         return f(*args, **kwargs)
 
     return decorated_function
+
+
+def admin_required(f):
+    """
+    管理接口认证装饰器: Authorization: Bearer <ADMIN_TOKEN>
+    未配置 ADMIN_TOKEN 时管理接口不可用
+    """
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        admin_token = Config.ADMIN_TOKEN
+        if not admin_token:
+            return jsonify({"success": False, "message": "管理接口未开启"}), 404
+
+        auth_header = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth_header, f"Bearer {admin_token}"):
+            return jsonify({"success": False, "message": "无权访问管理接口"}), 401
+
+        return f(*args, **kwargs)
+
+    return decorated_function
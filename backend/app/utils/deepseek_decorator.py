@@ -3,6 +3,9 @@
 from functools import wraps
 from datetime import datetime
 from app.utils.logger import get_logger
+from app.utils.timing import log_stage_event
+from app.utils.trace_util import start_span, end_span
+from app.utils import metrics
 from app.utils.billing_checker import check_balance_sufficient
 from app.services import billing_service
 
@@ -14,7 +17,7 @@ def track_deepseek_usage(api_type: str):
     装饰器: 自动记录DeepSeek调用的Token消耗
 
     Args:
-        api_type: API类型 'refine'/'convert'
+        api_type: API类型 'refine'/'convert'/'extract'
     """
 
     def decorator(func):
@@ -26,9 +29,14 @@ def track_deepseek_usage(api_type: str):
             workspace_id = kwargs.get("workspace_id")
             file_upload_id = kwargs.get("file_upload_id")
             user_openid = kwargs.get("user_openid")
+            # Prompt压缩统计仅用于记录, 不传给原函数
+            compaction = kwargs.pop("compaction", None)
+
+            # 任务内已预授权时, 跳过逐次余额校验, Token消耗在任务结束时统一结算
+            reservation = billing_service.get_active_reservation()
 
             # 调用前校验余额
-            if user_openid:
+            if user_openid and reservation is None:
                 is_sufficient, balance = check_balance_sufficient(user_openid)
                 if not is_sufficient:
                     error_msg = f"[DEEPSEEK]账户余额不足，当前余额: {balance:.2f}元，请在【个人中心】充值后继续使用，或自行手动添加账单"
@@ -37,12 +45,44 @@ def track_deepseek_usage(api_type: str):
                     )
                     raise ValueError(error_msg)
 
+            call_span = start_span(api_type)
             try:
                 # 执行原函数
                 result, response = func(*args, **kwargs)
 
+                usage = getattr(response, "usage", None)
+                metrics.LLM_CALLS.inc(api_type, "ok")
+                if usage:
+                    metrics.LLM_TOKENS.inc(
+                        api_type, "prompt", amount=usage.prompt_tokens
+                    )
+                    metrics.LLM_TOKENS.inc(
+                        api_type, "completion", amount=usage.completion_tokens
+                    )
+                log_stage_event(
+                    api_type,
+                    end_span(call_span),
+                    span=call_span,
+                    workspace_id=workspace_id,
+                    file_id=file_upload_id,
+                    tokens=usage.total_tokens if usage else None,
+                )
+
+                # 预授权任务内: 仅记入内存, 由 balance_reservation 退出时一次结算
+                if reservation is not None and hasattr(response, "usage"):
+                    reservation.add_usage(
+                        workspace_id=workspace_id,
+                        file_upload_id=file_upload_id,
+                        api_type=api_type,
+                        response=response,
+                        response_time=int(
+                            (datetime.now() - start_time).total_seconds() * 1000
+                        ),
+                        compaction=compaction,
+                    )
+
                 # 记录Token
-                if workspace_id and user_openid and hasattr(response, "usage"):
+                elif workspace_id and user_openid and hasattr(response, "usage"):
                     try:
                         record_data = {
                             "user_openid": user_openid,
@@ -60,6 +100,7 @@ def track_deepseek_usage(api_type: str):
                             api_type=record_data["api_type"],
                             response=record_data["response"],
                             request_start_time=record_data.get("request_start_time"),
+                            compaction=compaction,
                         )
                     except Exception as e:
                         logger.error(f"Token记录异常: {str(e)}")
@@ -67,11 +108,15 @@ def track_deepseek_usage(api_type: str):
                 return result
 
             except Exception as e:
+                metrics.LLM_CALLS.inc(api_type, "error")
                 logger.error(
                     f"DeepSeek API调用失败 - api_type: {api_type}, error: {str(e)}"
                 )
                 raise
 
+            finally:
+                end_span(call_span)
+
         return wrapper
 
     return decorator
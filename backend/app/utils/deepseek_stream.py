@@ -0,0 +1,138 @@
+"""DeepSeek 流式响应增量解析"""
+
+import json
+from types import SimpleNamespace
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RowStreamParser:
+    """
+    提纯结果增量解析器
+
+    按换行切分流式文本, 每凑齐一行完整的 [发卡行,...] 记录即回调 on_row
+    """
+
+    def __init__(self, on_row):
+        self._on_row = on_row
+        self._buffer = ""
+
+    def feed(self, text: str) -> None:
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            self._emit(line)
+
+    def close(self) -> None:
+        if self._buffer:
+            self._emit(self._buffer)
+            self._buffer = ""
+
+    def _emit(self, line: str) -> None:
+        line = line.strip()
+        if line.startswith("[") and line.endswith("]"):
+            self._on_row(line)
+
+
+class JsonBillStreamParser:
+    """
+    JSON 账单增量解析器
+
+    跟踪 {"bills": [{...}, {...}]} 的括号深度(忽略字符串内的括号),
+    每闭合一个账单对象即回调 on_bill
+    """
+
+    # {"bills": [ {账单} ]} 中账单对象所在的嵌套深度
+    BILL_DEPTH = 3
+
+    def __init__(self, on_bill):
+        self._on_bill = on_bill
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._current = None
+
+    def feed(self, text: str) -> None:
+        for ch in text:
+            if self._current is not None:
+                self._current.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+                if ch == "{" and self._depth == self.BILL_DEPTH:
+                    self._current = [ch]
+            elif ch in "}]":
+                if (
+                    ch == "}"
+                    and self._depth == self.BILL_DEPTH
+                    and self._current is not None
+                ):
+                    self._emit("".join(self._current))
+                    self._current = None
+                self._depth -= 1
+
+    def close(self) -> None:
+        self._current = None
+
+    def _emit(self, fragment: str) -> None:
+        try:
+            bill = json.loads(fragment)
+        except json.JSONDecodeError as e:
+            logger.warning(f"流式账单片段解析失败 - error: {str(e)}")
+            return
+        if isinstance(bill, dict):
+            self._on_bill(bill)
+
+
+def consume_chat_stream(stream, parser=None) -> tuple[str, SimpleNamespace]:
+    """
+    消费 chat.completions 流式响应
+
+    Args:
+        stream: stream=True 的 chat.completions.create 返回值
+        parser: 可选的增量解析器(RowStreamParser/JsonBillStreamParser)
+
+    Returns:
+        (完整文本, 与非流式响应兼容的 id/model/usage 对象, 供计费记录使用)
+    """
+    parts = []
+    response_id = None
+    model = None
+    usage = None
+
+    for chunk in stream:
+        response_id = response_id or chunk.id
+        model = model or chunk.model
+
+        # include_usage 时最后一个 chunk 携带 usage 且 choices 为空
+        if getattr(chunk, "usage", None):
+            usage = chunk.usage
+
+        if not chunk.choices:
+            continue
+
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+
+        parts.append(delta)
+        if parser:
+            try:
+                parser.feed(delta)
+            except Exception as e:
+                logger.warning(f"流式增量解析异常 - error: {str(e)}")
+
+    if parser:
+        parser.close()
+
+    return "".join(parts), SimpleNamespace(id=response_id, model=model, usage=usage)
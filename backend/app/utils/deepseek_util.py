@@ -1,25 +1,59 @@
 """DeepSeek API 工具"""
 
-import json
-from openai import OpenAI
+import threading
 from app.config import Config
 from .logger import get_logger
 from .deepseek_decorator import track_deepseek_usage
+from .deepseek_stream import RowStreamParser, JsonBillStreamParser, consume_chat_stream
+from .bill_validator import strip_markdown_fence, load_bills_json, validate_bills
 
 logger = get_logger(__name__)
 
-deepseek_client = OpenAI(
-    api_key=Config.DEEPSEEK_API_KEY, base_url=Config.DEEPSEEK_BASE_URL
-)
+_deepseek_client = None
+_client_lock = threading.Lock()
+
+
+def get_deepseek_client():
+    """获取 DeepSeek 客户端(首次调用时创建, openai 库较重, 不在导入时加载)"""
+    global _deepseek_client
+
+    if _deepseek_client is None:
+        with _client_lock:
+            if _deepseek_client is None:
+                from openai import OpenAI
+
+                _deepseek_client = OpenAI(
+                    api_key=Config.DEEPSEEK_API_KEY, base_url=Config.DEEPSEEK_BASE_URL
+                )
+
+    return _deepseek_client
 
 ROW_FORMAT = "[发卡行,交易日,记账日,交易摘要,人民币金额,卡号末四位,交易地金额,记账币种]"
 
 
+def _create_stream_completion(messages, temperature, max_tokens, parser=None, **kwargs):
+    """流式调用 DeepSeek, 边接收边增量解析, 返回 (完整文本, 计费用响应对象)"""
+    stream = get_deepseek_client().chat.completions.create(
+        model=Config.DEEPSEEK_CHAT_MODEL,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True,
+        stream_options={"include_usage": True},
+        **kwargs,
+    )
+    return consume_chat_stream(stream, parser)
+
+
 @track_deepseek_usage(api_type="refine")
 def refine_bill_content(
-    content, original_filename, user_openid, workspace_id, file_upload_id
+    content, original_filename, user_openid, workspace_id, file_upload_id, on_row=None
 ):
-    """使用 DeepSeek 萃纯账单信息"""
+    """
+    使用 DeepSeek 萃纯账单信息
+
+    开启 DEEPSEEK_STREAM_ENABLED 时以流式方式调用, 每解析出一行完整记录即回调 on_row
+    """
     try:
         logger.info(f"开始调用 DeepSeek API 提纯:{original_filename}")
 
@@ -53,20 +87,29 @@ def refine_bill_content(
 
 请严格按照格式输出,不要添加任何解释文字。"""
 
-        response = deepseek_client.chat.completions.create(
-            model=Config.DEEPSEEK_CHAT_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "你是一个专业的财务账单分析助手,擅长从账单中提取关键信息。你必须严格按照指定格式输出,不添加任何额外说明。",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.3,
-            max_tokens=2000,
-        )
-
-        refined_content = response.choices[0].message.content
+        messages = [
+            {
+                "role": "system",
+                "content": "你是一个专业的财务账单分析助手,擅长从账单中提取关键信息。你必须严格按照指定格式输出,不添加任何额外说明。",
+            },
+            {"role": "user", "content": prompt},
+        ]
+
+        if Config.DEEPSEEK_STREAM_ENABLED:
+            refined_content, response = _create_stream_completion(
+                messages,
+                temperature=0.3,
+                max_tokens=2000,
+                parser=RowStreamParser(on_row) if on_row else None,
+            )
+        else:
+            response = get_deepseek_client().chat.completions.create(
+                model=Config.DEEPSEEK_CHAT_MODEL,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=2000,
+            )
+            refined_content = response.choices[0].message.content
         logger.info(f"DeepSeek API 调用成功 - refined_content: {refined_content}")
 
         return f"-{refined_content}", response
@@ -77,8 +120,14 @@ def refine_bill_content(
 
 
 @track_deepseek_usage(api_type="convert")
-def convert_bills_to_json(refined_content, user_openid, workspace_id, file_upload_id):
-    """将提纯后的账单文本转换为结构化 JSON"""
+def convert_bills_to_json(
+    refined_content, user_openid, workspace_id, file_upload_id, on_bill=None
+):
+    """
+    将提纯后的账单文本转换为结构化 JSON
+
+    开启 DEEPSEEK_STREAM_ENABLED 时以流式方式调用, 每闭合一个账单对象即回调 on_bill
+    """
     try:
         logger.info(f"开始调用 DeepSeek 转换为 JSON,内容长度:{len(refined_content)}")
 
@@ -111,35 +160,113 @@ def convert_bills_to_json(refined_content, user_openid, workspace_id, file_uploa
 请输出纯JSON,示例格式:
 {{"bills": [{{"bank": "招商银行", "trade_date": "2024-11-15", "record_date": "2024-11-16", "description": "AMAZON购物", "amount_cny": "", "card_last4": "1234", "amount_foreign": 99.99, "currency": "USD", "raw_line": {ROW_FORMAT}}}]}}"""
 
-        response = deepseek_client.chat.completions.create(
-            model=Config.DEEPSEEK_CHAT_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "你是一个数据格式转换专家,擅长将文本数据转换为结构化 JSON。你必须只返回纯 JSON 格式,不添加任何解释或 markdown 标记。",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.1,
-            max_tokens=4000,
-        )
-
-        json_content_str = response.choices[0].message.content.strip()
+        messages = [
+            {
+                "role": "system",
+                "content": "你是一个数据格式转换专家,擅长将文本数据转换为结构化 JSON。你必须只返回纯 JSON 格式,不添加任何解释或 markdown 标记。",
+            },
+            {"role": "user", "content": prompt},
+        ]
+
+        if Config.DEEPSEEK_STREAM_ENABLED:
+            json_content_str, response = _create_stream_completion(
+                messages,
+                temperature=0.1,
+                max_tokens=4000,
+                parser=JsonBillStreamParser(on_bill) if on_bill else None,
+            )
+            json_content_str = json_content_str.strip()
+        else:
+            response = get_deepseek_client().chat.completions.create(
+                model=Config.DEEPSEEK_CHAT_MODEL,
+                messages=messages,
+                temperature=0.1,
+                max_tokens=4000,
+            )
+            json_content_str = response.choices[0].message.content.strip()
         logger.info(f"DeepSeek JSON 转换成功")
 
         # 清理可能的 markdown 标记
-        if json_content_str.startswith("```json"):
-            json_content_str = json_content_str[7:]
-        if json_content_str.startswith("```"):
-            json_content_str = json_content_str[3:]
-        if json_content_str.endswith("```"):
-            json_content_str = json_content_str[:-3]
-
-        json_content_str = json_content_str.strip()
+        json_content_str = strip_markdown_fence(json_content_str)
         logger.info(f"清理后的 JSON 字符:{json_content_str}")
-        json_content_data = json.loads(json_content_str)
-        return json_content_data.get("bills", []), response
+        return load_bills_json(json_content_str), response
 
     except Exception as e:
         logger.error(f"DeepSeek JSON 转换失败:{str(e)}")
         raise Exception(f"DeepSeek JSON 转换失败:{str(e)}")
+
+
+@track_deepseek_usage(api_type="extract")
+def extract_bills_to_json(
+    content, original_filename, user_openid, workspace_id, file_upload_id, on_bill=None
+):
+    """
+    单次调用直接从原始账单内容提取结构化 JSON(替代 refine → convert 两次调用)
+
+    使用 JSON 模式(response_format=json_object)约束输出, 返回前经本地校验与修复
+    """
+    try:
+        logger.info(f"开始调用 DeepSeek 单次提取:{original_filename}")
+
+        prompt = f"""请分析以下账单内容,提取符合条件的账单信息,并以 JSON 格式输出。
+
+提取规则:
+1. 提取所有非支付宝消费的账单
+2. 提取所有非微信消费的账单
+3. 如果账单满足上述二个条件,则提取
+
+输出要求:
+1. 输出一个 JSON 对象,包含 "bills" 数组,不要有任何 markdown 标记
+2. 每个账单包含以下字段:
+    - bank: 发卡行,银行名称
+    - trade_date: 交易日,YYYY-MM-DD 格式
+    - record_date: 记账日,YYYY-MM-DD 格式
+    - description: 交易摘要
+    - amount_cny: 人民币金额,数字;外币交易没有人民币金额时使用空字符串 ""
+    - card_last4: 卡号末四位
+    - amount_foreign: 交易地金额,数字,不含币种符号
+    - currency: 记账币种,如 "USD", "CNY"
+    - raw_line: 按 {ROW_FORMAT} 格式拼接的单行文本,无信息字段用 "-" 占位
+3. 若某字段无信息,使用空字符串 ""
+4. 如果没有符合条件的账单,返回 {{"bills": []}}
+
+账单内容:
+{content}
+
+示例格式:
+{{"bills": [{{"bank": "招商银行", "trade_date": "2024-11-15", "record_date": "2024-11-16", "description": "AMAZON购物", "amount_cny": "", "card_last4": "1234", "amount_foreign": 99.99, "currency": "USD", "raw_line": "[招商银行,2024-11-15,2024-11-16,AMAZON购物,-,1234,$99.99,USD]"}}]}}"""
+
+        messages = [
+            {
+                "role": "system",
+                "content": "你是一个专业的财务账单分析助手,擅长从账单中提取关键信息并输出结构化 JSON。你必须只返回纯 JSON 格式,不添加任何解释或 markdown 标记。",
+            },
+            {"role": "user", "content": prompt},
+        ]
+
+        if Config.DEEPSEEK_STREAM_ENABLED:
+            json_content_str, response = _create_stream_completion(
+                messages,
+                temperature=0.1,
+                max_tokens=4000,
+                parser=JsonBillStreamParser(on_bill) if on_bill else None,
+                response_format={"type": "json_object"},
+            )
+        else:
+            response = get_deepseek_client().chat.completions.create(
+                model=Config.DEEPSEEK_CHAT_MODEL,
+                messages=messages,
+                temperature=0.1,
+                max_tokens=4000,
+                response_format={"type": "json_object"},
+            )
+            json_content_str = response.choices[0].message.content or ""
+
+        logger.info(f"DeepSeek 单次提取成功 - 内容长度:{len(json_content_str)}")
+
+        bills = validate_bills(load_bills_json(json_content_str))
+        return bills, response
+
+    except Exception as e:
+        logger.error(f"DeepSeek 单次提取失败:{str(e)}")
+        raise Exception(f"DeepSeek 单次提取失败:{str(e)}")
@@ -0,0 +1,219 @@
+"""本地汇率表与人民币折算
+
+汇率从本地 CSV 加载(不访问网络), 按生效日期取值: 交易日当天或之前最近一次生效的汇率。
+每个币种在内存中保存按日期排序的数组, 单次查询 O(log n), 批量折算按币种向量化处理。
+numpy 在首次加载汇率表时才导入, 不计入应用启动耗时。
+"""
+
+import csv
+import os
+import threading
+from bisect import bisect_right
+from datetime import date, datetime
+from pathlib import Path
+from app.config import Config
+from app.utils.logger import get_logger
+from app.utils import metrics
+
+logger = get_logger(__name__)
+
+BASE_CURRENCY = "CNY"
+
+
+class FxRateTable:
+    """按币种保存 (生效日期序数, 汇率) 有序数组"""
+
+    def __init__(self, rates: dict = None):
+        import numpy as np
+
+        # {currency: (dates ndarray[int64], rates ndarray[float64])}
+        self._rates = {}
+        for currency, items in (rates or {}).items():
+            items = sorted(items)
+            self._rates[currency] = (
+                np.array([d.toordinal() for d, _ in items], dtype=np.int64),
+                np.array([rate for _, rate in items], dtype=np.float64),
+            )
+
+    @property
+    def currencies(self) -> list:
+        return sorted(self._rates)
+
+    def rate_on(self, currency: str, trade_date: date):
+        """
+        查询单个币种在指定日期的汇率
+
+        Returns:
+            1 单位外币折合人民币; 人民币返回 1.0; 无可用汇率返回 None
+        """
+        if currency == BASE_CURRENCY:
+            return 1.0
+        if currency not in self._rates or trade_date is None:
+            return None
+
+        dates, rates = self._rates[currency]
+        index = bisect_right(dates, trade_date.toordinal()) - 1
+        return float(rates[index]) if index >= 0 else None
+
+    def to_cny(self, currencies: list, trade_dates: list, amounts: list):
+        """
+        批量折算为人民币
+
+        Args:
+            currencies: 币种列表
+            trade_dates: 交易日列表(date, 可为 None)
+            amounts: 金额列表(Decimal/float, 可为 None)
+
+        Returns:
+            float64 数组(numpy.ndarray), 无法折算(无汇率/无日期/无金额)的位置为 NaN
+        """
+        import numpy as np
+
+        count = len(amounts)
+        result = np.full(count, np.nan)
+        if not count:
+            return result
+
+        values = np.fromiter(
+            (np.nan if amount is None else float(amount) for amount in amounts),
+            dtype=np.float64,
+            count=count,
+        )
+        ordinals = np.fromiter(
+            (-1 if d is None else d.toordinal() for d in trade_dates),
+            dtype=np.int64,
+            count=count,
+        )
+
+        # 币种编码为整数后按编码分组
+        codes = {}
+        currency_codes = np.fromiter(
+            (codes.setdefault(currency, len(codes)) for currency in currencies),
+            dtype=np.int64,
+            count=count,
+        )
+
+        for currency, code in codes.items():
+            positions = np.flatnonzero(currency_codes == code)
+
+            if currency == BASE_CURRENCY:
+                result[positions] = values[positions]
+                continue
+            if currency not in self._rates:
+                continue
+
+            dates, rates = self._rates[currency]
+            indexes = np.searchsorted(dates, ordinals[positions], side="right") - 1
+            valid = (indexes >= 0) & (ordinals[positions] >= 0)
+            result[positions[valid]] = values[positions[valid]] * rates[indexes[valid]]
+
+        return result
+
+
+def load_fx_rates(path) -> FxRateTable:
+    """
+    从 CSV 加载汇率表
+
+    CSV 表头: currency,effective_date,rate
+
+    Raises:
+        ValueError: 文件内容格式错误
+    """
+    rates = {}
+    with open(path, encoding="utf-8") as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                currency = row["currency"].strip().upper()
+                effective_date = datetime.strptime(
+                    row["effective_date"].strip(), "%Y-%m-%d"
+                ).date()
+                rate = float(row["rate"])
+            except (KeyError, ValueError, AttributeError):
+                raise ValueError(f"汇率表格式错误 - path: {path}, line: {line_no}")
+            rates.setdefault(currency, []).append((effective_date, rate))
+
+    logger.info(
+        f"汇率表加载完成 - path: {path}, currencies: {len(rates)}, "
+        f"rates: {sum(len(items) for items in rates.values())}"
+    )
+    return FxRateTable(rates)
+
+
+_table = None
+_table_mtime = None
+_table_lock = threading.Lock()
+
+
+def _rates_path() -> Path:
+    path = Path(Config.FX_RATES_FILE)
+    return path if path.is_absolute() else Config.BASE_DIR / path
+
+
+def get_fx_table() -> FxRateTable:
+    """
+    获取汇率表(文件修改后自动重新加载; 文件不存在时返回空表, 仅人民币可折算)
+    """
+    global _table, _table_mtime
+
+    path = _rates_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+
+    if _table is not None and mtime == _table_mtime:
+        metrics.CACHE_REQUESTS.inc("fx_table", "hit")
+        return _table
+
+    metrics.CACHE_REQUESTS.inc("fx_table", "miss")
+    with _table_lock:
+        if _table is None or mtime != _table_mtime:
+            if mtime is None:
+                logger.warning(f"汇率表文件不存在, 外币金额无法折算 - path: {path}")
+                _table = FxRateTable()
+            else:
+                _table = load_fx_rates(path)
+            _table_mtime = mtime
+
+    return _table
+
+
+def to_cny(currencies: list, trade_dates: list, amounts: list) -> list:
+    """
+    批量折算为人民币(保留两位小数)
+
+    Returns:
+        与输入等长的列表, 无法折算的位置为 None
+    """
+    converted = get_fx_table().to_cny(currencies, trade_dates, amounts).round(2)
+    # NaN 与自身不相等
+    return [None if value != value else value for value in converted.tolist()]
+
+
+def append_cny(rows, key, batch_size: int = 1000):
+    """
+    为行迭代器追加人民币折算列(按批向量化折算, 保持流式)
+
+    Args:
+        rows: 行迭代器
+        key: row -> (currency, trade_date, amount)
+        batch_size: 每批折算的行数
+
+    Yields:
+        原行字段 + [折合人民币]
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield from _append_cny_batch(batch, key)
+            batch = []
+
+    if batch:
+        yield from _append_cny_batch(batch, key)
+
+
+def _append_cny_batch(batch: list, key):
+    currencies, trade_dates, amounts = zip(*(key(row) for row in batch))
+    for row, cny in zip(batch, to_cny(currencies, trade_dates, amounts)):
+        yield [*row, cny]
@@ -1,9 +1,34 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import random
 import sys
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 from app.config import Config
-from .trace_util import get_trace_id
+from .trace_util import get_trace_id, get_route, get_current_span
+
+# 阶段耗时事件的结构化字段(见 app.utils.timing)
+STAGE_FIELDS = ("workspace_id", "file_id", "tokens", "bytes")
+
+
+def _stamp_context(record):
+    """记录 TraceID、路由与当前 span(需在发起日志的线程中调用)"""
+    try:
+        record.trace_id = get_trace_id()
+        record.route = get_route()
+    except Exception:
+        record.trace_id = "UNKNOWN"
+        record.route = None
+
+    # 阶段耗时事件自带 span_id(阶段结束时当前 span 已恢复为父 span)
+    if not hasattr(record, "span_id"):
+        current = get_current_span()
+        record.span_id = current.span_id if current else None
+        record.parent_span_id = current.parent_id if current else None
 
 
 class TraceIDFormatter(logging.Formatter):
@@ -20,15 +45,101 @@ class TraceIDFormatter(logging.Formatter):
         super().__init__(fmt, datefmt, style)
 
     def format(self, record):
-        try:
-            record.trace_id = get_trace_id()
-        except Exception:
-            record.trace_id = "UNKNOWN"
+        # 异步模式下 trace_id 已由 TraceIDFilter 在调用线程中写入
+        if not hasattr(record, "trace_id"):
+            _stamp_context(record)
         return super().format(record)
 
 
+class JsonFormatter(logging.Formatter):
+    """
+    JSON 日志格式化器(每行一个 JSON 对象)
+
+    固定输出 ts / level / logger / message / trace_id / span_id / parent_span_id / route /
+    stage / duration_ms / workspace_id / file_id / tokens / bytes, 缺失的字段为 null
+    """
+
+    def format(self, record):
+        if not hasattr(record, "trace_id"):
+            _stamp_context(record)
+
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "trace_id": record.trace_id,
+            "span_id": record.span_id,
+            "parent_span_id": record.parent_span_id,
+            "route": record.route,
+            "stage": getattr(record, "stage", None),
+            "duration_ms": getattr(record, "duration_ms", None),
+        }
+        for field in STAGE_FIELDS:
+            entry[field] = getattr(record, field, None)
+        if hasattr(record, "status"):
+            entry["status"] = record.status
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TraceIDFilter(logging.Filter):
+    """在调用线程中记录 TraceID 与路由(请求上下文在日志线程中不可用)"""
+
+    def filter(self, record):
+        _stamp_context(record)
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """DEBUG 日志按比例采样, 其他级别全部保留"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class MessageTruncateFilter(logging.Filter):
+    """合并参数并截断过长的消息(异常堆栈不截断)"""
+
+    def __init__(self, max_length: int):
+        super().__init__()
+        self.max_length = max_length
+
+    def filter(self, record):
+        if self.max_length:
+            message = record.getMessage()
+            if len(message) > self.max_length:
+                omitted = len(message) - self.max_length
+                record.msg = f"{message[: self.max_length]}...(已截断 {omitted} 字符)"
+                record.args = None
+        return True
+
+
+class DeferredFormatQueueHandler(QueueHandler):
+    """只在调用线程合并消息参数, 格式化与异常堆栈渲染交给后台线程"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
 class LoggerManager:
-    """日志管理器"""
+    """
+    日志管理器
+
+    异步模式(LOG_ASYNC=true)下业务线程只把日志写入内存队列, 由 QueueListener 后台线程
+    统一格式化并写入控制台/文件; 进程 fork 后在子进程中重建队列与后台线程
+    """
 
     MAX_BYTES = 10 * 1024 * 1024
     BACKUP_COUNT = 5
@@ -39,21 +150,27 @@ class LoggerManager:
         self.level = getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO)
         self.enable_file = Config.LOG_ENABLE_FILE
         self.enable_console = Config.LOG_ENABLE_CONSOLE
+        self.enable_async = Config.LOG_ASYNC
+        self.log_format = Config.LOG_FORMAT
+        self.max_message_length = Config.LOG_MAX_MESSAGE_LENGTH
+        self.debug_sample_rate = Config.LOG_DEBUG_SAMPLE_RATE
+        self.listener = None
         self._initialize()
 
-    def _initialize(self):
-        root_logger = logging.getLogger()
-        root_logger.handlers.clear()
-        root_logger.setLevel(self.level)
+        if self.enable_async:
+            atexit.register(self.stop)
+            os.register_at_fork(after_in_child=self._initialize)
 
+    def _build_handlers(self) -> list:
         # 使用自定义 Formatter
-        formatter = TraceIDFormatter()
+        formatter = JsonFormatter() if self.log_format == "json" else TraceIDFormatter()
+        handlers = []
 
         if self.enable_console:
             console_handler = logging.StreamHandler(sys.stdout)
             console_handler.setLevel(self.level)
             console_handler.setFormatter(formatter)
-            root_logger.addHandler(console_handler)
+            handlers.append(console_handler)
 
         if self.enable_file:
             Path(self.log_dir).mkdir(parents=True, exist_ok=True)
@@ -66,10 +183,47 @@ class LoggerManager:
             )
             file_handler.setLevel(self.level)
             file_handler.setFormatter(formatter)
-            root_logger.addHandler(file_handler)
+            handlers.append(file_handler)
+
+        return handlers
+
+    def _initialize(self):
+        root_logger = logging.getLogger()
+        root_logger.handlers.clear()
+        root_logger.setLevel(self.level)
+
+        handlers = self._build_handlers()
+        filters = [
+            DebugSamplingFilter(self.debug_sample_rate),
+            MessageTruncateFilter(self.max_message_length),
+        ]
+
+        if self.enable_async:
+            log_queue = queue.SimpleQueue()
+            queue_handler = DeferredFormatQueueHandler(log_queue)
+            queue_handler.addFilter(TraceIDFilter())
+            for log_filter in filters:
+                queue_handler.addFilter(log_filter)
+            root_logger.addHandler(queue_handler)
+
+            self.listener = QueueListener(
+                log_queue, *handlers, respect_handler_level=True
+            )
+            self.listener.start()
+        else:
+            for handler in handlers:
+                for log_filter in filters:
+                    handler.addFilter(log_filter)
+                root_logger.addHandler(handler)
 
         logging.captureWarnings(True)
 
+    def stop(self):
+        """停止后台日志线程(写完队列中剩余的日志)"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
     def get_logger(self, name="app"):
         return logging.getLogger(name)
 
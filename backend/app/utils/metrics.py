@@ -0,0 +1,373 @@
+"""进程内指标(Prometheus 文本格式, 由 /api/metrics 输出)
+
+热路径上只做字典累加(每个指标一把锁, 无 I/O、无格式化); 队列深度、连接池、OCR 状态等
+在抓取时由采集函数读取, 平时不产生开销。
+
+gunicorn 多进程部署时(init_worker 调用 enable_multiprocess), 每个 worker 每隔
+SNAPSHOT_INTERVAL 秒把自己的计数写入 LOG_DIR/metrics/<pid>.json, 抓取时由处理请求的 worker
+合并所有 worker 的快照输出(其他 worker 的数据最多延迟一个间隔)。已退出 worker 的计数器与
+直方图并入 archive.json, 总数不会因 worker 回收(max_requests)而回退; 仪表盘只统计存活的 worker。
+抓取时执行的采集函数(连接池、线程池等)只反映处理本次抓取的 worker, 队列深度等全局数据不受影响。
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows(不支持 gunicorn 多进程, 不会开启多进程汇总)
+    fcntl = None
+
+# 请求耗时分桶(秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# 数据库语句耗时分桶(秒)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+# 后台阶段(解析/精炼)耗时分桶(秒)
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# 多进程模式下写入快照的间隔(秒)
+SNAPSHOT_INTERVAL = 5
+ARCHIVE_FILE = "archive.json"
+
+_metrics = []
+_collectors = []
+_multiprocess_dir = None
+_snapshot_lock = threading.Lock()
+_snapshot_stop = threading.Event()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def snapshot(self) -> dict:
+        """当前进程的原始值副本 {标签值元组: 值}"""
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge_value(current, value):
+        return value if current is None else current + value
+
+    def samples(self, values: dict):
+        """[(后缀, 标签字典, 值)]"""
+        return [
+            ("", dict(zip(self.labelnames, key)), value)
+            for key, value in values.items()
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [各分桶计数(最后一个为 +Inf), 总和]
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                key: [list(counts), total]
+                for key, (counts, total) in self._values.items()
+            }
+
+    @staticmethod
+    def merge_value(current, value):
+        if current is None:
+            return [list(value[0]), value[1]]
+        return [[a + b for a, b in zip(current[0], value[0])], current[1] + value[1]]
+
+    def samples(self, values: dict):
+        result = []
+        for key, (counts, total) in values.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                result.append(("_bucket", {**labels, "le": str(bound)}, cumulative))
+            result.append(("_sum", labels, total))
+            result.append(("_count", labels, cumulative))
+        return result
+
+
+def register_collector(collect) -> None:
+    """
+    注册抓取时执行的采集函数
+
+    Args:
+        collect: 无参函数, 返回 [(指标名, 类型, 说明, [(标签字典, 值)])]
+    """
+    _collectors.append(collect)
+
+
+# ==================== 指标定义 ====================
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP 请求数", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时", ("method", "route")
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "处理中的 HTTP 请求数")
+
+DB_STATEMENTS = Counter("db_statements_total", "数据库语句执行数", ("operation",))
+DB_LATENCY = Histogram(
+    "db_statement_duration_seconds", "数据库语句耗时", ("operation",), DB_BUCKETS
+)
+
+STAGE_LATENCY = Histogram(
+    "ingest_stage_duration_seconds",
+    "文件解析/精炼各阶段耗时",
+    ("stage", "status"),
+    STAGE_BUCKETS,
+)
+INGEST_RUNNING = Gauge("ingest_executor_running", "解析线程池中执行中的任务数")
+
+LLM_CALLS = Counter("llm_calls_total", "DeepSeek 调用次数", ("api_type", "status"))
+LLM_TOKENS = Counter("llm_tokens_total", "DeepSeek Token 消耗", ("api_type", "kind"))
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "进程内缓存命中/未命中次数", ("cache", "result")
+)
+
+PROCESS_START_TIME = time.time()
+
+
+def reset_after_fork() -> None:
+    """fork 后清空从父进程继承的计数(gunicorn preload 时父进程的启动查询不计入 worker)"""
+    global PROCESS_START_TIME
+    PROCESS_START_TIME = time.time()
+    for metric in _metrics:
+        with metric._lock:
+            metric._values.clear()
+
+
+# ==================== 多进程汇总 ====================
+
+
+def _snapshot_path(pid: int) -> Path:
+    return _multiprocess_dir / f"{pid}.json"
+
+
+def _dump_snapshot() -> dict:
+    """{指标名: [[标签值列表, 值]]}"""
+    return {
+        metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+        for metric in _metrics
+    }
+
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        # 写入中途崩溃的残留文件
+        return {}
+
+
+def _merge(values: dict, snapshot: dict, include_gauges: bool = True) -> None:
+    """把快照累加到 values({指标名: {标签值元组: 值}})"""
+    for metric in _metrics:
+        if metric.kind == "gauge" and not include_gauges:
+            continue
+        merged = values.setdefault(metric.name, {})
+        for key, value in snapshot.get(metric.name, []):
+            key = tuple(key)
+            merged[key] = metric.merge_value(merged.get(key), value)
+
+
+@contextmanager
+def _archive_lock():
+    """归档与读取快照时持有的文件锁(避免退出中的 worker 在归档前后被重复或漏计)"""
+    if fcntl is None:
+        yield
+        return
+
+    with open(_multiprocess_dir / f"{ARCHIVE_FILE}.lock", "w") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def _archive(snapshot: dict, path: Path) -> None:
+    """
+    把已退出 worker 的计数器/直方图并入归档并删除其快照文件(调用方持有 _archive_lock)
+
+    仪表盘(处理中请求数等)只反映存活进程, 不归档
+    """
+    archive_path = _multiprocess_dir / ARCHIVE_FILE
+    values = {}
+    _merge(values, _read_json(archive_path))
+    _merge(values, snapshot, include_gauges=False)
+    _write_json(
+        archive_path,
+        {
+            name: [[list(key), value] for key, value in merged.items()]
+            for name, merged in values.items()
+        },
+    )
+    path.unlink(missing_ok=True)
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _snapshot_loop() -> None:
+    while not _snapshot_stop.wait(SNAPSHOT_INTERVAL):
+        with _snapshot_lock:
+            # 退出归档后不再写入, 否则快照会在归档之外再被计入一次
+            if _snapshot_stop.is_set():
+                return
+            try:
+                _write_json(_snapshot_path(os.getpid()), _dump_snapshot())
+            except OSError:
+                pass
+
+
+def clear_multiprocess(directory) -> None:
+    """主进程启动时清空上次运行遗留的快照与归档"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in directory.glob("*.json"):
+        path.unlink(missing_ok=True)
+
+
+def enable_multiprocess(directory) -> None:
+    """worker 启动时开启多进程汇总(定期写入本进程快照)"""
+    global _multiprocess_dir
+
+    _multiprocess_dir = Path(directory)
+    _multiprocess_dir.mkdir(parents=True, exist_ok=True)
+    threading.Thread(
+        target=_snapshot_loop, name="metrics-snapshot", daemon=True
+    ).start()
+
+
+def shutdown_multiprocess() -> None:
+    """worker 退出前把计数并入归档"""
+    if _multiprocess_dir is None:
+        return
+    with _snapshot_lock:
+        _snapshot_stop.set()
+    with _archive_lock():
+        _archive(_dump_snapshot(), _snapshot_path(os.getpid()))
+
+
+def _collect_values() -> dict:
+    """本进程的值, 多进程模式下加上其他 worker 快照与已退出 worker 的归档"""
+    values = {}
+    _merge(values, _dump_snapshot())
+    if _multiprocess_dir is None:
+        return values
+
+    with _archive_lock():
+        _merge(values, _read_json(_multiprocess_dir / ARCHIVE_FILE))
+        for path in _multiprocess_dir.glob("*.json"):
+            if not path.stem.isdigit() or int(path.stem) == os.getpid():
+                continue
+            snapshot = _read_json(path)
+            if _is_alive(int(path.stem)):
+                _merge(values, snapshot)
+            else:
+                # 异常退出(未执行 worker_exit)的 worker: 本次直接计入, 同时归档
+                _merge(values, snapshot, include_gauges=False)
+                _archive(snapshot, path)
+    return values
+
+
+# ==================== 输出 ====================
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_sample(name, labels, value) -> str:
+    if not labels:
+        return f"{name} {value}"
+    label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+    return f"{name}{{{label_text}}} {value}"
+
+
+def render() -> str:
+    """输出 Prometheus 文本格式(text/plain; version=0.0.4)"""
+    values = _collect_values()
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for suffix, labels, value in metric.samples(values.get(metric.name, {})):
+            lines.append(_format_sample(metric.name + suffix, labels, value))
+
+    for collect in _collectors:
+        for name, kind, help_text, samples in collect():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(_format_sample(name, labels, value))
+
+    lines.append("# HELP process_start_time_seconds 进程启动时间")
+    lines.append("# TYPE process_start_time_seconds gauge")
+    lines.append(_format_sample("process_start_time_seconds", {}, PROCESS_START_TIME))
+    return "\n".join(lines) + "\n"
@@ -1,10 +1,135 @@
+import sys
+import threading
+import time
+from importlib import import_module
 from app.utils.logger import get_logger
-from .excel import parse_excel
-from .pdf import parse_pdf
-from .image import parse_image
+from app.utils import metrics
 
 logger = get_logger(__name__)
 
+# 解析器注册表: 文件扩展名 -> (模块, 函数名)
+# 模块在首次解析对应类型文件时才导入(image 依赖 cv2/paddleocr, 导入耗时数秒)
+PARSER_REGISTRY = {
+    "pdf": (".pdf", "parse_pdf"),
+    "png": (".image", "parse_image"),
+    "jpg": (".image", "parse_image"),
+    "jpeg": (".image", "parse_image"),
+    "xlsx": (".excel", "parse_excel"),
+    "xls": (".excel", "parse_excel"),
+}
+
+_parsers = {}
+_parsers_lock = threading.Lock()
+
+
+def get_parser(file_ext):
+    """
+    获取文件类型对应的解析函数(首次调用时导入解析模块)
+
+    Raises:
+        Exception: 不支持的文件格式
+    """
+    parser = _parsers.get(file_ext)
+    if parser is not None:
+        return parser
+
+    if file_ext not in PARSER_REGISTRY:
+        error_msg = f"不支持的文件格式: {file_ext}"
+        logger.error(error_msg)
+        raise Exception(error_msg)
+
+    with _parsers_lock:
+        if file_ext not in _parsers:
+            module_name, func_name = PARSER_REGISTRY[file_ext]
+            module = import_module(module_name, __name__)
+            _parsers[file_ext] = getattr(module, func_name)
+            logger.info(f"加载文件解析器 - ext: {file_ext}, parser: {module.__name__}")
+
+    return _parsers[file_ext]
+
+
+# OCR 模型状态: cold(未加载) / warming(预热中) / ready / failed
+_ocr_status = {"status": "cold", "elapsed_ms": None, "error": None}
+
+
+def warm_up_ocr():
+    """加载并预热 PaddleOCR 模型(避免首个图片请求承担模型加载耗时)"""
+    _ocr_status.update(status="warming", error=None)
+    started = time.perf_counter()
+    try:
+        get_parser("png")
+        from .image import prime_ocr
+
+        prime_ocr()
+    except Exception as e:
+        _ocr_status.update(status="failed", error=str(e))
+        logger.error(f"OCR模型预热失败 - error: {str(e)}")
+        raise
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000)
+    _ocr_status.update(status="ready", elapsed_ms=elapsed_ms)
+    logger.info(f"OCR模型预热完成 - elapsed_ms: {elapsed_ms}")
+
+
+def start_ocr_warm_up() -> threading.Thread:
+    """在后台线程中预热 OCR 模型, 启动流程不等待"""
+    _ocr_status.update(status="warming", error=None)
+    thread = threading.Thread(target=_warm_up_quietly, name="ocr-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def _warm_up_quietly():
+    try:
+        warm_up_ocr()
+    except Exception:
+        # 失败状态已记录在 _ocr_status 中, 由就绪检查接口对外报告
+        pass
+
+
+def get_parser_status() -> dict:
+    """
+    获取各类解析器的就绪状态
+
+    Returns:
+        {"pdf": ..., "excel": ..., "image": ...}
+        pdf/excel 导入开销小, 未加载时为 lazy; image 取 OCR 模型状态
+    """
+    status = {}
+    for file_ext, (module_name, _) in PARSER_REGISTRY.items():
+        name = module_name.lstrip(".")
+        if name != "image":
+            status[name] = "ready" if file_ext in _parsers else "lazy"
+
+    image = dict(_ocr_status)
+    # 未预热时首个图片请求也会加载模型
+    ocr_module = sys.modules.get(f"{__name__}.image")
+    if image["status"] == "cold" and ocr_module and ocr_module._ocr_instance:
+        image["status"] = "ready"
+    status["image"] = image
+    return status
+
+
+def _collect_ocr_metrics():
+    image = get_parser_status()["image"]
+    return [
+        (
+            "ocr_ready",
+            "gauge",
+            "OCR 模型是否已加载(1/0)",
+            [({}, 1 if image["status"] == "ready" else 0)],
+        ),
+        (
+            "ocr_warmup_seconds",
+            "gauge",
+            "OCR 预热耗时",
+            [({}, (image["elapsed_ms"] or 0) / 1000)],
+        ),
+    ]
+
+
+metrics.register_collector(_collect_ocr_metrics)
+
 
 def parse_file(filepath, file_ext):
     """
@@ -12,16 +137,7 @@ def parse_file(filepath, file_ext):
     : "pdf", "png", "jpg", "jpeg", "xlsx", "xls"
     """
     try:
-        if file_ext == "pdf":
-            return parse_pdf(filepath)
-        elif file_ext in ["png", "jpg", "jpeg"]:
-            return parse_image(filepath)
-        elif file_ext in ["xlsx", "xls"]:
-            return parse_excel(filepath)
-        else:
-            error_msg = f"不支持的文件格式: {file_ext}"
-            logger.error(error_msg)
-            raise Exception(error_msg)
+        return get_parser(file_ext)(filepath)
 
     except Exception as e:
         # 确保异常向上传递
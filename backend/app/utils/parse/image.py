@@ -27,6 +27,14 @@ def get_ocr_instance() -> PaddleOCR:
     return _ocr_instance
 
 
+def prime_ocr() -> None:
+    """加载 OCR 模型并用空白图片执行一次识别(完成推理引擎的首次初始化)"""
+    ocr = get_ocr_instance()
+    blank = np.full((64, 256, 3), 255, dtype=np.uint8)
+    ocr.predict(blank)
+    logger.info("PaddleOCR 预热完成")
+
+
 def parse_image(filepath: str, min_confidence: float = 0.5) -> str:
     """
     使用PaddleOCR解析图片中的文本
@@ -126,7 +134,7 @@ def parse_image(filepath: str, min_confidence: float = 0.5) -> str:
             f"识别行数: {len(extracted_lines)}, "
             f"平均置信度: {avg_confidence:.2f}"
         )
-        logger.info(f"识别文本预览: {extracted_text}")
+        logger.debug(f"识别文本预览: {extracted_text}")
 
         return extracted_text
 
@@ -0,0 +1,241 @@
+"""按需性能剖析(cProfile)
+
+开启后每个请求/解析任务在 cProfile 下执行, 耗时超过阈值或被抽样命中时把结果保存到
+LOG_DIR/profiles/<时间>-<类型>-<追踪ID>.prof(可用 python -m pstats / snakeviz 查看),
+其余直接丢弃。关闭时每次只多一次开关判断(设置文件按间隔检查, 不在每次请求时读取)。
+
+开关与阈值可通过 /api/admin/profiling 在运行时修改: 设置写入 LOG_DIR/profiling.json,
+各进程(gunicorn worker、解析 worker)每隔 SETTINGS_CHECK_INTERVAL 秒检查一次文件变化。
+
+限制: 每个进程同一时刻只剖析一个请求/任务。cProfile 的剖析钩子并非严格按线程隔离(Python 3.12
+起基于解释器级的 sys.monitoring, 同时开启第二个剖析器会抛出 ValueError, 开启期间其他线程的调用
+也可能被计入), 因此用进程级锁保证只有一个剖析器处于开启状态, 其间的其他请求不剖析(记录日志)。
+并发较高时慢请求可能恰好未被剖析, 剖析结果中也可能混入同时段其他线程的调用。
+"""
+
+import cProfile
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from app.config import Config
+from app.utils.logger import get_logger
+from app.utils.trace_util import get_trace_id
+
+logger = get_logger(__name__)
+
+# 检查设置文件变化的间隔(秒)
+SETTINGS_CHECK_INTERVAL = 5
+
+_settings = {
+    "enabled": Config.PROFILE_ENABLED,
+    "slow_ms": Config.PROFILE_SLOW_MS,
+    "sample_rate": Config.PROFILE_SAMPLE_RATE,
+}
+_settings_mtime = None
+_next_check = 0.0
+_settings_lock = threading.Lock()
+# 进程内同一时刻只允许一个剖析器开启
+_active_lock = threading.Lock()
+
+
+def _settings_path():
+    return Config.LOG_DIR / "profiling.json"
+
+
+def _profile_dir():
+    return Config.LOG_DIR / "profiles"
+
+
+def _refresh_settings() -> None:
+    """按间隔检查设置文件, 有变化时重新加载"""
+    global _settings_mtime, _next_check
+
+    now = time.monotonic()
+    if now < _next_check:
+        return
+    _next_check = now + SETTINGS_CHECK_INTERVAL
+
+    path = _settings_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return
+    if mtime == _settings_mtime:
+        return
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            loaded = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取剖析设置失败 - path: {path}, error: {str(e)}")
+        return
+
+    with _settings_lock:
+        _settings.update({key: loaded[key] for key in _settings if key in loaded})
+        _settings_mtime = mtime
+
+
+def is_enabled() -> bool:
+    _refresh_settings()
+    return _settings["enabled"]
+
+
+def get_settings() -> dict:
+    _refresh_settings()
+    return dict(_settings)
+
+
+def update_settings(
+    enabled: bool = None, slow_ms: int = None, sample_rate: float = None
+) -> dict:
+    """
+    修改剖析设置(写入设置文件, 其他进程在下次检查时生效)
+
+    Raises:
+        ValueError: 参数不合法
+    """
+    global _settings_mtime
+
+    if slow_ms is not None and slow_ms < 0:
+        raise ValueError("slow_ms 不能小于 0")
+    if sample_rate is not None and not 0 <= sample_rate <= 1:
+        raise ValueError("sample_rate 取值范围为 0~1")
+
+    with _settings_lock:
+        changes = {"enabled": enabled, "slow_ms": slow_ms, "sample_rate": sample_rate}
+        _settings.update(
+            {key: value for key, value in changes.items() if value is not None}
+        )
+
+        path = _settings_path()
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_settings, f)
+        os.replace(tmp_path, path)
+        _settings_mtime = os.path.getmtime(path)
+        settings = dict(_settings)
+
+    logger.info(f"剖析设置已更新 - settings: {settings}")
+    return settings
+
+
+class ProfileSession:
+    """一次剖析(请求或解析任务)"""
+
+    __slots__ = ("profiler", "sampled", "started")
+
+    def __init__(self, profiler, sampled):
+        self.profiler = profiler
+        self.sampled = sampled
+        self.started = time.perf_counter()
+
+
+def start(kind: str):
+    """
+    开启剖析, 未开启或本进程已有剖析进行中时返回 None
+
+    Args:
+        kind: 类型(request / ingest), 用于日志
+
+    Returns:
+        ProfileSession / None
+    """
+    if not is_enabled():
+        return None
+
+    if not _active_lock.acquire(blocking=False):
+        logger.info(f"已有剖析进行中, 本次不剖析 - kind: {kind}")
+        return None
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # 进程内已有其他剖析器(如外部工具)开启
+        _active_lock.release()
+        logger.warning(f"开启剖析失败 - kind: {kind}, error: {str(e)}")
+        return None
+    return ProfileSession(profiler, random.random() < _settings["sample_rate"])
+
+
+def finish(session, kind: str):
+    """
+    结束剖析, 超过阈值或抽样命中时保存
+
+    Args:
+        kind: 类型(request / ingest), 用于文件名
+
+    Returns:
+        保存的文件路径, 未保存时返回 None
+    """
+    try:
+        session.profiler.disable()
+    finally:
+        _active_lock.release()
+    duration_ms = (time.perf_counter() - session.started) * 1000
+    if not session.sampled and duration_ms < _settings["slow_ms"]:
+        return None
+
+    try:
+        return _save(session.profiler, kind, duration_ms)
+    except OSError as e:
+        logger.warning(f"保存剖析结果失败 - kind: {kind}, error: {str(e)}")
+        return None
+
+
+def _save(profiler, kind: str, duration_ms: float) -> str:
+    directory = _profile_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    # 追踪ID可能来自请求头, 只保留安全字符
+    trace_id = re.sub(r"[^A-Za-z0-9_-]", "", get_trace_id())[:64]
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    path = directory / f"{timestamp}-{kind}-{trace_id}.prof"
+    profiler.dump_stats(path)
+    logger.info(
+        f"已保存剖析结果 - kind: {kind}, duration_ms: {duration_ms:.1f}, path: {path}"
+    )
+
+    _prune(directory)
+    return str(path)
+
+
+def _prune(directory) -> None:
+    """只保留最近 PROFILE_MAX_FILES 个剖析文件"""
+    files = sorted(directory.glob("*.prof"), key=os.path.getmtime)
+    for path in files[: max(0, len(files) - Config.PROFILE_MAX_FILES)]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def profiled(kind: str):
+    """
+    装饰器: 开启剖析时对函数执行过程剖析(用于后台解析任务)
+
+    用法:
+        @profiled("ingest")
+        def process_file_async(...):
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            session = start(kind)
+            if session is None:
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                finish(session, kind)
+
+        return wrapper
+
+    return decorator
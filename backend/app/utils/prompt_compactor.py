@@ -0,0 +1,147 @@
+"""调用 DeepSeek 前的账单内容压缩与 Token 预估"""
+
+import re
+from collections import Counter
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 出现次数达到该值且不含交易特征的行视为页眉/页脚(保留首次出现, 其中可能含发卡行信息)
+REPEATED_LINE_THRESHOLD = 3
+# 页眉/页脚去重只处理较长的文本行; OCR/PDF 常把表格拆成一格一行,
+# 日期、卡号、金额等短单元格即使重复出现也必须保留
+MIN_BOILERPLATE_CHARS = 12
+# 去除数字、符号后至少保留的文字数(纯数字/日期/金额行不视为页眉页脚)
+MIN_BOILERPLATE_TEXT_CHARS = 6
+
+# 提纯规则要求排除的支付渠道(仅对含日期与金额的完整交易行生效, 避免误删 OCR 拆行)
+EXCLUDED_CHANNEL_PATTERN = re.compile(r"支付宝|微信|财付通|alipay|wechat|tenpay", re.I)
+
+# 法律声明、客服说明等与账单明细无关的文本
+BOILERPLATE_PATTERN = re.compile(
+    r"温馨提示|重要提示|注意事项|客服热线|客服电话|如有疑问|免责|版权所有|"
+    r"还款方式|积分规则|第\s*\d+\s*页|共\s*\d+\s*页|page\s*\d+",
+    re.I,
+)
+
+_DATE_FEATURE = re.compile(r"\d{4}[-/.年]\d{1,2}|\d{1,2}[-/月]\d{1,2}|\d{8}")
+_AMOUNT_FEATURE = re.compile(r"\d+\.\d{2}\b")
+_DIGITS = re.compile(r"\d+")
+_WHITESPACE = re.compile(r"[ \t　\xa0]+")
+_CJK = re.compile(r"[一-鿿　-〿＀-￯]")
+_NON_TEXT = re.compile(r"[\d\s\W_]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    本地估算 Token 数
+
+    按 DeepSeek 官方换算: 1 个中文字符约 0.6 token, 1 个英文字符约 0.3 token
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK.findall(text))
+    other_count = len(text) - cjk_count
+    return int(cjk_count * 0.6 + other_count * 0.3) + 1
+
+
+def _is_transaction_line(line: str) -> bool:
+    return bool(_DATE_FEATURE.search(line) and _AMOUNT_FEATURE.search(line))
+
+
+def _is_boilerplate_candidate(line: str) -> bool:
+    """较长且以文字为主的行才可能被当作页眉/页脚/声明去除"""
+    if len(line) < MIN_BOILERPLATE_CHARS:
+        return False
+    return len(_NON_TEXT.sub("", line)) >= MIN_BOILERPLATE_TEXT_CHARS
+
+
+def compact_bill_content(content: str) -> str:
+    """
+    压缩账单原始内容
+
+    1. 合并连续空白, 去除空行
+    2. 去除重复出现的页眉/页脚(数字归一后比较, 保留首次出现)与法律声明类文本,
+       仅处理较长的文字行, 日期/卡号/金额等短单元格一律保留
+    3. 去除支付宝/微信渠道的完整交易行(提纯规则本就会丢弃)
+    """
+    lines = []
+    for line in content.splitlines():
+        line = _WHITESPACE.sub(" ", line).strip()
+        if line:
+            lines.append(line)
+
+    signature_counts = Counter(_DIGITS.sub("#", line) for line in lines)
+
+    kept = []
+    seen_signatures = set()
+    for line in lines:
+        is_transaction = _is_transaction_line(line)
+
+        if is_transaction and EXCLUDED_CHANNEL_PATTERN.search(line):
+            continue
+
+        if not is_transaction and _is_boilerplate_candidate(line):
+            if BOILERPLATE_PATTERN.search(line):
+                continue
+            signature = _DIGITS.sub("#", line)
+            if signature_counts[signature] >= REPEATED_LINE_THRESHOLD:
+                if signature in seen_signatures:
+                    continue
+                seen_signatures.add(signature)
+
+        kept.append(line)
+
+    return "\n".join(kept)
+
+
+def split_by_token_budget(content: str, max_tokens: int) -> list:
+    """按行切分内容, 保证每段预估 Token 不超过 max_tokens"""
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for line in content.splitlines():
+        line_tokens = estimate_tokens(line)
+        if current and current_tokens + line_tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(line)
+        current_tokens += line_tokens
+
+    if current:
+        chunks.append("\n".join(current))
+
+    return chunks
+
+
+def prepare_prompt_content(
+    content: str, enable_compact: bool, chunk_tokens: int, max_tokens: int
+) -> tuple[list, dict]:
+    """
+    压缩并按预算切分账单内容
+
+    Returns:
+        (chunks, stats) stats: {'tokens_before', 'tokens_after'}
+
+    Raises:
+        ValueError: 压缩后仍超过 max_tokens, 拒绝调用以避免扣费
+    """
+    tokens_before = estimate_tokens(content)
+    compacted = compact_bill_content(content) if enable_compact else content
+    tokens_after = estimate_tokens(compacted)
+
+    logger.info(
+        f"账单内容压缩 - tokens_before: {tokens_before}, tokens_after: {tokens_after}, "
+        f"chars: {len(content)} -> {len(compacted)}"
+    )
+
+    if tokens_after > max_tokens:
+        raise ValueError(
+            f"[DEEPSEEK]账单内容过长(预估 {tokens_after} tokens, 上限 {max_tokens}), "
+            f"请拆分文件后重新上传"
+        )
+
+    stats = {"tokens_before": tokens_before, "tokens_after": tokens_after}
+    return split_by_token_budget(compacted, chunk_tokens), stats
@@ -0,0 +1,113 @@
+"""请求级 SQL 统计
+
+数据库引擎的语句事件(app.database)把每条语句的耗时记入当前上下文的 QueryStats:
+请求钩子为每个请求开启一份统计, 结束时检查同一条语句(参数化后的 SQL 文本)的重复次数,
+超过 DB_N_PLUS_ONE_THRESHOLD 视为疑似 N+1 查询输出告警; APP_DEBUG 时附加到响应头。
+
+查询预算(可在测试/基准脚本中使用):
+
+    with assert_query_budget(5):
+        client.get("/api/workspaces/xxx")
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import get_ident
+
+_stats_var = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    """一段执行区间内的语句数、数据库耗时与各语句执行次数"""
+
+    __slots__ = ("count", "total_ms", "statements", "parent", "thread_id")
+
+    def __init__(self, parent=None):
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements = Counter()
+        # 嵌套统计(如查询预算包住整个请求)时同时记入外层
+        self.parent = parent
+        # 提交到线程池的任务会复制上下文, 只统计开启统计的线程内执行的语句
+        self.thread_id = get_ident()
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        stats = self
+        while stats is not None:
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.statements[statement] += 1
+            stats = stats.parent
+
+    def repeated(self, threshold: int) -> list:
+        """
+        执行次数达到阈值的语句(疑似 N+1)
+
+        Returns:
+            [(语句, 次数)], 按次数降序
+        """
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+def start():
+    """
+    开启一份统计并设为当前统计
+
+    Returns:
+        (QueryStats, Token), Token 用于 stop 恢复
+    """
+    stats = QueryStats(_stats_var.get())
+    return stats, _stats_var.set(stats)
+
+
+def stop(token) -> None:
+    _stats_var.reset(token)
+
+
+def current():
+    """当前上下文的统计, 未开启时返回 None"""
+    return _stats_var.get()
+
+
+def record(statement: str, elapsed_ms: float) -> None:
+    """由数据库引擎事件调用; 未开启统计时(启动、后台任务)直接返回"""
+    stats = _stats_var.get()
+    if stats is not None and stats.thread_id == get_ident():
+        stats.record(statement, elapsed_ms)
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, max_repeated: int = None):
+    """
+    断言代码块内执行的语句数不超过预算
+
+    Args:
+        max_queries: 语句总数上限
+        max_repeated: 同一语句重复次数上限(None 为不检查)
+
+    Raises:
+        AssertionError: 超出预算, 消息中列出执行次数最多的语句
+    """
+    stats, token = start()
+    try:
+        yield stats
+    finally:
+        stop(token)
+
+    top = "\n".join(
+        f"  {count}x {statement[:200]}"
+        for statement, count in stats.statements.most_common(5)
+    )
+    if stats.count > max_queries:
+        raise AssertionError(
+            f"查询次数超出预算 - count: {stats.count}, budget: {max_queries}\n{top}"
+        )
+    if max_repeated is not None and stats.repeated(max_repeated + 1):
+        raise AssertionError(
+            f"同一语句重复执行次数超出预算(疑似 N+1) - budget: {max_repeated}\n{top}"
+        )
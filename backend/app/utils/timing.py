@@ -0,0 +1,96 @@
+"""阶段耗时事件
+
+每个阶段结束时输出一条 INFO 日志(logger: app.timing)。文本日志中以 "key: value" 形式输出,
+JSON 日志(LOG_FORMAT=json)中为固定字段, 可直接按 stage 聚合 duration_ms 的 p50/p95。
+"""
+
+from contextlib import contextmanager
+from functools import wraps
+from .logger import get_logger, STAGE_FIELDS
+from .trace_util import start_span, end_span
+from . import metrics
+
+logger = get_logger("app.timing")
+
+# 同时计入 ingest_stage_duration_seconds 直方图的阶段(请求与服务函数耗时由其他指标覆盖)
+METRIC_STAGES = frozenset(
+    {"hash", "save", "parse", "persist", "refine", "convert", "extract", "ingest"}
+)
+
+
+def log_stage_event(
+    stage: str, duration_ms: float, status: str = "ok", span=None, **fields
+):
+    """
+    输出阶段耗时事件
+
+    Args:
+        stage: 阶段名称(hash/save/parse/refine/convert/persist/request/服务函数名)
+        duration_ms: 耗时(毫秒)
+        status: ok / error
+        span: 阶段对应的 span(输出 span_id / parent_span_id, 用于还原嵌套关系)
+        fields: workspace_id / file_id / tokens / bytes, 值为 None 的字段不输出到文本日志
+    """
+    if stage in METRIC_STAGES:
+        metrics.STAGE_LATENCY.observe(duration_ms / 1000, stage, status)
+
+    fields = {
+        key: fields[key] for key in STAGE_FIELDS if fields.get(key) is not None
+    }
+    detail = "".join(f", {key}: {value}" for key, value in fields.items())
+    extra = {"stage": stage, "duration_ms": duration_ms, "status": status, **fields}
+    if span is not None:
+        extra["span_id"] = span.span_id
+        extra["parent_span_id"] = span.parent_id
+    logger.info(
+        f"阶段耗时 - stage: {stage}, duration_ms: {duration_ms}, status: {status}{detail}",
+        extra=extra,
+    )
+
+
+@contextmanager
+def stage_timer(stage: str, **fields):
+    """
+    记录代码块耗时(作为一个 span, 代码块内的阶段以它为父 span)
+
+    Yields:
+        字段字典, 可在阶段内补充 tokens/bytes 等结果字段
+
+    用法:
+        with stage_timer("parse", file_id=file_id) as event:
+            raw_content = parse_file(...)
+            event["bytes"] = len(raw_content)
+    """
+    span = start_span(stage)
+    status = "ok"
+    try:
+        yield fields
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        log_stage_event(stage, end_span(span), status, span=span, **fields)
+
+
+def timed(stage: str = None):
+    """
+    装饰器: 记录服务函数耗时, 阶段名默认为 "<模块名>.<函数名>"
+
+    workspace_id / file_id 从同名关键字参数中读取
+    """
+
+    def decorator(func):
+        name = stage or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(
+                name,
+                workspace_id=kwargs.get("workspace_id"),
+                file_id=kwargs.get("file_id"),
+            ):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
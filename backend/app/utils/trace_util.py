@@ -1,8 +1,17 @@
 """请求追踪工具"""
+import os
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from contextlib import contextmanager
 from flask import request, g, has_request_context
 from functools import wraps
 
+# 当前执行上下文的追踪ID与 span(随 contextvars 复制到后台线程)
+_trace_id_var = ContextVar('trace_id', default=None)
+_span_var = ContextVar('span', default=None)
+
 def generate_trace_id():
     """生成唯一的追踪ID"""
     return str(uuid.uuid4())
@@ -10,8 +19,93 @@ def generate_trace_id():
 def get_trace_id():
     """
     获取当前请求的追踪ID
-    如果不在请求上下文中，返回默认值
+    不在请求上下文中时取 contextvars 中传递的追踪ID(后台线程/worker), 都没有时返回默认值
     """
     if has_request_context():
         return getattr(g, 'trace_id', 'NO_TRACE_ID')
-    return 'STARTUP'  # 应用启动、后台任务等场景
+    return _trace_id_var.get() or 'STARTUP'  # 应用启动、后台任务等场景
+
+def set_trace_id(trace_id):
+    """
+    设置当前上下文的追踪ID
+
+    Returns:
+        Token, 用于 reset_trace_id 恢复
+    """
+    return _trace_id_var.set(trace_id)
+
+def reset_trace_id(token):
+    _trace_id_var.reset(token)
+
+def get_route():
+    """
+    获取当前请求的路由规则(如 /api/files/<string:file_id>/progress)
+    不在请求上下文中返回 None
+    """
+    if has_request_context():
+        return request.url_rule.rule if request.url_rule else request.path
+    return None
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """提交任务时复制当前 contextvars 上下文(追踪ID/当前 span), 在工作线程中恢复"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(copy_context().run, fn, *args, **kwargs)
+
+
+# ==================== Span ====================
+
+class Span:
+    """一段计时区间, parent_id 为开始时所在的 span(可跨线程)"""
+
+    __slots__ = ('name', 'span_id', 'parent_id', 'started', 'duration_ms', '_token')
+
+    def __init__(self, name, parent_id):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.started = time.perf_counter()
+        self.duration_ms = None
+        self._token = None
+
+def get_current_span():
+    return _span_var.get()
+
+def start_span(name):
+    """开始一个 span 并设为当前 span"""
+    parent = _span_var.get()
+    span = Span(name, parent.span_id if parent else None)
+    span._token = _span_var.set(span)
+    return span
+
+def end_span(span):
+    """
+    结束 span 并恢复父 span
+
+    Returns:
+        耗时(毫秒)
+    """
+    if span.duration_ms is None:
+        span.duration_ms = round((time.perf_counter() - span.started) * 1000, 1)
+        try:
+            _span_var.reset(span._token)
+        except ValueError:
+            # 在其他上下文中结束(如跨线程), 不影响当前上下文
+            pass
+    return span.duration_ms
+
+@contextmanager
+def span(name):
+    """
+    span 上下文管理器
+
+    用法:
+        with span("refine") as current:
+            ...
+    """
+    current = start_span(name)
+    try:
+        yield current
+    finally:
+        end_span(current)
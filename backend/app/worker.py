@@ -0,0 +1,159 @@
+"""文件解析 worker 进程
+
+    python -m app.worker --threads 2
+
+从持久化任务队列(ingest_jobs)领取 API 进程写入的任务, 执行文件解析(OCR/PDF)、
+DeepSeek 精炼与账单落库。CPU 密集的解析不再占用 API 进程的 GIL, 两者可分别扩容;
+需配合 INGEST_MODE=queue 使用(INGEST_MODE=inline 时 API 进程在线程池内处理, 无需启动 worker)。
+"""
+
+import argparse
+import os
+import signal
+import socket
+import threading
+from app.config import Config
+from app.database import init_db
+from app.services import file_service, ingest_queue, ledger_service
+from app.utils import get_logger, parse
+from app.utils.trace_util import generate_trace_id, set_trace_id, reset_trace_id
+
+logger = get_logger(__name__)
+
+# 回收超时任务的检查间隔(秒)
+STALE_CHECK_INTERVAL = 60
+
+
+def process_job(job: dict) -> None:
+    """执行单个任务, 日志沿用上传请求的追踪ID(旧任务无追踪ID时新生成)"""
+    token = set_trace_id(job.get("trace_id") or generate_trace_id())
+    try:
+        _process_job(job)
+    finally:
+        reset_trace_id(token)
+
+
+def _heartbeat_loop(job: dict, done: threading.Event) -> None:
+    """任务执行期间定时刷新心跳, 任务已被回收时停止"""
+    while not done.wait(Config.INGEST_HEARTBEAT_INTERVAL):
+        try:
+            if not ingest_queue.heartbeat(job):
+                logger.warning(f"解析任务已被回收 - job_id: {job['id']}")
+                return
+        except Exception as e:
+            # 数据库暂时不可用时下次重试, 超时前恢复即可
+            logger.error(f"刷新任务心跳失败 - job_id: {job['id']}, error: {str(e)}")
+
+
+def _process_job(job: dict) -> None:
+    """异常时按重试策略重新入队或置为失败"""
+    logger.info(
+        f"开始执行解析任务 - job_id: {job['id']}, file_id: {job['file_upload_id']}, "
+        f"attempts: {job['attempts']}"
+    )
+    done = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat_loop,
+        args=(job, done),
+        name=f"ingest-heartbeat-{job['id']}",
+        daemon=True,
+    )
+    heartbeat.start()
+
+    try:
+        file_service.ingest_file(job["file_upload_id"], claim=job)
+    except ingest_queue.ClaimLostError as e:
+        logger.warning(f"解析任务已被回收, 放弃执行 - job_id: {job['id']}, {str(e)}")
+        return
+    except Exception as e:
+        logger.error(f"解析任务异常 - job_id: {job['id']}, error: {str(e)}")
+        ingest_queue.fail(job, str(e))
+        return
+    finally:
+        done.set()
+
+    ingest_queue.complete(job)
+    logger.info(f"解析任务完成 - job_id: {job['id']}")
+
+
+def _work_loop(worker_id: str, stop_event: threading.Event, poll_interval: float):
+    while not stop_event.is_set():
+        try:
+            job = ingest_queue.claim_next(worker_id)
+        except Exception as e:
+            logger.error(f"领取解析任务失败 - worker: {worker_id}, error: {str(e)}")
+            job = None
+
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+
+        process_job(job)
+
+
+def run(threads: int, poll_interval: float) -> None:
+    """启动 worker, 收到 SIGTERM/SIGINT 后等待进行中的任务完成再退出"""
+    init_db()
+    # 写后模式或预授权结算失败时写入的用量账本
+    ledger_service.replay_journal()
+    if Config.OCR_WARMUP_ON_START:
+        parse.warm_up_ocr()
+
+    stop_event = threading.Event()
+
+    def handle_stop(signum, frame):
+        logger.info(f"收到退出信号, 等待进行中的任务完成 - signal: {signum}")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    workers = [
+        threading.Thread(
+            target=_work_loop,
+            args=(f"{prefix}:{index}", stop_event, poll_interval),
+            name=f"ingest-worker-{index}",
+        )
+        for index in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    logger.info(f"解析 worker 已启动 - worker: {prefix}, threads: {threads}")
+
+    while not stop_event.is_set():
+        try:
+            stale = ingest_queue.requeue_stale()
+            if stale:
+                logger.warning(f"回收超时解析任务 - count: {stale}")
+        except Exception as e:
+            logger.error(f"回收超时解析任务失败 - error: {str(e)}")
+        stop_event.wait(STALE_CHECK_INTERVAL)
+
+    for worker in workers:
+        worker.join()
+    ledger_service.shutdown()
+    logger.info(f"解析 worker 已退出 - worker: {prefix}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="文件解析 worker")
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=Config.INGEST_WORKER_THREADS,
+        help="并发执行的任务数",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=Config.INGEST_POLL_INTERVAL,
+        help="队列为空时的轮询间隔(秒)",
+    )
+    args = parser.parse_args()
+
+    run(args.threads, args.poll_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""应用导入耗时基准测试(冷启动回归检查)
+
+在子进程中以 python -X importtime 导入 app, 统计 app 包的累计导入耗时,
+并检查重量级依赖(OCR/大模型 SDK/数据分析库)是否在启动时被导入。
+超出预算或导入了禁止的模块时以非零状态码退出, 可直接用于 CI。
+
+用法:
+    python benchmarks/import_time.py --budget-ms 1000 --runs 3
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 启动阶段不允许导入的模块(应在首次使用时才导入)
+FORBIDDEN_MODULES = (
+    "cv2",
+    "paddleocr",
+    "paddle",
+    "openai",
+    "pandas",
+    "pyarrow",
+    "numpy",
+)
+
+# 输出耗时最多的前 N 个直接依赖
+TOP_N = 10
+
+
+def measure_once() -> tuple:
+    """
+    导入一次 app, 解析 -X importtime 输出
+
+    Returns:
+        (app 累计耗时(微秒), {app 直接导入的模块: 累计耗时}, 已导入的模块集合)
+    """
+    env = dict(os.environ)
+    env.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+    env.setdefault("LOG_ENABLE_FILE", "false")
+    env.setdefault("LOG_LEVEL", "WARNING")
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+        raise SystemExit(f"导入 app 失败 - returncode: {result.returncode}")
+
+    # 格式: "import time: self [us] | cumulative | imported package"
+    # 子模块先于父模块输出, 缩进两个空格为一层
+    imported = set()
+    children = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        imported.add(name.split(".")[0])
+
+        if depth == 0:
+            if name == "app":
+                return int(cumulative), children, imported
+            children = {}
+        elif depth == 1:
+            children[name] = int(cumulative)
+
+    raise SystemExit("未找到 app 的导入耗时")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="app 导入耗时基准测试")
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    # 第一次运行会编译 .pyc, 不计入结果
+    measure_once()
+
+    samples = [measure_once() for _ in range(args.runs)]
+    total, children, imported = min(samples, key=lambda sample: sample[0])
+    total_ms = total / 1000
+
+    print(
+        f"app 导入耗时: {total_ms:.1f}ms "
+        f"(最优 {args.runs} 次, 预算 {args.budget_ms:.0f}ms)"
+    )
+
+    print(f"耗时最多的直接依赖(前 {TOP_N} 个):")
+    top = sorted(children.items(), key=lambda item: item[1], reverse=True)
+    for name, cumulative in top[:TOP_N]:
+        print(f"  {name:<40} {cumulative / 1000:8.1f}ms")
+
+    failed = False
+    forbidden = [name for name in FORBIDDEN_MODULES if name in imported]
+    if forbidden:
+        print(f"启动时导入了禁止的模块: {', '.join(forbidden)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"导入耗时超出预算: {total_ms:.1f}ms > {args.budget_ms:.0f}ms")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
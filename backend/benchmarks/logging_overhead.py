@@ -0,0 +1,132 @@
+"""日志开销基准测试
+
+对比同步/异步日志、文件日志开启/关闭时的请求延迟。每种配置在独立子进程中运行
+(日志配置在导入时读取), 通过 test_client 请求一个模拟热点路径的接口:
+每次请求输出若干条普通日志和一条大文本日志(类似 refined_content / OCR 识别文本)。
+
+用法:
+    python benchmarks/logging_overhead.py --requests 2000 --payload-kb 20
+    python benchmarks/logging_overhead.py --io-delay-ms 0.2   # 模拟慢磁盘
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VARIANTS = [
+    ("文件日志关闭", {"LOG_ENABLE_FILE": "false", "LOG_ASYNC": "false"}),
+    ("同步文件日志", {"LOG_ENABLE_FILE": "true", "LOG_ASYNC": "false"}),
+    ("异步文件日志", {"LOG_ENABLE_FILE": "true", "LOG_ASYNC": "true"}),
+]
+
+RUNNER = """
+import json, sys, time
+from logging.handlers import RotatingFileHandler
+
+# 模拟磁盘/日志采集端写入变慢(每条日志写入额外等待)
+io_delay = float(sys.argv[3]) / 1000
+if io_delay:
+    _emit = RotatingFileHandler.emit
+
+    def slow_emit(self, record):
+        time.sleep(io_delay)
+        _emit(self, record)
+
+    RotatingFileHandler.emit = slow_emit
+
+from app import create_app
+from app.utils import get_logger
+
+requests, payload_kb = int(sys.argv[1]), int(sys.argv[2])
+logger = get_logger("bench")
+payload = "x" * (payload_kb * 1024)
+app = create_app()
+
+@app.route("/bench/log")
+def bench_log():
+    for index in range(5):
+        logger.info(f"处理中 - step: {index}")
+    logger.info(f"精炼结果 - content: {payload}")
+    return "ok"
+
+client = app.test_client()
+for _ in range(100):
+    client.get("/bench/log")
+
+latencies = []
+for _ in range(requests):
+    started = time.perf_counter()
+    client.get("/bench/log")
+    latencies.append(time.perf_counter() - started)
+
+latencies.sort()
+print(json.dumps({
+    "p50": latencies[len(latencies) // 2] * 1000,
+    "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+    "mean": sum(latencies) / len(latencies) * 1000,
+}))
+"""
+
+
+def run_variant(overrides: dict, requests: int, payload_kb: int, io_delay_ms: float):
+    log_dir = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env.update(
+        {
+            "DB_PATH": os.path.join(log_dir, "bench.db"),
+            "LOG_LEVEL": "INFO",
+            "LOG_ENABLE_CONSOLE": "false",
+            "LOG_FILE": os.path.join(log_dir, "bench.log"),
+        }
+    )
+    env.update(overrides)
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            RUNNER,
+            str(requests),
+            str(payload_kb),
+            str(io_delay_ms),
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+        raise SystemExit("基准测试子进程失败")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="日志开销基准测试")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--payload-kb", type=int, default=20)
+    parser.add_argument(
+        "--io-delay-ms", type=float, default=0, help="模拟每条日志写入的额外 I/O 等待"
+    )
+    args = parser.parse_args()
+
+    print(
+        f"requests: {args.requests}, 大文本日志: {args.payload_kb}KB/请求, "
+        f"I/O 延迟: {args.io_delay_ms}ms/条"
+    )
+    print(f"{'配置':<12} {'mean(ms)':>10} {'p50(ms)':>10} {'p99(ms)':>10}")
+    for name, overrides in VARIANTS:
+        stats = run_variant(overrides, args.requests, args.payload_kb, args.io_delay_ms)
+        print(
+            f"{name:<12} {stats['mean']:>10.3f} {stats['p50']:>10.3f} "
+            f"{stats['p99']:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""月度用量聚合基准测试
+
+在临时 SQLite 库中生成 Token 使用记录, 对比
+1. ORM 全量加载 + Python 按日分组(旧实现)
+2. account_service.get_monthly_usage 的 SQL GROUP BY 聚合
+
+用法:
+    python benchmarks/monthly_usage.py --records 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# 使用临时数据库, 避免污染本地数据
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from app.database import init_db, db_session, db_transaction
+from app.models import TokenUsageRecord
+from app.services import account_service
+
+OPENID = "bench-user"
+MONTH = "2025-01"
+
+
+def seed(records: int) -> None:
+    start = datetime(2025, 1, 1)
+    seconds_in_month = 31 * 24 * 3600
+    rows = [
+        {
+            "id": f"bench{i:016d}",
+            "user_openid": OPENID,
+            "api_type": "refine" if i % 2 else "convert",
+            "model": "deepseek-chat",
+            "prompt_tokens": 1000,
+            "completion_tokens": 500,
+            "total_tokens": 1500,
+            "unit_price": Decimal("0.002"),
+            "cost": Decimal("0.01"),
+            "status": "success",
+            "is_deleted": False,
+            "created_at": start + timedelta(seconds=i * seconds_in_month // records),
+        }
+        for i in range(records)
+    ]
+    with db_transaction() as db:
+        db.execute(insert(TokenUsageRecord), rows)
+
+
+def legacy_monthly_usage() -> int:
+    """旧实现: 加载全部 ORM 对象后在 Python 中按日分组"""
+    start_date = datetime(2025, 1, 1)
+    end_date = datetime(2025, 2, 1)
+    with db_session() as db:
+        records = (
+            db.query(TokenUsageRecord)
+            .filter(
+                TokenUsageRecord.user_openid == OPENID,
+                TokenUsageRecord.is_deleted == False,
+                TokenUsageRecord.status == "success",
+                TokenUsageRecord.created_at >= start_date,
+                TokenUsageRecord.created_at < end_date,
+            )
+            .all()
+        )
+        daily_map = {}
+        for record in records:
+            key = record.created_at.strftime("%Y-%m-%d")
+            daily_map.setdefault(key, []).append(record)
+        return len(daily_map)
+
+
+def timeit(label: str, func, repeat: int) -> None:
+    costs = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        costs.append((time.perf_counter() - begin) * 1000)
+    print(f"{label:<24} best: {min(costs):8.1f} ms   avg: {sum(costs) / repeat:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="月度用量聚合基准测试")
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    init_db()
+    seed(args.records)
+    print(f"records: {args.records}, month: {MONTH}")
+
+    timeit("ORM + Python 分组", legacy_monthly_usage, args.repeat)
+    timeit(
+        "SQL GROUP BY",
+        lambda: account_service.get_monthly_usage(OPENID, MONTH),
+        args.repeat,
+    )
+    timeit(
+        "导出 Excel",
+        lambda: b"".join(account_service.export_monthly_usage(OPENID, MONTH)),
+        args.repeat,
+    )
+
+
+if __name__ == "__main__":
+    main()
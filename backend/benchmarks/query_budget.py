@@ -0,0 +1,133 @@
+"""接口查询预算检查
+
+在临时 SQLite 库中生成一个空间(若干成员、账单), 通过 test_client 请求常用接口,
+统计每个接口执行的 SQL 语句数、数据库耗时与重复执行的语句(疑似 N+1)。
+超出预算时以非零状态退出, 可作为回归检查。
+
+用法:
+    python benchmarks/query_budget.py
+    python benchmarks/query_budget.py --bills 50 --verbose
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+# 使用临时数据库, 避免污染本地数据
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_ENABLE_FILE", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.database import db_transaction
+from app.models import User, WorkspaceMember, FileUpload, Bill
+from app.services import workspace_service
+from app.utils import generate_token
+from app.utils.query_stats import assert_query_budget
+
+OPENID = "bench-owner"
+MEMBERS = 5
+
+# (名称, 方法, 路径, 请求体, 语句数预算); 路径/请求体中的 {workspace_id} 在运行时替换
+BUDGETS = [
+    ("空间列表", "GET", "/api/workspaces", None, 6),
+    ("空间详情", "GET", "/api/workspaces/{workspace_id}", None, 6),
+    ("账单列表", "GET", "/api/bills?workspace_id={workspace_id}", None, 6),
+    # 目前逐条查询账单(每条一次 SELECT), 预算按默认 20 条账单设置
+    ("批量更新账单", "PUT", "/api/bills/update", "update", 25),
+]
+
+
+def seed(bills: int) -> tuple:
+    """生成空间、成员与账单, 返回 (workspace_id, bill_ids)"""
+    with db_transaction() as db:
+        db.add(User(openid=OPENID, nickname="owner", status="active"))
+        for index in range(MEMBERS):
+            db.add(User(openid=f"bench-member-{index}", status="active"))
+
+    workspace_id = workspace_service.create_workspace(OPENID, "基准空间")["id"]
+
+    with db_transaction() as db:
+        for index in range(MEMBERS):
+            db.add(
+                WorkspaceMember(
+                    workspace_id=workspace_id,
+                    member_openid=f"bench-member-{index}",
+                    role="viewer",
+                )
+            )
+        file_upload = FileUpload(
+            workspace_id=workspace_id,
+            uploaded_by_openid=OPENID,
+            file_hash="bench",
+            original_filename="bench.pdf",
+            saved_path="bench.pdf",
+            file_size=0,
+            upload_time=0,
+            status="completed",
+        )
+        db.add(file_upload)
+        db.flush()
+        bill_list = [
+            Bill(
+                file_upload_id=file_upload.id,
+                workspace_id=workspace_id,
+                description=f"账单 {index}",
+                status="pending",
+            )
+            for index in range(bills)
+        ]
+        db.add_all(bill_list)
+        db.flush()
+        bill_ids = [bill.id for bill in bill_list]
+
+    return workspace_id, bill_ids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="接口查询预算检查")
+    parser.add_argument("--bills", type=int, default=20, help="生成的账单数")
+    parser.add_argument("--verbose", action="store_true", help="输出重复执行的语句")
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    workspace_id, bill_ids = seed(args.bills)
+    headers = {"Authorization": f"Bearer {generate_token({'openid': OPENID})}"}
+
+    over_budget = False
+    print(f"{'接口':<10} {'语句数':>6} {'预算':>6} {'DB(ms)':>8} {'最多重复':>8}")
+    for name, method, path, body, budget in BUDGETS:
+        if body == "update":
+            body = {
+                "workspace_id": workspace_id,
+                "data": [{"id": bill_id, "remark": "bench"} for bill_id in bill_ids],
+            }
+        path = path.format(workspace_id=workspace_id)
+
+        try:
+            with assert_query_budget(budget) as stats:
+                response = client.open(path, method=method, json=body, headers=headers)
+            status = "ok"
+        except AssertionError:
+            status = "超出预算"
+            over_budget = True
+
+        repeated = stats.statements.most_common(1)
+        print(
+            f"{name:<10} {stats.count:>6} {budget:>6} {stats.total_ms:>8.1f} "
+            f"{repeated[0][1] if repeated else 0:>8}  "
+            f"HTTP {response.status_code} {status}"
+        )
+        if args.verbose:
+            for statement, count in stats.repeated(2):
+                print(f"    {count}x {statement[:160]}")
+
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
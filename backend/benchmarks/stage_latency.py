@@ -0,0 +1,50 @@
+"""按阶段统计耗时分位数(读取 LOG_FORMAT=json 输出的日志)
+
+用法:
+    python benchmarks/stage_latency.py logs/app.log
+    python benchmarks/stage_latency.py logs/app.log --route /api/bills
+"""
+
+import argparse
+import json
+import sys
+
+
+def percentile(values: list, ratio: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="按阶段统计耗时分位数")
+    parser.add_argument("paths", nargs="+", help="JSON 日志文件")
+    parser.add_argument("--route", default=None, help="仅统计指定路由")
+    args = parser.parse_args()
+
+    durations = {}
+    for path in args.paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("duration_ms") is None:
+                    continue
+                if args.route and entry.get("route") != args.route:
+                    continue
+                durations.setdefault(entry["stage"], []).append(entry["duration_ms"])
+
+    if not durations:
+        sys.exit("未找到阶段耗时事件(需 LOG_FORMAT=json)")
+
+    print(f"{'stage':<45} {'count':>8} {'p50(ms)':>10} {'p95(ms)':>10} {'max(ms)':>10}")
+    for stage, values in sorted(durations.items()):
+        values.sort()
+        print(
+            f"{stage:<45} {len(values):>8} {percentile(values, 0.5):>10.1f} "
+            f"{percentile(values, 0.95):>10.1f} {values[-1]:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
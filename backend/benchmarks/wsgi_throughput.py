@@ -0,0 +1,167 @@
+"""WSGI 服务器吞吐对比: Flask 开发服务器 vs gunicorn(gunicorn.conf.py)
+
+分别启动两种服务器(临时数据库), 使用多个并发连接在固定时长内请求同一接口,
+统计吞吐(req/s)与延迟分位数。
+
+用法:
+    python benchmarks/wsgi_throughput.py --concurrency 16 --duration 10
+    python benchmarks/wsgi_throughput.py --path /api/bills/settlement-summary --token <JWT>
+"""
+
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = "127.0.0.1"
+
+
+def start_server(kind: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        {
+            "APP_HOST": HOST,
+            "APP_PORT": str(port),
+            "APP_DEBUG": "false",
+            "DB_PATH": os.path.join(tempfile.mkdtemp(), "bench.db"),
+            "LOG_ENABLE_FILE": "false",
+            "LOG_LEVEL": "WARNING",
+            "WEB_WORKERS": str(workers),
+        }
+    )
+    if kind == "dev":
+        command = [sys.executable, "main.py"]
+    else:
+        command = [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "-c",
+            "gunicorn.conf.py",
+            "--access-logfile",
+            "/dev/null",
+            "wsgi:app",
+        ]
+    return subprocess.Popen(
+        command,
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_ready(port: int, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(HOST, port, timeout=1)
+            conn.request("GET", "/api/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"服务器启动超时 - port: {port}")
+
+
+def run_load(port: int, path: str, headers: dict, concurrency: int, duration: float):
+    """
+    并发请求 duration 秒
+
+    Returns:
+        (延迟列表, 错误响应数, 重连次数)
+        worker 回收时会关闭其持有的 keep-alive 连接, 客户端重连计入重连次数
+    """
+    latencies = []
+    counters = {"errors": 0, "reconnects": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        conn = http.client.HTTPConnection(HOST, port, timeout=30)
+        local = []
+        failed = 0
+        reconnects = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                reconnects += 1
+                conn.close()
+                conn = http.client.HTTPConnection(HOST, port, timeout=30)
+                continue
+            local.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            counters["errors"] += failed
+            counters["reconnects"] += reconnects
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), counters["errors"], counters["reconnects"]
+
+
+def percentile(values: list, ratio: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * ratio))] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="WSGI 服务器吞吐对比")
+    parser.add_argument("--path", default="/api/health")
+    parser.add_argument("--token", default=None, help="JWT(请求需要登录的接口时使用)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--servers", default="dev,gunicorn")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+
+    print(
+        f"path: {args.path}, concurrency: {args.concurrency}, "
+        f"duration: {args.duration}s, gunicorn workers: {args.workers}"
+    )
+    print(
+        f"{'server':<10} {'req/s':>10} {'p50(ms)':>10} {'p99(ms)':>10} "
+        f"{'errors':>8} {'reconnects':>11}"
+    )
+
+    for index, kind in enumerate(args.servers.split(",")):
+        port = 18000 + index
+        process = start_server(kind, port, args.workers)
+        try:
+            wait_ready(port)
+            # 预热
+            run_load(port, args.path, headers, args.concurrency, 1)
+            latencies, errors, reconnects = run_load(
+                port, args.path, headers, args.concurrency, args.duration
+            )
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        print(
+            f"{kind:<10} {len(latencies) / args.duration:>10.1f} "
+            f"{percentile(latencies, 0.5):>10.2f} {percentile(latencies, 0.99):>10.2f} "
+            f"{errors:>8} {reconnects:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
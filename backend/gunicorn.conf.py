@@ -0,0 +1,40 @@
+"""gunicorn 配置(预加载 + 多进程 + worker 回收)
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+- preload_app: 主进程导入应用并完成数据库版本检查/账本重放, worker 通过 fork 共享已导入的模块
+- post_fork: 每个 worker 重建数据库连接池、解析线程池和用量账本状态, 按配置预热 OCR
+- max_requests: worker 处理一定数量请求后回收, 退出前等待解析任务完成并落库用量事件
+
+吞吐对比见 benchmarks/wsgi_throughput.py
+"""
+
+from app.config import Config
+
+bind = f"{Config.APP_HOST}:{Config.APP_PORT}"
+workers = Config.WEB_WORKERS
+# 上传接口把解析任务交给线程池后立即返回, 请求本身以 I/O 为主, 使用多线程 worker
+worker_class = "gthread"
+threads = Config.WEB_THREADS
+
+preload_app = True
+
+max_requests = Config.WEB_MAX_REQUESTS
+max_requests_jitter = Config.WEB_MAX_REQUESTS_JITTER
+timeout = Config.WEB_TIMEOUT
+graceful_timeout = Config.WEB_GRACEFUL_TIMEOUT
+
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    from app import init_worker
+
+    init_worker()
+    server.log.info(f"worker 初始化完成 - pid: {worker.pid}")
+
+
+def worker_exit(server, worker):
+    from app import shutdown_worker
+
+    shutdown_worker()
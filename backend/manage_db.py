@@ -0,0 +1,57 @@
+"""数据库结构管理脚本
+
+应用启动时只检查结构版本戳(单行查询), 完整建表/迁移通过本脚本显式执行:
+    python manage_db.py status    查看版本戳与当前模型指纹
+    python manage_db.py migrate   建表并同步新增列/索引, 写入版本戳
+    python manage_db.py stamp     仅写入版本戳(结构已手动同步时使用)
+"""
+
+import sys
+import os
+import argparse
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import (
+    engine,
+    get_schema_stamp,
+    migrate_db,
+    schema_fingerprint,
+    write_schema_stamp,
+)
+
+
+def show_status() -> bool:
+    stamp = get_schema_stamp()
+    expected = schema_fingerprint()
+
+    print(f"📂 数据库文件位置: {engine.url.database}")
+    print(f"🔖 当前版本戳: {stamp or '(无)'}")
+    print(f"🧩 模型指纹:   {expected}")
+
+    if stamp == expected:
+        print("✅ 数据库结构已是最新")
+        return True
+
+    print("⚠️  数据库结构需要迁移, 请执行: python manage_db.py migrate")
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="数据库结构管理工具")
+    parser.add_argument(
+        "action",
+        choices=["status", "migrate", "stamp"],
+        help="操作类型: status(查看版本), migrate(建表/迁移), stamp(仅写入版本戳)",
+    )
+
+    args = parser.parse_args()
+
+    if args.action == "status":
+        sys.exit(0 if show_status() else 1)
+    elif args.action == "migrate":
+        migrate_db(force=True)
+    elif args.action == "stamp":
+        version = write_schema_stamp()
+        print(f"✅ 已写入版本戳: {version}")
@@ -0,0 +1,11 @@
+"""生产环境 WSGI 入口
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+本地开发仍使用 python main.py(Flask 开发服务器)
+"""
+
+from app import create_app
+
+# 预加载模式下由 gunicorn 主进程创建, worker 进程状态在 post_fork 钩子中初始化
+app = create_app(prefork=True)